@@ -0,0 +1,321 @@
+"""
+Hospital Management System - Appointment Analytics
+Author: HMS Development Team
+Description: Revenue, cancellation and utilisation figures computed from a
+columnar in-memory snapshot of the appointments table. The snapshot is four
+NumPy arrays (doctor, day, fee, status) bulk-loaded from a read replica, so
+group-bys by doctor, specialization and time bucket are a couple of
+np.bincount calls instead of ad-hoc GROUP BY queries against the live tables.
+"""
+
+import threading
+import time
+from datetime import date, timedelta
+
+import archive
+
+try:
+    import numpy as np
+except ImportError:  # Optional - the analytics page and API answer 503 without it
+    np = None
+
+STATUSES = ('Scheduled', 'Completed', 'Cancelled')
+SCHEDULED, COMPLETED, CANCELLED = 1, 2, 3      # Status codes; 0 is a NULL status
+BUCKETS = ('day', 'week', 'month')
+EPOCH = date(1970, 1, 1)
+
+# Integers only, so every fetched chunk converts to an array in one call.
+# Formatted with each table holding appointments (archive.py).
+APPOINTMENT_COLUMNS_SQL = """SELECT doctor_id, DATEDIFF(appointment_date, '1970-01-01'),
+                                    CAST(ROUND(COALESCE(fee, 0) * 100) AS SIGNED),
+                                    FIELD(status, 'Scheduled', 'Completed', 'Cancelled')
+                             FROM {}"""
+DOCTORS_SQL = "SELECT id, name, specialization FROM doctors ORDER BY id"
+
+
+def available():
+    return np is not None
+
+
+class Snapshot:
+    """
+    Appointment columns and the doctors they refer to.
+
+    `doctor` holds positions in doctor_ids rather than ids, so per-doctor
+    totals are a bincount of length len(doctor_ids); `day` is days since
+    1970-01-01 and `fee` is in cents. Rows are sorted by day, so a date range
+    is a slice found with two binary searches rather than a mask over every row.
+    """
+
+    def __init__(self, doctors, doctor_id, day, fee, status):
+        """
+        Args:
+            doctors: (id, name, specialization) rows ordered by id
+            doctor_id, day, fee, status: Equal-length integer arrays, one entry per appointment
+        """
+        self.doctor_ids = np.array([row[0] for row in doctors], dtype=np.int64)
+        self.doctor_names = [row[1] for row in doctors]
+        self.specializations = sorted({row[2] or '' for row in doctors})
+        codes = {name: code for code, name in enumerate(self.specializations)}
+        self.doctor_specialization = np.array([codes[row[2] or ''] for row in doctors], dtype=np.int32)
+
+        doctor_id = np.asarray(doctor_id, dtype=np.int64)
+        day, fee, status = np.asarray(day), np.asarray(fee), np.asarray(status)
+        position = np.searchsorted(self.doctor_ids, doctor_id)
+        known = position < len(self.doctor_ids)
+        known[known] = self.doctor_ids[position[known]] == doctor_id[known]
+        if not known.all():
+            # Doctor deleted between the two reads - its appointments went with it
+            position, day, fee, status = position[known], day[known], fee[known], status[known]
+        day = np.asarray(day, dtype=np.int32)
+        order = np.argsort(day, kind='stable')
+        self.doctor = position.astype(np.int32)[order]
+        self.day = day[order]
+        self.fee = np.asarray(fee, dtype=np.int64)[order]
+        self.status = np.asarray(status, dtype=np.int8)[order]
+        self.built_at = time.time()
+
+    def __len__(self):
+        return len(self.day)
+
+    @property
+    def nbytes(self):
+        return self.doctor.nbytes + self.day.nbytes + self.fee.nbytes + self.status.nbytes
+
+
+def load_snapshot(connection, chunk_rows=100000):
+    """
+    Read the appointment columns and doctors in one consistent snapshot
+    Args: connection: Open connection (preferably to a replica), chunk_rows (int): Rows per fetchmany()
+    Returns: Snapshot
+    """
+    columns = ([], [], [], [])
+    cursor = connection.cursor()
+    try:
+        # Both reads see the same point in time, so every appointment's doctor is present
+        connection.start_transaction(consistent_snapshot=True, readonly=True)
+        cursor.execute(DOCTORS_SQL)
+        doctors = cursor.fetchall()
+        # Each table streamed on its own; the snapshot sees a row being archived in exactly one of them
+        tables = (archive.HOT, archive.ARCHIVE) if archive.horizon(cursor) is not None else (archive.HOT,)
+        for table in tables:
+            cursor.execute(APPOINTMENT_COLUMNS_SQL.format(table))
+            while True:
+                rows = cursor.fetchmany(chunk_rows)
+                if not rows:
+                    break
+                chunk = np.array(rows, dtype=np.int64)
+                # Narrow each chunk straight away so the wide array never holds every row
+                for target, values, dtype in zip(columns, chunk.T, (np.int64, np.int32, np.int64, np.int8)):
+                    target.append(values.astype(dtype))
+        connection.commit()
+    finally:
+        cursor.close()
+    arrays = [np.concatenate(parts) if parts else np.empty(0, dtype) for parts, dtype
+              in zip(columns, (np.int64, np.int32, np.int64, np.int8))]
+    return Snapshot(doctors, *arrays)
+
+
+def _bucket_starts(bucket, first, last):
+    """
+    First day (days since epoch) of every bucket overlapping [first, last]
+    """
+    if bucket == 'day':
+        return np.arange(first, last + 1, dtype=np.int64)
+    if bucket == 'week':
+        # 1970-01-01 was a Thursday; weeks start on Monday
+        return np.arange(first - (first + 3) % 7, last + 1, 7, dtype=np.int64)
+    months = np.arange(np.datetime64(first, 'D').astype('datetime64[M]'),
+                       np.datetime64(last, 'D').astype('datetime64[M]') + 1)
+    return months.astype('datetime64[D]').astype(np.int64)
+
+
+def _bucket_label(bucket, start):
+    day = EPOCH + timedelta(days=int(start))
+    return day.strftime('%Y-%m') if bucket == 'month' else day.isoformat()
+
+
+def _totals(keys, size, status, fee):
+    """
+    Appointment counts and fee sums per (group, status) in two passes
+    Returns: (counts, fees) arrays of shape (size, 4), indexed [group, status code]
+    """
+    combined = keys.astype(np.intp) * 4 + status
+    counts = np.bincount(combined, minlength=size * 4).reshape(size, 4)
+    fees = np.bincount(combined, weights=fee, minlength=size * 4).reshape(size, 4)
+    return counts, fees
+
+
+def _row(counts, fees, capacity):
+    completed, cancelled = int(counts[COMPLETED]), int(counts[CANCELLED])
+    booked = int(counts[SCHEDULED]) + completed
+    return {
+        'appointments': int(counts.sum()),
+        'scheduled': int(counts[SCHEDULED]),
+        'completed': completed,
+        'cancelled': cancelled,
+        'revenue': round(float(fees[COMPLETED]) / 100, 2),
+        'cancellation_rate': round(cancelled / (completed + cancelled), 4) if completed + cancelled else None,
+        'booked_slots': booked,
+        'capacity_slots': int(capacity),
+        'utilisation': round(booked / capacity, 4) if capacity else None,
+    }
+
+
+def summarise(snapshot, first_day, last_day, bucket='month', doctor_id=None, specialization=None,
+              slots_per_day=16, weekmask='1111100', top_doctors=50):
+    """
+    Revenue, cancellations and utilisation over a date range
+    Args:
+        snapshot (Snapshot): Loaded appointment columns
+        first_day, last_day (date): Inclusive range
+        bucket (str): Time bucket for by_period - day, week or month
+        doctor_id (int), specialization (str): Only these doctors' appointments
+        slots_per_day (int): Visits a doctor can take on a working day
+        weekmask (str): Working weekdays, Monday first (np.busday_count format)
+        top_doctors (int): Doctors returned in by_doctor, highest revenue first (None for all)
+    Returns: dict with totals, by_period, by_specialization and by_doctor rows. Revenue is
+    completed appointments' fees; cancellation_rate is cancelled / (completed + cancelled);
+    utilisation is scheduled and completed visits over the working-day slots in the range.
+    """
+    first, last = (first_day - EPOCH).days, (last_day - EPOCH).days
+    doctors = len(snapshot.doctor_ids)
+    selected = np.ones(doctors, dtype=bool)
+    if doctor_id is not None:
+        selected &= snapshot.doctor_ids == doctor_id
+    if specialization is not None:
+        code = snapshot.specializations.index(specialization) if specialization in snapshot.specializations else -1
+        selected &= snapshot.doctor_specialization == code
+
+    low, high = np.searchsorted(snapshot.day, [first, last + 1])
+    doctor, day = snapshot.doctor[low:high], snapshot.day[low:high]
+    fee, status = snapshot.fee[low:high], snapshot.status[low:high]
+    if not selected.all():
+        mask = selected[doctor]
+        doctor, day, fee, status = doctor[mask], day[mask], fee[mask], status[mask]
+
+    working_days = int(np.busday_count(np.datetime64(first_day), np.datetime64(last_day + timedelta(days=1)),
+                                       weekmask=weekmask))
+    doctor_capacity = working_days * slots_per_day
+    selected_count = int(selected.sum())
+
+    counts, fees = _totals(doctor, doctors, status, fee)
+    by_doctor = []
+    for position in np.flatnonzero(selected):
+        row = _row(counts[position], fees[position], doctor_capacity)
+        row.update(id=int(snapshot.doctor_ids[position]), name=snapshot.doctor_names[position],
+                   specialization=snapshot.specializations[snapshot.doctor_specialization[position]])
+        by_doctor.append(row)
+    by_doctor.sort(key=lambda row: (-row['revenue'], -row['appointments'], row['name']))
+    totals = _row(counts.sum(axis=0), fees.sum(axis=0), doctor_capacity * selected_count)
+
+    # Specialization totals are sums of their doctors' totals - no second pass over the rows
+    specialization_count = len(snapshot.specializations)
+    spec_counts = np.zeros((specialization_count, 4), dtype=counts.dtype)
+    spec_fees = np.zeros((specialization_count, 4))
+    np.add.at(spec_counts, snapshot.doctor_specialization, counts)
+    np.add.at(spec_fees, snapshot.doctor_specialization, fees)
+    spec_doctors = np.bincount(snapshot.doctor_specialization[selected], minlength=specialization_count)
+    by_specialization = []
+    for code in np.flatnonzero(spec_doctors):
+        row = _row(spec_counts[code], spec_fees[code], doctor_capacity * spec_doctors[code])
+        row.update(specialization=snapshot.specializations[code], doctors=int(spec_doctors[code]))
+        by_specialization.append(row)
+    by_specialization.sort(key=lambda row: -row['revenue'])
+
+    starts = _bucket_starts(bucket, first, last)
+    # day is still sorted, so each bucket is a run of rows
+    boundaries = np.append(np.searchsorted(day, starts), len(day))
+    keys = np.repeat(np.arange(len(starts)), np.diff(boundaries))
+    period_counts, period_fees = _totals(keys, len(starts), status, fee)
+    # Working days of each bucket, clipped to the requested range
+    bounds = np.clip(np.append(starts, last + 1), first, last + 1).astype('datetime64[D]')
+    period_days = np.busday_count(bounds[:-1], bounds[1:], weekmask=weekmask)
+    by_period = []
+    for index, start in enumerate(starts):
+        row = _row(period_counts[index], period_fees[index], period_days[index] * slots_per_day * selected_count)
+        row['period'] = _bucket_label(bucket, start)
+        by_period.append(row)
+
+    return {
+        'start': first_day.isoformat(),
+        'end': last_day.isoformat(),
+        'bucket': bucket,
+        'working_days': working_days,
+        'totals': totals,
+        'by_period': by_period,
+        'by_specialization': by_specialization,
+        'by_doctor': by_doctor if top_doctors is None else by_doctor[:top_doctors],
+        'doctors': selected_count,
+    }
+
+
+class AppointmentAnalytics:
+    """
+    Holds the current Snapshot and rebuilds it in a background thread every
+    `refresh_interval` seconds. The old snapshot keeps answering while a new
+    one loads; until the first load finishes, ready is False.
+    """
+
+    def __init__(self, loader, refresh_interval=600):
+        """
+        Args:
+            loader (callable): Returns a fresh Snapshot
+            refresh_interval (float): Seconds between rebuilds (how far the figures may lag)
+        """
+        self.loader = loader
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._loaded_at = None
+        self._building = False
+        self.last_build_seconds = None
+        self.last_error = None
+
+    @property
+    def ready(self):
+        return self._snapshot is not None
+
+    @property
+    def snapshot(self):
+        return self._snapshot
+
+    def _rebuild(self):
+        started = time.perf_counter()
+        try:
+            snapshot = self.loader()
+            with self._lock:
+                self._snapshot = snapshot
+                self._loaded_at = time.monotonic()
+            self.last_build_seconds = time.perf_counter() - started
+            self.last_error = None
+        except Exception as e:
+            self.last_error = str(e)
+            print(f"Appointment analytics snapshot failed: {e}")
+        finally:
+            self._building = False
+
+    def refresh_if_stale(self):
+        """
+        Start a background rebuild if there is no snapshot or it is too old
+        """
+        with self._lock:
+            stale = self._loaded_at is None or time.monotonic() - self._loaded_at > self.refresh_interval
+            if not stale or self._building:
+                return
+            self._building = True
+        threading.Thread(target=self._rebuild, name='appointment-analytics', daemon=True).start()
+
+    def stats(self):
+        snapshot = self._snapshot
+        return {
+            'numpy': np is not None,
+            'ready': snapshot is not None,
+            'building': self._building,
+            'appointments': len(snapshot) if snapshot is not None else 0,
+            'doctors': len(snapshot.doctor_ids) if snapshot is not None else 0,
+            'bytes': snapshot.nbytes if snapshot is not None else 0,
+            'age_seconds': time.time() - snapshot.built_at if snapshot is not None else None,
+            'last_build_seconds': self.last_build_seconds,
+            'last_error': self.last_error,
+        }
@@ -0,0 +1,222 @@
+"""
+Hospital Management System - JSON API
+Author: HMS Development Team
+Description: Resources of the versioned JSON API (/api/v1) used by the lab
+and billing integrations. Each resource lists the fields a client may select
+and the SQL behind them, so a request reads only the columns it asked for and
+joins patients or doctors only for a joined field. Lists page by keyset on
+id, or on (updated_at, id) when updated_since asks for the rows changed since
+the last sync. The routes live in app.py.
+"""
+
+import json
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+import archive
+import rollups
+from pagination import Keyset, page_query, union_page_query
+
+BY_ID = Keyset(('a.id', 'id', 'ASC'))
+BY_UPDATE = Keyset(('a.updated_at', 'updated_at', 'ASC'), ('a.id', 'id', 'ASC'))
+
+STATUSES = ('Scheduled', 'Completed', 'Cancelled')
+
+
+class Resource:
+    """
+    A table exposed by the API, read as alias `a`
+    Args: table (str): Table (appointments: resolved per request by archive.source),
+          fields (dict): Field name -> SQL expression, joins (dict): Field name -> (joined table, JOIN clause),
+          default_fields (tuple): Fields returned when the request does not pick any,
+          versions (dict): Field name -> table version it follows instead of the table's own;
+                           such fields do not touch updated_at, so updated_since cannot select them
+    """
+
+    def __init__(self, table, fields, joins=None, default_fields=None, versions=None):
+        self.table = table
+        self.fields = fields
+        self.joins = joins or {}
+        self.default_fields = default_fields or tuple(fields)
+        self.versions = versions or {}
+
+    def select(self, fields, source=None):
+        """
+        SELECT ... FROM ... for the given fields plus the keyset columns, without WHERE/ORDER BY
+        Args: fields (tuple): From parse_fields, source (str): Table expression replacing the table
+        """
+        columns = list(dict.fromkeys(fields + ('id', 'updated_at')))
+        joins = list(dict.fromkeys(self.joins[field][1] for field in fields if field in self.joins))
+        return (f"SELECT {', '.join(f'{self.fields[field]} AS {field}' for field in columns)} "
+                f"FROM {source or self.table} a {' '.join(joins)}").rstrip()
+
+    def tables(self, fields):
+        """
+        Tables a response with these fields is built from (for the table_versions validators)
+        """
+        return (self.table,) + tuple(dict.fromkeys(
+            [self.joins[field][0] for field in fields if field in self.joins]
+            + [self.versions[field] for field in fields if field in self.versions]))
+
+
+# Maintained by rollups.py; only selectable once migration 004 has run
+PATIENT_COUNTER_FIELDS = ('total_appointments', 'last_appointment', 'next_scheduled_appointment')
+
+RESOURCES = {
+    'patients': Resource('patients', {
+        'id': 'a.id', 'name': 'a.name', 'age': 'a.age', 'gender': 'a.gender', 'phone': 'a.phone',
+        'email': 'a.email', 'address': 'a.address', 'medical_history': 'a.medical_history',
+        'total_appointments': 'a.total_appointments', 'last_appointment': 'a.last_appointment',
+        'next_scheduled_appointment': 'a.next_scheduled_appointment',
+        'created_at': 'a.created_at', 'updated_at': 'a.updated_at',
+    }, default_fields=('id', 'name', 'age', 'gender', 'phone', 'email', 'address', 'medical_history',
+                       'created_at', 'updated_at'),
+       versions=dict.fromkeys(PATIENT_COUNTER_FIELDS, rollups.COUNTER_VERSION)),
+    'doctors': Resource('doctors', {
+        'id': 'a.id', 'name': 'a.name', 'specialization': 'a.specialization', 'phone': 'a.phone',
+        'email': 'a.email', 'experience': 'a.experience', 'fee': 'a.fee',
+        'created_at': 'a.created_at', 'updated_at': 'a.updated_at',
+    }),
+    'appointments': Resource('appointments', {
+        'id': 'a.id', 'patient_id': 'a.patient_id', 'doctor_id': 'a.doctor_id',
+        'appointment_date': 'a.appointment_date', 'fee': 'a.fee', 'status': 'a.status', 'notes': 'a.notes',
+        'created_at': 'a.created_at', 'updated_at': 'a.updated_at',
+        'patient_name': 'p.name', 'doctor_name': 'd.name', 'doctor_specialization': 'd.specialization',
+    }, joins={
+        'patient_name': ('patients', 'JOIN patients p ON p.id = a.patient_id'),
+        'doctor_name': ('doctors', 'JOIN doctors d ON d.id = a.doctor_id'),
+        'doctor_specialization': ('doctors', 'JOIN doctors d ON d.id = a.doctor_id'),
+    }, default_fields=('id', 'patient_id', 'doctor_id', 'appointment_date', 'fee', 'status', 'notes',
+                       'created_at', 'updated_at')),
+}
+
+
+def parse_fields(resource, value, unavailable=()):
+    """
+    Fields a request selected with ?fields=a,b,c
+    Args: resource (Resource), value (str): Comma separated names, or empty for the defaults,
+          unavailable (tuple): Fields this database cannot serve
+    Returns: tuple of field names in the order given
+    Raises: ValueError naming the unknown fields
+    """
+    if not value:
+        return tuple(field for field in resource.default_fields if field not in unavailable)
+    fields = tuple(dict.fromkeys(part.strip() for part in value.split(',') if part.strip()))
+    unknown = [field for field in fields if field not in resource.fields or field in unavailable]
+    if unknown or not fields:
+        raise ValueError(f"Unknown fields: {', '.join(unknown) or value}; "
+                         f"use {', '.join(field for field in resource.fields if field not in unavailable)}")
+    return fields
+
+
+def parse_updated_since(value):
+    """
+    Args: value (str): ISO date or datetime; an offset is converted to the server's local time,
+          which is what the TIMESTAMP columns are returned in
+    Returns: naive datetime, or None when empty
+    Raises: ValueError if malformed
+    """
+    if not value:
+        return None
+    since = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if since.tzinfo is not None:
+        since = since.astimezone().replace(tzinfo=None)
+    return since
+
+
+def filters(resource_name, args):
+    """
+    WHERE predicates for a list request
+    Args: resource_name (str): Key of RESOURCES, args: Query arguments -
+          doctors: specialization; appointments: start, end (inclusive YYYY-MM-DD), doctor_id,
+          patient_id, status; all: updated_since
+    Returns: (where, params, first_day) - first_day bounds appointment_date from below (or None)
+    Raises: ValueError with a message for the client
+    """
+    where, params, first_day = [], [], None
+    if resource_name == 'doctors' and args.get('specialization'):
+        where.append("a.specialization = %s")
+        params.append(args['specialization'])
+    if resource_name == 'appointments':
+        try:
+            first_day = date.fromisoformat(args['start']) if args.get('start') else None
+            last_day = date.fromisoformat(args['end']) if args.get('end') else None
+        except ValueError:
+            raise ValueError('start and end must be dates in YYYY-MM-DD format')
+        # Half-open ranges on the datetime column so idx_appointment_date can be used
+        if first_day:
+            where.append("a.appointment_date >= %s")
+            params.append(first_day)
+        if last_day:
+            where.append("a.appointment_date < %s")
+            params.append(last_day + timedelta(days=1))
+        for name in ('doctor_id', 'patient_id'):
+            if args.get(name):
+                if not args[name].isdigit():
+                    raise ValueError(f'{name} must be a number')
+                where.append(f"a.{name} = %s")
+                params.append(int(args[name]))
+        if args.get('status'):
+            if args['status'] not in STATUSES:
+                raise ValueError(f"status must be {', '.join(STATUSES[:-1])} or {STATUSES[-1]}")
+            where.append("a.status = %s")
+            params.append(args['status'])
+    try:
+        since = parse_updated_since(args.get('updated_since', ''))
+    except ValueError:
+        raise ValueError('updated_since must be an ISO date or datetime, e.g. 2025-03-14T09:30:00')
+    if since is not None:
+        where.append("a.updated_at >= %s")
+        params.append(since)
+    return where, params, first_day
+
+
+def list_query(resource, fields, source, keyset, where, params, after=None, per_page=100):
+    """
+    SQL for one keyset page of a resource. When source is archive.BOTH the two tables are
+    paged separately inside the UNION ALL rather than sorting every matching row of both
+    Returns: (query, params) for pagination.page_from_rows
+    Raises: InvalidCursor if the cursor is malformed
+    """
+    if source == archive.BOTH:
+        return union_page_query([resource.select(fields, archive.HOT), resource.select(fields, archive.ARCHIVE)],
+                                keyset, where, params, after=after, per_page=per_page)
+    return page_query(resource.select(fields, source), keyset, where, params, after=after, per_page=per_page)
+
+
+def item_query(resource, fields, source, row_id):
+    """
+    SQL reading one row by id, looked up in each table on its own when source is archive.BOTH
+    Returns: (query, params)
+    """
+    if source == archive.BOTH:
+        return (f"({resource.select(fields, archive.HOT)} WHERE a.id = %s) UNION ALL "
+                f"({resource.select(fields, archive.ARCHIVE)} WHERE a.id = %s)", (row_id, row_id))
+    return resource.select(fields, source) + " WHERE a.id = %s", (row_id,)
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (bytes, bytearray)):
+        return value.decode('utf-8', 'replace')
+    raise TypeError(f'{type(value).__name__} is not JSON serialisable')
+
+
+_encode = json.JSONEncoder(default=_json_default, ensure_ascii=False, separators=(',', ':')).encode
+
+
+def rows_json(rows, fields):
+    """
+    Rows (named tuples) as a list of objects holding only the selected fields
+    """
+    return [{field: getattr(row, field) for field in fields} for row in rows]
+
+
+def dumps(payload):
+    """
+    Compact JSON text for a response body; dates and datetimes as ISO 8601, decimals as strings
+    """
+    return _encode(payload)
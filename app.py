@@ -4,13 +4,37 @@ Author: HMS Development Team
 Description: Complete hospital management system with patient, doctor, and appointment management
 """
 
-from flask import Flask, render_template, request, redirect, url_for, session, flash, make_response
+from flask import Flask, render_template, request, redirect, url_for, session, flash, make_response, jsonify, Response, send_from_directory, send_file
+from flask import g, has_request_context, before_render_template, template_rendered
+from markupsafe import Markup
 import mysql.connector
 from mysql.connector import Error
-from datetime import datetime, date
+from datetime import datetime, date, timedelta, timezone
+import atexit
 import hashlib
-from xhtml2pdf import pisa
+import time
 import io
+import os
+import tempfile
+import uuid
+from collections import Counter
+from db_pool import ConnectionPool, ReplicaRouter, PoolTimeoutError
+from pagination import Keyset, Page, InvalidCursor, fetch_page, page_from_rows, approximate_count
+from report_jobs import REPORTS, ReportJobQueue
+from cache import TTLCache, QueryCache
+from search_index import PatientSearchIndex, indexable
+from scheduling import SchedulingEngine
+from bulk_import import TABLES as IMPORT_TABLES, BulkImporter, CSVImportError
+from data_export import FORMATS as EXPORT_FORMATS, export_chunks
+from metrics import MetricsRegistry, InstrumentedCursor, COUNT_BUCKETS
+from assets import AssetPipeline, accepted_encoding, compress
+from audit import AuditLog
+import dal
+import rollups
+import analytics
+import archive
+import api
+from dal import PreparedCursor
 
 # Initialize Flask application
 app = Flask(__name__)
@@ -27,16 +51,251 @@ DB_CONFIG = {
     'raise_on_warnings': True
 }
 
-def get_db_connection():
+# Connection pool configuration - size it from the /pool-stats numbers under load
+POOL_CONFIG = {
+    'size': 10,                 # Maximum open connections per worker process
+    'borrow_timeout': 5.0,      # Seconds a request waits for a free connection
+    'max_age': 1800.0,          # Recycle connections older than this (seconds)
+    'health_check_after': 5.0   # Ping connections idle longer than this before reuse
+}
+
+db_pool = ConnectionPool(DB_CONFIG, **POOL_CONFIG)
+
+# Read replicas - list pages, the dashboard, searches, exports and PDF reports read from them.
+# Each entry overrides DB_CONFIG for one replica, e.g. {'host': 'db-replica-1'}, or
+# {'port': 3307} for a second local instance. Empty: everything runs on DB_CONFIG.
+REPLICA_HOSTS = []
+REPLICA_CONFIG = {
+    'check_interval': 10.0,     # Seconds between health and lag checks of a replica
+    'max_lag': 30,              # Replicas further behind than this (seconds) are skipped
+    'borrow_timeout': 0.5,      # Seconds to wait for a busy replica before trying the next one or the primary
+    'sticky_seconds': 30        # Reads stay on the primary this long after a session writes (keep >= max_lag)
+}
+
+replicas = ReplicaRouter(db_pool, [dict(DB_CONFIG, **overrides) for overrides in REPLICA_HOSTS],
+                         check_interval=REPLICA_CONFIG['check_interval'], max_lag=REPLICA_CONFIG['max_lag'],
+                         replica_timeout=REPLICA_CONFIG['borrow_timeout'], **POOL_CONFIG)
+
+# Async serving mode (async_app.py) - aiomysql pool used by the coroutine read routes
+ASYNC_CONFIG = {
+    'pool_min': 2,
+    'pool_max': 20,             # The dashboard holds four connections while its queries run side by side
+    'borrow_timeout': POOL_CONFIG['borrow_timeout'],
+    'pool_recycle': int(POOL_CONFIG['max_age']),
+    'wsgi_threads': 16,         # Threads running the synchronous routes next to the event loop
+    'max_body_mb': 64           # Request body buffered for a Flask route (never below IMPORT_CONFIG['max_upload_mb'])
+}
+
+# List page pagination
+PAGINATION_CONFIG = {
+    'per_page': 25,         # Default rows per page
+    'max_per_page': 200,    # Upper bound for the ?per_page= override
+    'approx_total': True    # Show an estimated total on unfiltered lists
+}
+
+# Dashboard statistics are cached briefly; writes in this process clear them at once
+DASHBOARD_CACHE_TTL = 30  # seconds
+dashboard_cache = TTLCache(DASHBOARD_CACHE_TTL, max_entries=4)
+
+# Patient search index - rebuilt in the background so other workers' writes show up
+SEARCH_INDEX_REFRESH = 300  # seconds
+
+# Typeahead lookups for the appointment forms
+TYPEAHEAD_CONFIG = {
+    'limit': 10,        # Default number of matches returned
+    'max_limit': 50,    # Upper bound for the ?limit= override
+    'cache_ttl': 60     # Seconds a lookup result is reused
+}
+patient_typeahead_cache = TTLCache(TYPEAHEAD_CONFIG['cache_ttl'], max_entries=2048)
+doctor_typeahead_cache = TTLCache(TYPEAHEAD_CONFIG['cache_ttl'], max_entries=512)
+
+# Result cache for read-mostly queries (doctors, specializations, detail lookups)
+QUERY_CACHE_CONFIG = {
+    'max_entries': 2048,    # LRU capacity
+    'max_rows': 5000,       # Larger results are not cached
+    'ttl': 300              # Upper bound on staleness from other worker processes (seconds)
+}
+query_cache = QueryCache(**QUERY_CACHE_CONFIG)
+
+# Conditional GET for list and detail pages, plus a cache of rendered list tables.
+# Both are keyed by the table versions (migration 002) every write bumps (dal.touch_tables).
+CONDITIONAL_GET_CONFIG = {
+    'enabled': True,
+    'fragment_entries': 512,    # Rendered list tables kept
+    'fragment_ttl': 600         # Seconds; versions already invalidate them on every write
+}
+fragment_cache = QueryCache(max_entries=CONDITIONAL_GET_CONFIG['fragment_entries'],
+                            ttl=CONDITIONAL_GET_CONFIG['fragment_ttl'])
+
+# Appointment scheduling - every visit occupies one fixed-length slot
+SCHEDULE_CONFIG = {
+    'visit_minutes': 30,        # Length of one visit; overlapping visits are rejected
+    'day_start': '09:00',       # First bookable slot
+    'day_end': '17:00',         # Visits must end by this time
+    'refresh_interval': 60,     # Seconds before a doctor's schedule is reloaded (bookings re-check the database)
+    'max_range_days': 31        # Longest date range the free slots API returns
+}
+
+# Bulk appointment actions (POST /appointments/bulk) - one statement and one transaction per request
+BULK_CONFIG = {
+    'max_ids': 1000     # Appointments one request may change; larger selections or filters are refused
+}
+
+# Appointment statistics API (answered from appointment_daily_rollup, migration 003)
+STATS_CONFIG = {
+    'max_range_days': 1096,     # Longest date range one request may summarise
+    'default_days': 30          # Range ending today when no start is given
+}
+
+# Versioned JSON API for integrations (/api/v1, api.py)
+API_CONFIG = {
+    'per_page': 100,        # Default rows per page
+    'max_per_page': 1000    # Upper bound for the ?per_page= override
+}
+
+# Revenue and utilisation analytics (analytics.py) - a columnar snapshot of appointments,
+# loaded from a replica and rebuilt in the background; needs numpy
+ANALYTICS_CONFIG = {
+    'refresh_interval': 600,    # Seconds between snapshot rebuilds (how far the figures may lag)
+    'chunk_rows': 100000,       # Rows per fetch while loading the snapshot
+    'weekmask': '1111100',      # Working weekdays, Monday first, for utilisation
+    'default_months': 12,       # Months ending with the current one when no start is given
+    'max_range_days': 3660,     # Longest date range one request may cover
+    'top_doctors': 50           # Doctors listed, highest revenue first
+}
+
+# Appointment archive (migration 006) - scripts/archive_appointments.py, run nightly, moves whole
+# months older than the retention to appointments_archive; lists and reports read it only for older dates
+ARCHIVE_CONFIG = {
+    'retention_months': 13,     # Months kept in appointments besides the current one
+    'chunk_rows': 5000          # Appointments moved per transaction
+}
+
+# Bulk CSV import (large files: use scripts/import_csv.py, which can resume)
+IMPORT_CONFIG = {
+    'chunk_size': 10000,    # Rows per transaction
+    'batch_size': 1000,     # Rows per executemany() call
+    'report_dir': os.path.join(tempfile.gettempdir(), 'hms_import_reports'),  # Rejected-row CSVs
+    'errors_shown': 50,     # Rejected rows listed on the results page
+    'max_upload_mb': 64     # Largest request body accepted (Flask answers 413 above it)
+}
+app.config['MAX_CONTENT_LENGTH'] = IMPORT_CONFIG['max_upload_mb'] * 1024 * 1024
+
+# CSV/NDJSON data exports
+EXPORT_CONFIG = {
+    'fetch_size': 2000,     # Rows fetched per round trip from the unbuffered cursor
+    'chunk_size': 65536     # Characters per response chunk
+}
+
+# PDF reports render in worker processes; finished files are reused until the data changes
+REPORT_JOB_CONFIG = {
+    'workers': 2,           # Reports rendered at the same time
+    'cache_dir': os.path.join(tempfile.gettempdir(), 'hms_reports'),
+    'max_cached': 200,      # Rendered reports kept on disk
+    'fetch_size': 1000      # Rows per round trip while rendering
+}
+report_queue = ReportJobQueue(DB_CONFIG, **REPORT_JOB_CONFIG)
+
+# Audit trail of patient, doctor and appointment writes (audit_log table, migration 005).
+# Routes only queue the entries; a background thread inserts them in batches.
+AUDIT_CONFIG = {
+    'enabled': True,        # False stops recording (and the extra row reads) entirely
+    'max_queue': 10000,     # Entries held in memory while the writer catches up
+    'batch_size': 500,      # Entries per INSERT
+    'flush_interval': 1.0,  # Seconds the writer idles before retrying spilled entries
+    'put_timeout': 0.001,   # Seconds a request waits for queue space before spilling to disk
+    'spill_path': os.path.join(tempfile.gettempdir(), 'hms_audit_spill.jsonl')  # Unwritten entries, replayed later
+}
+audit_log = AuditLog(lambda: mysql.connector.connect(**DB_CONFIG), max_queue=AUDIT_CONFIG['max_queue'],
+                     batch_size=AUDIT_CONFIG['batch_size'], flush_interval=AUDIT_CONFIG['flush_interval'],
+                     put_timeout=AUDIT_CONFIG['put_timeout'], spill_path=AUDIT_CONFIG['spill_path'])
+atexit.register(audit_log.close)
+
+# Static assets - fingerprinted copies under /assets are cached by browsers for a year
+JSDELIVR = 'https://cdn.jsdelivr.net/npm'
+ASSET_CONFIG = {
+    'build_dir': os.path.join(tempfile.gettempdir(), 'hms_assets'),  # Fingerprinted and precompressed copies
+    'max_age': 365 * 24 * 3600,
+    'cdn_fallback': False,  # True serves vendor files not downloaded yet from the CDN (development only)
+    # Vendored files -> URL scripts/vendor_assets.py downloads them from; the asset build fails without them
+    'vendor': {
+        'vendor/bootstrap/css/bootstrap.min.css': f'{JSDELIVR}/bootstrap@5.1.3/dist/css/bootstrap.min.css',
+        'vendor/bootstrap/js/bootstrap.bundle.min.js': f'{JSDELIVR}/bootstrap@5.1.3/dist/js/bootstrap.bundle.min.js',
+        'vendor/bootstrap-icons/bootstrap-icons.css': f'{JSDELIVR}/bootstrap-icons@1.7.2/font/bootstrap-icons.css',
+        'vendor/bootstrap-icons/fonts/bootstrap-icons.woff2':
+            f'{JSDELIVR}/bootstrap-icons@1.7.2/font/fonts/bootstrap-icons.woff2',
+        'vendor/bootstrap-icons/fonts/bootstrap-icons.woff': f'{JSDELIVR}/bootstrap-icons@1.7.2/font/fonts/bootstrap-icons.woff',
+    }
+}
+if ASSET_CONFIG['cdn_fallback']:
+    assets = AssetPipeline(os.path.join(app.root_path, 'static'), ASSET_CONFIG['build_dir'],
+                           fallbacks=ASSET_CONFIG['vendor'])
+else:
+    assets = AssetPipeline(os.path.join(app.root_path, 'static'), ASSET_CONFIG['build_dir'],
+                           required=tuple(ASSET_CONFIG['vendor']))
+app.add_template_global(assets.url, 'asset_url')
+
+# On-the-fly compression of dynamic responses (brotli needs the optional brotli package)
+COMPRESSION_CONFIG = {
+    'enabled': True,
+    'min_size': 1024,       # Bytes; smaller bodies are sent as they are
+    'mimetypes': ('text/html', 'application/json', 'text/plain'),
+    'gzip_level': 6,        # Per-request settings favour speed; assets are precompressed at maximum
+    'brotli_quality': 5
+}
+
+# Instrumentation - request, query, template and report timings served at /metrics
+METRICS_CONFIG = {
+    'enabled': True,        # False removes every instrumentation hook
+    'token': None,          # If set, /metrics requires "Authorization: Bearer <token>"
+    'server_timing': True   # Add a Server-Timing header (app and db time) to responses
+}
+metrics = MetricsRegistry()
+request_seconds = metrics.histogram('hms_request_duration_seconds', 'Time to produce a response',
+                                    ('endpoint', 'method', 'status'))
+request_db_queries = metrics.histogram('hms_request_db_queries', 'Database queries run by one request',
+                                       ('endpoint',), buckets=COUNT_BUCKETS)
+request_db_seconds = metrics.histogram('hms_request_db_seconds', 'Time one request spent in database calls',
+                                       ('endpoint',))
+db_query_seconds = metrics.histogram('hms_db_query_duration_seconds', 'Duration of execute() calls',
+                                     ('operation',))
+template_seconds = metrics.histogram('hms_template_render_seconds', 'Template rendering time', ('template',))
+report_seconds = metrics.histogram('hms_report_render_seconds', 'PDF report query and render time in the worker',
+                                   ('kind',))
+report_jobs_total = metrics.counter('hms_report_jobs_total', 'Finished report jobs', ('kind', 'status'))
+
+# Sort orders for the list pages. InnoDB secondary indexes carry the primary key,
+# so idx_name and idx_appointment_date already cover the (key, id) seek.
+PATIENT_KEYSET = Keyset(('name', 'name', 'ASC'), ('id', 'id', 'ASC'))
+# The patient list shows the appointment counters, which have their own version (rollups.py)
+PATIENT_LIST_TABLES = ('patients', rollups.COUNTER_VERSION)
+DOCTOR_KEYSET = Keyset(('name', 'name', 'ASC'), ('id', 'id', 'ASC'))
+APPOINTMENT_KEYSET = Keyset(('a.appointment_date', 'appointment_date', 'DESC'), ('a.id', 'id', 'DESC'))
+
+# Patient list orders on the appointment counters stored on patients (migration 004),
+# each with its own index. Orders on a nullable counter list only patients that have one.
+PATIENT_SORTS = {
+    'name': (PATIENT_KEYSET, None),
+    'most_appointments': (Keyset(('total_appointments', 'total_appointments', 'DESC'), ('id', 'id', 'DESC')), None),
+    'recent_visit': (Keyset(('last_appointment', 'last_appointment', 'DESC'), ('id', 'id', 'DESC')),
+                     'last_appointment IS NOT NULL'),
+    'next_visit': (Keyset(('next_scheduled_appointment', 'next_scheduled_appointment', 'ASC'), ('id', 'id', 'ASC')),
+                   'next_scheduled_appointment IS NOT NULL'),
+}
+
+def get_db_connection(read_only=False):
     """
-    Create and return a database connection
-    Returns: MySQL connection object or None if connection fails
+    Borrow a database connection from the pool
+    Calling close() on the returned connection hands it back to the pool
+    Args: read_only (bool): The caller only runs SELECTs, so a replica will do
+    Returns: Pooled MySQL connection object or None if no connection is available
     """
     try:
-        connection = mysql.connector.connect(**DB_CONFIG)
-        if connection.is_connected():
-            print("Successfully connected to MySQL database")
-            return connection
+        if read_only and reads_from_replica():
+            return replicas.get_connection()
+        return db_pool.get_connection()
+    except PoolTimeoutError as e:
+        print(f"Database pool exhausted: {e}")
     except mysql.connector.Error as e:
         print(f"Error connecting to MySQL: {e}")
         if e.errno == mysql.connector.errorcode.ER_ACCESS_DENIED_ERROR:
@@ -49,6 +308,460 @@ def get_db_connection():
         print(f"General error: {e}")
     return None
 
+def db_connection(read_only=False):
+    """
+    Context manager version of get_db_connection for new code
+    Usage: with db_connection() as connection: ...
+    Raises: PoolTimeoutError or mysql.connector.Error if no connection is available
+    """
+    if read_only and reads_from_replica():
+        return replicas.connection()
+    return db_pool.connection()
+
+def reads_from_replica():
+    """
+    False for a while after the current session wrote, so it reads its own
+    writes from the primary instead of a replica that has not caught up yet
+    """
+    if not has_request_context():
+        return True
+    return session.get('primary_until', 0) <= time.time()
+
+def note_write():
+    if replicas.replicas and has_request_context():
+        session['primary_until'] = time.time() + REPLICA_CONFIG['sticky_seconds']
+
+class QueryStream:
+    """
+    Iterate over a large result set without loading it into memory.
+    Uses an unbuffered cursor and fetches rows in batches; the cursor and the
+    connection are released when iteration ends or close() is called.
+    """
+
+    def __init__(self, connection, query, params=(), batch_size=1000, dictionary=True):
+        self.connection = connection
+        self.batch_size = batch_size
+        self.cursor = connection.cursor(dictionary=dictionary)
+        try:
+            self.cursor.execute(query, params)
+        except Exception:
+            self.close()
+            raise
+
+    def __iter__(self):
+        try:
+            while self.cursor is not None:
+                batch = self.cursor.fetchmany(self.batch_size)
+                if not batch:
+                    break
+                yield from batch
+        finally:
+            self.close()
+
+    def close(self):
+        cursor, self.cursor = self.cursor, None
+        if cursor is not None:
+            try:
+                cursor.close()
+            except Exception:
+                pass  # Stream abandoned with rows unread - the pool discards the connection
+            finally:
+                self.connection.close()
+
+def load_patient_search_rows():
+    """
+    Stream (id, name, phone) for every patient to build the search index
+    """
+    return QueryStream(replicas.get_connection(), "SELECT id, name, phone FROM patients", dictionary=False)
+
+patient_search_index = PatientSearchIndex(load_patient_search_rows, refresh_interval=SEARCH_INDEX_REFRESH)
+
+def search_patients(cursor, search, limit):
+    """
+    Ranked patient search through the trigram index
+    Args: cursor: Open PreparedCursor, search (str): Name or phone text, limit (int): Maximum results
+    Returns: list of patient rows, best match first
+    """
+    ids = patient_search_index.search(search, limit=limit)
+    if not ids:
+        return []
+    placeholders = ', '.join(['%s'] * len(ids))
+    cursor.execute(f"SELECT * FROM patients WHERE id IN ({placeholders})", tuple(ids))
+    rows_by_id = {row.id: row for row in cursor.fetchall()}
+    return [rows_by_id[patient_id] for patient_id in ids if patient_id in rows_by_id]
+
+def load_doctor_schedule(cursor, doctor_id):
+    """
+    Fetch (id, appointment_date) of a doctor's scheduled appointments
+    Reads only idx_doctor_status_date, so completed and cancelled history is never scanned
+    """
+    cursor.execute("""SELECT id, appointment_date FROM appointments
+                      WHERE doctor_id = %s AND status = 'Scheduled'""", (doctor_id,))
+    return [(row['id'], row['appointment_date']) if isinstance(row, dict) else tuple(row)
+            for row in cursor.fetchall()]
+
+def locked_conflicts(cursor, doctor_id, start, exclude_id=None):
+    """
+    Scheduled appointments of the doctor overlapping a visit at start, read from the database
+    inside the write transaction. The doctor's row stays locked until commit or rollback, so a
+    request in another worker process booking the same doctor waits here instead of passing
+    its own in-memory check (scheduler.conflicts() is only the fast pre-check).
+    Returns: list of conflicting appointment ids
+    """
+    visit = timedelta(minutes=SCHEDULE_CONFIG['visit_minutes'])
+    cursor.execute("SELECT id FROM doctors WHERE id = %s FOR UPDATE", (doctor_id,))
+    cursor.fetchall()
+    # Locking read, so it sees rows committed since the transaction began (idx_doctor_status_date)
+    cursor.execute("""SELECT id FROM appointments
+                      WHERE doctor_id = %s AND status = 'Scheduled'
+                        AND appointment_date > %s AND appointment_date < %s AND id <> %s
+                      FOR UPDATE""", (doctor_id, start - visit, start + visit, exclude_id or 0))
+    return [row['id'] if isinstance(row, dict) else row[0] for row in cursor.fetchall()]
+
+scheduler = SchedulingEngine(load_doctor_schedule,
+                             **{key: value for key, value in SCHEDULE_CONFIG.items() if key != 'max_range_days'})
+
+def load_analytics_snapshot():
+    """
+    Bulk-load the appointment columns for analytics, off the primary when a replica is healthy
+    """
+    connection = replicas.get_connection()
+    try:
+        return analytics.load_snapshot(connection, ANALYTICS_CONFIG['chunk_rows'])
+    finally:
+        connection.close()
+
+appointment_analytics = analytics.AppointmentAnalytics(load_analytics_snapshot,
+                                                       refresh_interval=ANALYTICS_CONFIG['refresh_interval'])
+
+def get_analytics_args(args):
+    """
+    Parse the analytics filters shared by the page and the JSON API
+    Query args: start, end (str): Inclusive range YYYY-MM-DD, bucket (str): day, week or month,
+                doctor_id (int), specialization (str)
+    Returns: dict of analytics.summarise() keyword arguments
+    Raises: ValueError with a message for the user
+    """
+    try:
+        last_day = date.fromisoformat(args.get('end') or date.today().isoformat())
+        months_back = last_day.year * 12 + last_day.month - ANALYTICS_CONFIG['default_months']
+        default_start = date(months_back // 12, months_back % 12 + 1, 1)
+        first_day = date.fromisoformat(args.get('start') or default_start.isoformat())
+    except ValueError:
+        raise ValueError('start and end must be dates in YYYY-MM-DD format')
+    if last_day < first_day or (last_day - first_day).days >= ANALYTICS_CONFIG['max_range_days']:
+        raise ValueError(f"Date range must cover 1 to {ANALYTICS_CONFIG['max_range_days']} days")
+    bucket = args.get('bucket') or 'month'
+    if bucket not in analytics.BUCKETS:
+        raise ValueError(f"bucket must be one of {', '.join(analytics.BUCKETS)}")
+    visit = timedelta(minutes=SCHEDULE_CONFIG['visit_minutes'])
+    opening = datetime.strptime(SCHEDULE_CONFIG['day_end'], '%H:%M') - datetime.strptime(SCHEDULE_CONFIG['day_start'], '%H:%M')
+    return {
+        'first_day': first_day,
+        'last_day': last_day,
+        'bucket': bucket,
+        'doctor_id': args.get('doctor_id', type=int),
+        'specialization': args.get('specialization') or None,
+        'slots_per_day': opening // visit,
+        'weekmask': ANALYTICS_CONFIG['weekmask'],
+        'top_doctors': ANALYTICS_CONFIG['top_doctors'],
+    }
+
+def parse_appointment_datetime(appointment_date, appointment_time):
+    """
+    Combine the form's date and time fields
+    Returns: datetime, or None if either field is malformed
+    """
+    try:
+        return datetime.fromisoformat(f"{appointment_date}T{appointment_time}")
+    except ValueError:
+        return None
+
+def conflict_message(cursor, conflicts):
+    """
+    Describe the first conflicting appointment for a flash message
+    """
+    cursor.execute("""SELECT a.appointment_date, d.name AS doctor_name FROM appointments a
+                      JOIN doctors d ON a.doctor_id = d.id WHERE a.id = %s""", (conflicts[0],))
+    row = cursor.fetchone()
+    if not row:
+        return 'The doctor already has an appointment at that time.'
+    if not isinstance(row, dict):
+        row = {'appointment_date': row[0], 'doctor_name': row[1]}
+    return (f"{row['doctor_name']} already has an appointment at "
+            f"{row['appointment_date'].strftime('%Y-%m-%d %H:%M')} "
+            f"({SCHEDULE_CONFIG['visit_minutes']} minute visits). Please choose another time.")
+
+def invalidate_tables(*tables):
+    """
+    Drop cached data derived from the given tables after a successful write
+    Args: tables (str): Names of the tables that were modified
+    """
+    note_write()
+    if 'appointments' in tables:
+        tables += (rollups.COUNTER_VERSION,)  # Appointment writes refresh the patient counters
+    query_cache.bump(*tables)
+    fragment_cache.bump(*tables)
+    if {'patients', 'doctors', 'appointments'} & set(tables):
+        dashboard_cache.clear()
+    if 'patients' in tables:
+        patient_typeahead_cache.clear()
+    if 'doctors' in tables:
+        doctor_typeahead_cache.clear()
+
+def audit_row(connection, table, row_id):
+    """
+    Current version of a row for the audit log, read on the route's connection
+    Args: table (str): patients, doctors or appointments, row_id (int): Primary key
+    Returns: dict, or None if the row does not exist or auditing is off
+    """
+    if not AUDIT_CONFIG['enabled']:
+        return None
+    cursor = connection.cursor(dictionary=True)
+    try:
+        cursor.execute(f"SELECT * FROM {table} WHERE id = %s", (row_id,))
+        return cursor.fetchone()
+    finally:
+        cursor.close()
+
+def audit(action, table, row_id, before=None, after=None):
+    """
+    Queue an audit entry for a committed write, attributed to the logged-in user
+    Args: action (str): create, update, complete, cancel, delete or import,
+          before, after (dict): Row before and after the write (audit_row)
+    """
+    if AUDIT_CONFIG['enabled']:
+        audit_log.record(action, table, row_id, before, after, user_id=session.get('user_id'),
+                         username=session.get('username'), remote_addr=request.remote_addr)
+
+def load_table_state(cursor, tables):
+    """
+    Read the version and last change time of each table (bumped by dal.touch_tables)
+    Returns: dict table -> (version, UTC datetime of the last change),
+             or None if table_versions is missing (migration 002 not run)
+    """
+    try:
+        cursor.execute(*table_state_query(tables))
+    except Error as e:
+        if e.errno == mysql.connector.errorcode.ER_NO_SUCH_TABLE:
+            print("table_versions is missing - run scripts/migrations/002_table_versions.sql")
+            return None
+        raise
+    return table_state_from_rows(cursor.fetchall())
+
+def table_state_query(tables):
+    """
+    Returns: (sql, params) reading the table_versions rows of tables
+    """
+    placeholders = ', '.join(['%s'] * len(tables))
+    return (f"""SELECT table_name, version, UNIX_TIMESTAMP(updated_at) FROM table_versions
+                WHERE table_name IN ({placeholders})""", tuple(tables))
+
+def table_state_from_rows(rows):
+    return {name: (int(version), datetime.fromtimestamp(float(changed), timezone.utc))
+            for name, version, changed in rows}
+
+def load_table_versions(cursor, tables):
+    """
+    Read the version of each table (bumped by dal.touch_tables)
+    Returns: dict table -> version, or None if table_versions is missing (migration 002 not run)
+    """
+    state = load_table_state(cursor, tables)
+    return None if state is None else {name: version for name, (version, _) in state.items()}
+
+def code_fingerprint():
+    """
+    Changes whenever a template or module changes, so a deploy invalidates every ETag
+    """
+    root = os.path.dirname(os.path.abspath(__file__))
+    digest = hashlib.sha1()
+    for folder, suffix in ((root, '.py'), (os.path.join(root, 'templates'), '.html')):
+        for name in sorted(os.listdir(folder)):
+            if name.endswith(suffix):
+                info = os.stat(os.path.join(folder, name))
+                digest.update(f'{name}:{info.st_mtime_ns}:{info.st_size};'.encode())
+    return digest.hexdigest()[:12]
+
+CODE_FINGERPRINT = code_fingerprint()
+
+def page_validators(cursor, tables, *key):
+    """
+    Version-based validators for a page built from tables
+    Args: cursor: Open cursor, tables (tuple): Tables the page shows, key: Request parameters shaping the page
+    Returns: (versions, etag, last_modified) - versions is None without table_versions;
+             etag and last_modified are None when the page must not be revalidated
+             (conditional GET disabled, or one-time flash messages waiting to be shown)
+    """
+    if not CONDITIONAL_GET_CONFIG['enabled']:
+        return None, None, None
+    return validators_from_state(load_table_state(cursor, tables), tables, request.endpoint, key, session)
+
+def validators_from_state(state, tables, endpoint, key, session_data):
+    """
+    The page_validators result for table state already read (shared with async_app.py)
+    Args: session_data: The current session (Flask or Quart)
+    """
+    if not state:
+        return None, None, None
+    versions = tuple(state[table][0] if table in state else None for table in tables)
+    if session_data.get('_flashes'):
+        return versions, None, None
+    etag = hashlib.sha1(repr((endpoint, key, versions, session_data.get('user_id'),
+                              CODE_FINGERPRINT)).encode()).hexdigest()[:24]
+    last_modified = max(changed for _, changed in state.values()).replace(microsecond=0)
+    return versions, etag, last_modified
+
+def client_is_current(req, etag, last_modified):
+    """
+    True if the request's If-None-Match (or else If-Modified-Since) matches the page
+    """
+    if req.if_none_match:
+        return req.if_none_match.contains_weak(etag)
+    return req.if_modified_since is not None and last_modified <= req.if_modified_since
+
+def not_modified(etag, last_modified):
+    """
+    Answer 304 if the client's copy is current (If-None-Match wins over If-Modified-Since)
+    Returns: 304 response or None
+    """
+    if etag is None or not client_is_current(request, etag, last_modified):
+        return None
+    response = Response(status=304)
+    return with_validators(response, etag, last_modified)
+
+def with_validators(response, etag, last_modified):
+    """
+    Add ETag/Last-Modified and make browsers revalidate before reusing the page
+    """
+    if etag is None:
+        return response
+    response.set_etag(etag, weak=True)
+    response.last_modified = last_modified
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+def cached_fragment(name, tables, versions, key, load):
+    """
+    Rendered list table from the fragment cache
+    Args: name (str): Fragment template, tables (tuple): Tables it shows, versions (tuple): Their
+          versions or None, key (tuple): Request parameters, load (callable): Returns the template context
+    Returns: Markup
+    """
+    html = fragment_cache.get_or_load((name, key, versions), tables,
+                                      lambda: render_template(name, **load()))
+    return Markup(html)
+
+def like_prefix(text):
+    """
+    Build a LIKE pattern matching values that start with text (wildcards escaped)
+    """
+    escaped = text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return escaped + '%'
+
+def load_dashboard_stats(cursor, day):
+    """
+    Fetch all dashboard statistics in a single round trip
+    Args: cursor: Open database cursor, day (date): Day for the appointment count
+    Returns: dict of statistics
+    """
+    if rollups.available():
+        # Appointment figures come from the daily roll-up instead of scanning appointments
+        appointment_sql = f"({rollups.DAY_COUNT_SQL}) AS today_appointments, ({rollups.income_sql()}) AS total_income"
+        params = (day,)
+    else:
+        # Half-open datetime range keeps the predicate sargable on idx_appointment_date
+        start = datetime.combine(day, datetime.min.time())
+        appointment_sql = f"""(SELECT COUNT(*) FROM appointments
+                               WHERE appointment_date >= %s AND appointment_date < %s) AS today_appointments,
+                             (SELECT COALESCE(SUM(fee), 0) FROM {archive.source(cursor)} AS a) AS total_income"""
+        params = (start, start + timedelta(days=1))
+    try:
+        cursor.execute(f"""SELECT
+                            (SELECT COUNT(*) FROM patients) AS total_patients,
+                            (SELECT COUNT(*) FROM doctors) AS total_doctors,
+                            {appointment_sql}""", params)
+    except Error as e:
+        if rollups.missing_day_totals(e) or rollups.missing_table(e):
+            return load_dashboard_stats(cursor, day)
+        raise
+    total_patients, total_doctors, today_appointments, total_income = cursor.fetchone()
+    return {
+        'total_patients': total_patients,
+        'total_doctors': total_doctors,
+        'today_appointments': int(today_appointments),
+        'total_income': total_income
+    }
+
+def get_page_args(args=None):
+    """
+    Read pagination arguments from the query string
+    Args: args: Query arguments (default: the current Flask request's)
+    Returns: tuple (after, before, per_page)
+    """
+    args = request.args if args is None else args
+    per_page = args.get('per_page', PAGINATION_CONFIG['per_page'], type=int)
+    per_page = max(1, min(per_page, PAGINATION_CONFIG['max_per_page']))
+    return args.get('after', ''), args.get('before', ''), per_page
+
+def get_patient_list_args(args=None):
+    """
+    Read the patient list order and appointment counter filters from the query string
+    Args: args: Query arguments (default: the current Flask request's)
+    Returns: dict sort, min_appointments, inactive_since, upcoming - unusable values are dropped
+    """
+    args = request.args if args is None else args
+    options = {'sort': 'name', 'min_appointments': None, 'inactive_since': '', 'upcoming': ''}
+    if not rollups.patient_counters_available():
+        return options
+    if args.get('sort') in PATIENT_SORTS:
+        options['sort'] = args['sort']
+    min_appointments = args.get('min_appointments', type=int)
+    if min_appointments and min_appointments > 0:
+        options['min_appointments'] = min_appointments
+    try:
+        options['inactive_since'] = date.fromisoformat(args.get('inactive_since', '')).isoformat()
+    except ValueError:
+        pass
+    if args.get('upcoming') in ('yes', 'no'):
+        options['upcoming'] = args['upcoming']
+    return options
+
+def patient_list_query(options):
+    """
+    Sort order and predicates for a patient list
+    Args: options (dict): From get_patient_list_args
+    Returns: tuple (keyset, where, params) for fetch_page
+    """
+    keyset, required = PATIENT_SORTS[options['sort']]
+    where, params = [required] if required else [], []
+    if options['min_appointments']:
+        where.append("total_appointments >= %s")
+        params.append(options['min_appointments'])
+    if options['inactive_since']:
+        # No visit since the date, including patients who never had one
+        where.append("(last_appointment IS NULL OR last_appointment < %s)")
+        params.append(options['inactive_since'])
+    if options['upcoming']:
+        upcoming = f"next_scheduled_appointment IS {'NOT ' if options['upcoming'] == 'yes' else ''}NULL"
+        if upcoming not in where:
+            where.append(upcoming)
+    return keyset, where, params
+
+def set_page_urls(page, endpoint, url_builder=url_for, **filters):
+    """
+    Attach next/prev links to a page, keeping the current filters
+    Args: page (Page): Result page, endpoint (str): Route name,
+          url_builder (callable): url_for of the serving app, filters: Query arguments to keep
+    """
+    filters = {key: value for key, value in filters.items() if value}
+    if page.per_page != PAGINATION_CONFIG['per_page']:
+        filters['per_page'] = page.per_page
+    if page.has_next:
+        page.next_url = url_builder(endpoint, after=page.next_cursor, **filters)
+    if page.has_prev:
+        page.prev_url = url_builder(endpoint, before=page.prev_cursor, **filters)
+
 def hash_password(password):
     """
     Hash password using SHA-256
@@ -57,6 +770,112 @@ def hash_password(password):
     """
     return hashlib.sha256(password.encode()).hexdigest()
 
+def observe_query(operation, seconds, is_query):
+    """
+    Record one timed cursor call, globally and against the current request
+    """
+    if is_query:
+        db_query_seconds.observe(seconds, operation)
+    if has_request_context():
+        g.db_seconds = g.get('db_seconds', 0.0) + seconds
+        if is_query:
+            g.db_queries = g.get('db_queries', 0) + 1
+
+def observe_report(job):
+    report_jobs_total.inc(1, job.kind, job.status)
+    if job.render_seconds is not None:
+        report_seconds.observe(job.render_seconds, job.kind)
+
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+def observe_request(response):
+    """
+    Record request latency and database usage per endpoint
+    """
+    started = g.get('request_started')
+    if started is None:
+        return response
+    elapsed = time.perf_counter() - started
+    endpoint = request.endpoint or 'unmatched'
+    db_seconds, db_queries = g.get('db_seconds', 0.0), g.get('db_queries', 0)
+    request_seconds.observe(elapsed, endpoint, request.method, str(response.status_code))
+    request_db_queries.observe(db_queries, endpoint)
+    request_db_seconds.observe(db_seconds, endpoint)
+    if METRICS_CONFIG['server_timing']:
+        response.headers['Server-Timing'] = (f'app;dur={elapsed * 1000:.1f}, '
+                                             f'db;dur={db_seconds * 1000:.1f};desc="{db_queries} queries"')
+    return response
+
+def start_template_timer(sender, template, context, **extra):
+    g.template_started = time.perf_counter()
+
+def observe_template(sender, template, context, **extra):
+    started = g.pop('template_started', None)
+    if started is not None:
+        template_seconds.observe(time.perf_counter() - started, template.name or 'string')
+
+def pool_metrics():
+    """
+    Connection pool, query cache and report queue state read at scrape time
+    """
+    pool = db_pool.stats()
+    cache = query_cache.stats()
+    jobs = report_queue.stats()['jobs']
+    replica_stats = replicas.stats()
+    audit_stats = audit_log.stats()
+    return [
+        ('hms_db_pool_connections', 'gauge', 'Pooled connections by state',
+         [({'state': 'in_use'}, pool['in_use']), ({'state': 'idle'}, pool['idle'])]),
+        ('hms_db_pool_waiting', 'gauge', 'Requests waiting for a connection', [({}, pool['waiting'])]),
+        ('hms_db_pool_timeouts_total', 'counter', 'Borrows that timed out', [({}, pool['timeouts'])]),
+        ('hms_db_pool_connects_total', 'counter', 'Physical connections opened', [({}, pool['connects'])]),
+        ('hms_query_cache_lookups_total', 'counter', 'Query cache lookups by result',
+         [({'result': 'hit'}, cache['hits']), ({'result': 'miss'}, cache['misses'])]),
+        ('hms_db_replica_healthy', 'gauge', 'Whether reads are sent to a replica (1) or it is skipped (0)',
+         [({'replica': replica['name']}, int(replica['healthy'])) for replica in replica_stats['replicas']]),
+        ('hms_db_replica_fallbacks_total', 'counter', 'Reads sent to the primary because no replica was usable',
+         [({}, replica_stats['primary_fallbacks'])]),
+        ('hms_report_jobs', 'gauge', 'Report jobs known to this process by status',
+         [({'status': status}, count) for status, count in sorted(jobs.items())]),
+        ('hms_audit_queue_entries', 'gauge', 'Audit entries waiting for the background writer',
+         [({}, audit_stats['queued'])]),
+        ('hms_audit_entries_total', 'counter', 'Audit entries by outcome',
+         [({'outcome': outcome}, audit_stats[outcome]) for outcome in ('written', 'spilled', 'dropped')]),
+    ]
+
+if METRICS_CONFIG['enabled']:
+    db_pool.cursor_wrapper = lambda cursor: InstrumentedCursor(cursor, observe_query)
+    replicas.cursor_wrapper = db_pool.cursor_wrapper
+    report_queue.on_finished = observe_report
+    app.before_request(start_request_timer)
+    app.after_request(observe_request)
+    before_render_template.connect(start_template_timer, app)
+    template_rendered.connect(observe_template, app)
+    metrics.collector(pool_metrics)
+
+def compress_response(response):
+    """
+    Compress text responses for clients that accept gzip or brotli
+    Streamed responses (exports) and files (send_file) are left alone
+    """
+    if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSION_CONFIG['mimetypes']):
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = accepted_encoding(request.accept_encodings)
+    data = response.get_data()
+    if encoding is None or len(data) < COMPRESSION_CONFIG['min_size']:
+        return response
+    response.set_data(compress(data, encoding, COMPRESSION_CONFIG['gzip_level'],
+                               COMPRESSION_CONFIG['brotli_quality']))
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+if COMPRESSION_CONFIG['enabled']:
+    app.after_request(compress_response)
+
 @app.route('/')
 def index():
     """
@@ -71,19 +890,73 @@ def test_db():
     """
     Test database connection - Remove this in production
     """
-    connection = get_db_connection()
-    if connection:
-        try:
+    try:
+        with db_connection() as connection:
             cursor = connection.cursor()
             cursor.execute("SELECT 1")
             result = cursor.fetchone()
             cursor.close()
-            connection.close()
             return f"Database connection successful! Test query result: {result}"
-        except Error as e:
-            return f"Database connected but query failed: {e}"
-    else:
-        return "Database connection failed!"
+    except PoolTimeoutError as e:
+        return f"Database connection failed! {e}"
+    except Error as e:
+        return f"Database query failed: {e}"
+
+@app.route('/pool-stats')
+def pool_stats():
+    """
+    Connection pool metrics (in-use, waiting, borrow latency, connect rate) - Remove this in production
+    """
+    return jsonify(dict(db_pool.stats(), read_replicas=replicas.stats()))
+
+@app.route('/cache-stats')
+def cache_stats():
+    """
+    Query cache hit/miss/eviction counters and cache sizes - Remove this in production
+    """
+    return jsonify({
+        'query_cache': query_cache.stats(),
+        'dashboard_cache_entries': len(dashboard_cache),
+        'patient_typeahead_entries': len(patient_typeahead_cache),
+        'doctor_typeahead_entries': len(doctor_typeahead_cache),
+        'patient_search_index': patient_search_index.stats(),
+        'report_jobs': report_queue.stats(),
+        'static_assets': assets.stats(),
+        'appointment_analytics': appointment_analytics.stats(),
+        'audit_log': audit_log.stats()
+    })
+
+@app.route('/assets/<path:filename>')
+def static_asset(filename):
+    """
+    Fingerprinted static file - its name changes with its content, so it is cached for a year
+    Served from the precompressed copy when the client accepts brotli or gzip
+    """
+    asset = assets.lookup(filename)
+    if asset is None:
+        return 'Not found', 404
+    encoding = accepted_encoding(request.accept_encodings, tuple(asset.variants))
+    path = asset.variants[encoding][0] if encoding else asset.path
+    response = send_file(path, mimetype=asset.mimetype, conditional=True, max_age=ASSET_CONFIG['max_age'],
+                         etag=f"{asset.digest}-{encoding or 'identity'}")
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """
+    Prometheus metrics for this worker process (text exposition format)
+    """
+    if not METRICS_CONFIG['enabled']:
+        return 'Metrics are disabled', 404
+    token = METRICS_CONFIG['token']
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        return 'Unauthorized', 401
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
 
 @app.route('/login', methods=['GET', 'POST'])
 def login():
@@ -101,15 +974,14 @@ def login():
         connection = get_db_connection()
         if connection:
             try:
-                cursor = connection.cursor(dictionary=True)
-                query = "SELECT * FROM staff WHERE username = %s AND password = %s AND role = 'Admin'"
-                cursor.execute(query, (username, hashed_password))
+                cursor = PreparedCursor(connection)
+                cursor.execute(dal.STAFF_LOGIN, (username, hashed_password))
                 user = cursor.fetchone()
                 
                 if user:
                     # Login successful - create session
-                    session['user_id'] = user['id']
-                    session['username'] = user['username']
+                    session['user_id'] = user.id
+                    session['username'] = user.username
                     flash('Login successful!', 'success')
                     return redirect(url_for('dashboard'))
                 else:
@@ -143,7 +1015,6 @@ def dashboard():
     if 'user_id' not in session:
         return redirect(url_for('login'))
     
-    connection = get_db_connection()
     stats = {
         'total_patients': 0,
         'total_doctors': 0,
@@ -151,27 +1022,18 @@ def dashboard():
         'total_income': 0
     }
     
+    # Serve repeated refreshes from the cache; the key rolls over at midnight
+    today = date.today()
+    cached = dashboard_cache.get(today)
+    if cached:
+        return render_template('dashboard.html', stats=cached)
+    
+    connection = get_db_connection(read_only=True)
     if connection:
         try:
             cursor = connection.cursor()
-            
-            # Get total patients
-            cursor.execute("SELECT COUNT(*) FROM patients")
-            stats['total_patients'] = cursor.fetchone()[0]
-            
-            # Get total doctors
-            cursor.execute("SELECT COUNT(*) FROM doctors")
-            stats['total_doctors'] = cursor.fetchone()[0]
-            
-            # Get today's appointments
-            today = date.today()
-            cursor.execute("SELECT COUNT(*) FROM appointments WHERE DATE(appointment_date) = %s", (today,))
-            stats['today_appointments'] = cursor.fetchone()[0]
-            
-            # Get total income (sum of all appointment fees)
-            cursor.execute("SELECT SUM(fee) FROM appointments")
-            result = cursor.fetchone()[0]
-            stats['total_income'] = result if result else 0
+            stats = load_dashboard_stats(cursor, today)
+            dashboard_cache.set(today, stats)
             
         except Error as e:
             flash(f'Error fetching dashboard data: {e}', 'error')
@@ -190,26 +1052,55 @@ def patients():
         return redirect(url_for('login'))
     
     search = request.args.get('search', '')
-    patients_list = []
+    options = get_patient_list_args()
+    after, before, per_page = get_page_args()
+    key = (search, tuple(options.values()), after, before, per_page)
+    table_html = etag = last_modified = None
     
-    connection = get_db_connection()
+    connection = get_db_connection(read_only=True)
     if connection:
         try:
-            cursor = connection.cursor(dictionary=True)
-            if search:
-                query = "SELECT * FROM patients WHERE name LIKE %s OR phone LIKE %s ORDER BY name"
-                cursor.execute(query, (f'%{search}%', f'%{search}%'))
-            else:
-                cursor.execute("SELECT * FROM patients ORDER BY name")
-            patients_list = cursor.fetchall()
+            cursor = PreparedCursor(connection)
+            versions, etag, last_modified = page_validators(cursor, PATIENT_LIST_TABLES, *key)
+            unchanged = not_modified(etag, last_modified)
+            if unchanged:
+                return unchanged
             
+            def load():
+                if search:
+                    patient_search_index.refresh_if_stale()
+                if search and patient_search_index.ready and indexable(search):
+                    # Ranked top matches from the search index
+                    page = Page(search_patients(cursor, search, per_page), per_page)
+                elif search:
+                    # Index still building, or nothing left to look up after normalising - fall back to a table scan
+                    page = fetch_page(cursor, dal.PATIENT_LIST, PATIENT_KEYSET, ["(name LIKE %s OR phone LIKE %s)"],
+                                      [f'%{search}%', f'%{search}%'], after=after, before=before, per_page=per_page)
+                    set_page_urls(page, 'patients', search=search)
+                else:
+                    keyset, where, params = patient_list_query(options)
+                    page = fetch_page(cursor, dal.PATIENT_LIST, keyset, where, params,
+                                      after=after, before=before, per_page=per_page)
+                    if PAGINATION_CONFIG['approx_total'] and not where:
+                        page.approx_total = approximate_count(cursor, 'patients')
+                    set_page_urls(page, 'patients', **options)
+                return {'patients': page.items, 'search': search, 'page': page}
+            table_html = cached_fragment('patients_table.html', PATIENT_LIST_TABLES, versions, key, load)
+            
+        except InvalidCursor:
+            return redirect(url_for('patients', search=search or None))
         except Error as e:
+            if rollups.missing_patient_counters(e):
+                return redirect(url_for('patients', search=search or None))
             flash(f'Error fetching patients: {e}', 'error')
+            etag = None
         finally:
             cursor.close()
             connection.close()
     
-    return render_template('patients.html', patients=patients_list, search=search)
+    response = make_response(render_template('patients.html', table_html=table_html, search=search,
+                                             options=options, sorts=PATIENT_SORTS))
+    return with_validators(response, etag, last_modified)
 
 @app.route('/add_patient', methods=['GET', 'POST'])
 def add_patient():
@@ -239,7 +1130,12 @@ def add_patient():
                 query = """INSERT INTO patients (name, age, gender, phone, email, address, medical_history) 
                           VALUES (%s, %s, %s, %s, %s, %s, %s)"""
                 cursor.execute(query, (name, age, gender, phone, email, address, medical_history))
+                patient_id = cursor.lastrowid
+                dal.touch_tables(cursor, 'patients')
                 connection.commit()
+                invalidate_tables('patients')
+                patient_search_index.add(patient_id, name, phone)
+                audit('create', 'patients', patient_id, after=audit_row(connection, 'patients', patient_id))
                 flash('Patient added successfully!', 'success')
                 return redirect(url_for('patients'))
                 
@@ -263,10 +1159,11 @@ def edit_patient(patient_id):
     
     connection = get_db_connection()
     patient = None
+    etag = last_modified = None
     
     if connection:
         try:
-            cursor = connection.cursor(dictionary=True)
+            cursor = PreparedCursor(connection)
             
             if request.method == 'POST':
                 # Get form data
@@ -281,14 +1178,25 @@ def edit_patient(patient_id):
                 # Update patient in database
                 query = """UPDATE patients SET name = %s, age = %s, gender = %s, phone = %s, 
                           email = %s, address = %s, medical_history = %s WHERE id = %s"""
+                before = audit_row(connection, 'patients', patient_id)
                 cursor.execute(query, (name, age, gender, phone, email, address, medical_history, patient_id))
+                after = audit_row(connection, 'patients', patient_id)
+                dal.touch_tables(cursor, 'patients')
                 connection.commit()
+                invalidate_tables('patients')
+                patient_search_index.update(patient_id, name, phone)
+                audit('update', 'patients', patient_id, before, after)
                 flash('Patient updated successfully!', 'success')
                 return redirect(url_for('patients'))
             else:
+                _, etag, last_modified = page_validators(cursor, ('patients',), patient_id)
+                unchanged = not_modified(etag, last_modified)
+                if unchanged:
+                    return unchanged
+                
                 # Get patient data for form
-                cursor.execute("SELECT * FROM patients WHERE id = %s", (patient_id,))
-                patient = cursor.fetchone()
+                patient = query_cache.query(cursor, dal.PATIENT_BY_ID, (patient_id,),
+                                            tables=('patients',), one=True)
                 
                 if not patient:
                     flash('Patient not found!', 'error')
@@ -296,11 +1204,13 @@ def edit_patient(patient_id):
                     
         except Error as e:
             flash(f'Error updating patient: {e}', 'error')
+            etag = None
         finally:
             cursor.close()
             connection.close()
     
-    return render_template('edit_patient.html', patient=patient)
+    response = make_response(render_template('edit_patient.html', patient=patient))
+    return with_validators(response, etag, last_modified)
 
 @app.route('/delete_patient/<int:patient_id>')
 def delete_patient(patient_id):
@@ -314,10 +1224,21 @@ def delete_patient(patient_id):
     if connection:
         try:
             cursor = connection.cursor()
+            connection.start_transaction()
+            # The cascade removes the patient's appointments without telling us which
+            change = rollups.Change(cursor, "patient_id = %s", (patient_id,), archived=True)
+            before = audit_row(connection, 'patients', patient_id)
             cursor.execute("DELETE FROM patients WHERE id = %s", (patient_id,))
+            deleted = cursor.rowcount
+            change.apply()
+            dal.touch_tables(cursor, 'patients', 'appointments')
             connection.commit()
+            scheduler.forget()  # Cascade removed appointments we cannot identify
+            invalidate_tables('patients', 'appointments')
+            patient_search_index.remove(patient_id)
             
-            if cursor.rowcount > 0:
+            if deleted > 0:
+                audit('delete', 'patients', patient_id, before=before)
                 flash('Patient deleted successfully!', 'success')
             else:
                 flash('Patient not found!', 'error')
@@ -339,33 +1260,51 @@ def doctors():
         return redirect(url_for('login'))
     
     specialization = request.args.get('specialization', '')
-    doctors_list = []
+    after, before, per_page = get_page_args()
+    key = (specialization, after, before, per_page)
+    table_html = etag = last_modified = None
     specializations = []
     
-    connection = get_db_connection()
+    connection = get_db_connection(read_only=True)
     if connection:
         try:
-            cursor = connection.cursor(dictionary=True)
+            cursor = PreparedCursor(connection)
+            versions, etag, last_modified = page_validators(cursor, ('doctors',), *key)
+            unchanged = not_modified(etag, last_modified)
+            if unchanged:
+                return unchanged
             
             # Get all specializations for filter dropdown
-            cursor.execute("SELECT DISTINCT specialization FROM doctors ORDER BY specialization")
-            specializations = [row['specialization'] for row in cursor.fetchall()]
+            rows = query_cache.query(cursor, dal.DOCTOR_SPECIALIZATIONS, tables=('doctors',))
+            specializations = [row.specialization for row in rows]
             
             # Get doctors based on filter
-            if specialization:
-                query = "SELECT * FROM doctors WHERE specialization = %s ORDER BY name"
-                cursor.execute(query, (specialization,))
-            else:
-                cursor.execute("SELECT * FROM doctors ORDER BY name")
-            doctors_list = cursor.fetchall()
+            def load():
+                where, params = [], []
+                if specialization:
+                    where.append("specialization = %s")
+                    params.append(specialization)
+                page = fetch_page(cursor, dal.DOCTOR_LIST, DOCTOR_KEYSET, where, params,
+                                  after=after, before=before, per_page=per_page)
+                if PAGINATION_CONFIG['approx_total'] and not specialization:
+                    page.approx_total = approximate_count(cursor, 'doctors')
+                set_page_urls(page, 'doctors', specialization=specialization)
+                return {'doctors': page.items, 'selected_specialization': specialization, 'page': page}
+            table_html = cached_fragment('doctors_table.html', ('doctors',), versions, key, load)
             
+        except InvalidCursor:
+            return redirect(url_for('doctors', specialization=specialization or None))
         except Error as e:
             flash(f'Error fetching doctors: {e}', 'error')
+            etag = None
         finally:
             cursor.close()
             connection.close()
     
-    return render_template('doctors.html', doctors=doctors_list, specializations=specializations, selected_specialization=specialization)
+    response = make_response(render_template('doctors.html', table_html=table_html,
+                                             specializations=specializations,
+                                             selected_specialization=specialization))
+    return with_validators(response, etag, last_modified)
 
 @app.route('/add_doctor', methods=['GET', 'POST'])
 def add_doctor():
@@ -394,7 +1333,11 @@ def add_doctor():
                 query = """INSERT INTO doctors (name, specialization, phone, email, experience, fee) 
                           VALUES (%s, %s, %s, %s, %s, %s)"""
                 cursor.execute(query, (name, specialization, phone, email, experience, fee))
+                doctor_id = cursor.lastrowid
+                dal.touch_tables(cursor, 'doctors')
                 connection.commit()
+                invalidate_tables('doctors')
+                audit('create', 'doctors', doctor_id, after=audit_row(connection, 'doctors', doctor_id))
                 flash('Doctor added successfully!', 'success')
                 return redirect(url_for('doctors'))
                 
@@ -418,10 +1361,11 @@ def edit_doctor(doctor_id):
     
     connection = get_db_connection()
     doctor = None
+    etag = last_modified = None
     
     if connection:
         try:
-            cursor = connection.cursor(dictionary=True)
+            cursor = PreparedCursor(connection)
             
             if request.method == 'POST':
                 # Get form data
@@ -435,14 +1379,24 @@ def edit_doctor(doctor_id):
                 # Update doctor in database
                 query = """UPDATE doctors SET name = %s, specialization = %s, phone = %s, 
                           email = %s, experience = %s, fee = %s WHERE id = %s"""
+                before = audit_row(connection, 'doctors', doctor_id)
                 cursor.execute(query, (name, specialization, phone, email, experience, fee, doctor_id))
+                after = audit_row(connection, 'doctors', doctor_id)
+                dal.touch_tables(cursor, 'doctors')
                 connection.commit()
+                invalidate_tables('doctors')
+                audit('update', 'doctors', doctor_id, before, after)
                 flash('Doctor updated successfully!', 'success')
                 return redirect(url_for('doctors'))
             else:
+                _, etag, last_modified = page_validators(cursor, ('doctors',), doctor_id)
+                unchanged = not_modified(etag, last_modified)
+                if unchanged:
+                    return unchanged
+                
                 # Get doctor data for form
-                cursor.execute("SELECT * FROM doctors WHERE id = %s", (doctor_id,))
-                doctor = cursor.fetchone()
+                doctor = query_cache.query(cursor, dal.DOCTOR_BY_ID, (doctor_id,),
+                                           tables=('doctors',), one=True)
                 
                 if not doctor:
                     flash('Doctor not found!', 'error')
@@ -450,11 +1404,13 @@ def edit_doctor(doctor_id):
                     
         except Error as e:
             flash(f'Error updating doctor: {e}', 'error')
+            etag = None
         finally:
             cursor.close()
             connection.close()
     
-    return render_template('edit_doctor.html', doctor=doctor)
+    response = make_response(render_template('edit_doctor.html', doctor=doctor))
+    return with_validators(response, etag, last_modified)
 
 @app.route('/delete_doctor/<int:doctor_id>')
 def delete_doctor(doctor_id):
@@ -468,10 +1424,19 @@ def delete_doctor(doctor_id):
     if connection:
         try:
             cursor = connection.cursor()
+            connection.start_transaction()
+            change = rollups.Change(cursor, "doctor_id = %s", (doctor_id,), archived=True)
+            before = audit_row(connection, 'doctors', doctor_id)
             cursor.execute("DELETE FROM doctors WHERE id = %s", (doctor_id,))
+            deleted = cursor.rowcount
+            change.apply()
+            dal.touch_tables(cursor, 'doctors', 'appointments')
             connection.commit()
+            scheduler.forget(doctor_id)
+            invalidate_tables('doctors', 'appointments')
             
-            if cursor.rowcount > 0:
+            if deleted > 0:
+                audit('delete', 'doctors', doctor_id, before=before)
                 flash('Doctor deleted successfully!', 'success')
             else:
                 flash('Doctor not found!', 'error')
@@ -484,6 +1449,351 @@ def delete_doctor(doctor_id):
     
     return redirect(url_for('doctors'))
 
+@app.route('/api/patients/search')
+def api_search_patients():
+    """
+    Typeahead lookup for patients by name or phone
+    Query args: q (str): Text typed so far, limit (int): Maximum matches
+    Returns: JSON list of {id, name, age, phone}
+    """
+    if 'user_id' not in session:
+        return jsonify({'error': 'Authentication required'}), 401
+    
+    query = request.args.get('q', '').strip()
+    limit = max(1, min(request.args.get('limit', TYPEAHEAD_CONFIG['limit'], type=int), TYPEAHEAD_CONFIG['max_limit']))
+    if not query:
+        return jsonify([])
+    
+    def load():
+        with db_connection(read_only=True) as connection:
+            cursor = PreparedCursor(connection)
+            try:
+                patient_search_index.refresh_if_stale()
+                if patient_search_index.ready and indexable(query):
+                    rows = search_patients(cursor, query, limit)
+                else:
+                    # Index still building (or query is only punctuation) - prefix match can use idx_name
+                    cursor.execute("SELECT id, name, age, phone FROM patients WHERE name LIKE %s ORDER BY name LIMIT %s",
+                                   (like_prefix(query), limit))
+                    rows = cursor.fetchall()
+            finally:
+                cursor.close()
+        return [{'id': row.id, 'name': row.name, 'age': row.age, 'phone': row.phone} for row in rows]
+    
+    try:
+        matches = patient_typeahead_cache.get_or_load((query.lower(), limit), load)
+    except (Error, PoolTimeoutError) as e:
+        return jsonify({'error': str(e)}), 503
+    
+    response = jsonify(matches)
+    response.headers['Cache-Control'] = 'private, max-age=30'
+    return response
+
+@app.route('/api/doctors/search')
+def api_search_doctors():
+    """
+    Typeahead lookup for doctors by name (any word) or specialization
+    Query args: q (str): Text typed so far, limit (int): Maximum matches
+    Returns: JSON list of {id, name, specialization, fee}
+    """
+    if 'user_id' not in session:
+        return jsonify({'error': 'Authentication required'}), 401
+    
+    query = request.args.get('q', '').strip()
+    limit = max(1, min(request.args.get('limit', TYPEAHEAD_CONFIG['limit'], type=int), TYPEAHEAD_CONFIG['max_limit']))
+    if not query:
+        return jsonify([])
+    
+    def load():
+        pattern = like_prefix(query)
+        with db_connection(read_only=True) as connection:
+            cursor = PreparedCursor(connection)
+            try:
+                # "Dr. Lisa Martinez" should match "lisa" and "mart" as well as "dr"
+                cursor.execute("""SELECT id, name, specialization, fee FROM doctors
+                                  WHERE name LIKE %s OR name LIKE %s OR specialization LIKE %s
+                                  ORDER BY name LIMIT %s""",
+                               (pattern, '% ' + pattern, pattern, limit))
+                rows = cursor.fetchall()
+            finally:
+                cursor.close()
+        return [{'id': row.id, 'name': row.name, 'specialization': row.specialization,
+                 'fee': float(row.fee or 0)} for row in rows]
+    
+    try:
+        matches = doctor_typeahead_cache.get_or_load((query.lower(), limit), load)
+    except (Error, PoolTimeoutError) as e:
+        return jsonify({'error': str(e)}), 503
+    
+    response = jsonify(matches)
+    response.headers['Cache-Control'] = 'private, max-age=30'
+    return response
+
+@app.route('/api/doctors/<int:doctor_id>/free_slots')
+def api_doctor_free_slots(doctor_id):
+    """
+    Free appointment slots for a doctor over a date range
+    Query args: start (str): First day YYYY-MM-DD (default today), end (str): Last day (default start),
+                exclude (int): Appointment being edited, its own slot counts as free
+    Returns: JSON {doctor_id, visit_minutes, slots: {date: [HH:MM, ...]}}
+    """
+    if 'user_id' not in session:
+        return jsonify({'error': 'Authentication required'}), 401
+    
+    try:
+        first_day = date.fromisoformat(request.args.get('start') or date.today().isoformat())
+        last_day = date.fromisoformat(request.args.get('end') or first_day.isoformat())
+    except ValueError:
+        return jsonify({'error': 'start and end must be dates in YYYY-MM-DD format'}), 400
+    if last_day < first_day or (last_day - first_day).days >= SCHEDULE_CONFIG['max_range_days']:
+        return jsonify({'error': f"Date range must cover 1 to {SCHEDULE_CONFIG['max_range_days']} days"}), 400
+    exclude_id = request.args.get('exclude', type=int)
+    
+    try:
+        with db_connection() as connection:
+            cursor = PreparedCursor(connection)
+            try:
+                slots = scheduler.free_slots(cursor, doctor_id, first_day, last_day, exclude_id=exclude_id)
+            finally:
+                cursor.close()
+    except (Error, PoolTimeoutError) as e:
+        return jsonify({'error': str(e)}), 503
+    
+    return jsonify({
+        'doctor_id': doctor_id,
+        'visit_minutes': SCHEDULE_CONFIG['visit_minutes'],
+        'slots': {day.isoformat(): [slot.strftime('%H:%M') for slot in free] for day, free in slots.items()}
+    })
+
+@app.route('/api/stats/appointments')
+def api_appointment_stats():
+    """
+    Appointment counts and fees per day, doctor or status over a date range
+    Query args: start, end (str): Inclusive range YYYY-MM-DD (default the last 30 days),
+                group (str): day, doctor or status, doctor_id (int): Only this doctor
+    Returns: JSON {start, end, group, rows: [{key, appointments, scheduled, completed, cancelled, fees, completed_fees}]}
+    """
+    if 'user_id' not in session:
+        return jsonify({'error': 'Authentication required'}), 401
+    
+    try:
+        last_day = date.fromisoformat(request.args.get('end') or date.today().isoformat())
+        default_start = last_day - timedelta(days=STATS_CONFIG['default_days'] - 1)
+        first_day = date.fromisoformat(request.args.get('start') or default_start.isoformat())
+    except ValueError:
+        return jsonify({'error': 'start and end must be dates in YYYY-MM-DD format'}), 400
+    if last_day < first_day or (last_day - first_day).days >= STATS_CONFIG['max_range_days']:
+        return jsonify({'error': f"Date range must cover 1 to {STATS_CONFIG['max_range_days']} days"}), 400
+    group = request.args.get('group', 'day')
+    if group not in rollups.SUMMARY_GROUPS:
+        return jsonify({'error': f"group must be one of {', '.join(rollups.SUMMARY_GROUPS)}"}), 400
+    doctor_id = request.args.get('doctor_id', type=int)
+    if not rollups.available():
+        return jsonify({'error': f'{rollups.TABLE} is missing - run migration 003'}), 503
+    
+    try:
+        with db_connection(read_only=True) as connection:
+            cursor = PreparedCursor(connection)
+            try:
+                rows = rollups.summary(cursor, first_day, last_day, group, doctor_id)
+            finally:
+                cursor.close()
+    except Error as e:
+        if rollups.missing_table(e):
+            return jsonify({'error': f'{rollups.TABLE} is missing - run migration 003'}), 503
+        return jsonify({'error': str(e)}), 503
+    except PoolTimeoutError as e:
+        return jsonify({'error': str(e)}), 503
+    
+    for row in rows:
+        if isinstance(row['key'], date):
+            row['key'] = row['key'].isoformat()
+        row['fees'] = float(row['fees'] or 0)
+        row['completed_fees'] = float(row['completed_fees'] or 0)
+    response = jsonify({'start': first_day.isoformat(), 'end': last_day.isoformat(), 'group': group, 'rows': rows})
+    response.headers['Cache-Control'] = 'private, max-age=60'
+    return response
+
+@app.route('/api/analytics/appointments')
+def api_appointment_analytics():
+    """
+    Revenue, cancellation rate and utilisation by period, specialization and doctor
+    Query args: see get_analytics_args
+    Returns: JSON from analytics.summarise(), plus snapshot {appointments, age_seconds}
+    """
+    if 'user_id' not in session:
+        return jsonify({'error': 'Authentication required'}), 401
+    if not analytics.available():
+        return jsonify({'error': 'Analytics need numpy - pip install numpy'}), 503
+    
+    try:
+        options = get_analytics_args(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    appointment_analytics.refresh_if_stale()
+    snapshot = appointment_analytics.snapshot
+    if snapshot is None:
+        response = jsonify({'error': 'Analytics snapshot is being built, try again shortly',
+                            'last_error': appointment_analytics.last_error})
+        response.headers['Retry-After'] = '5'
+        return response, 503
+    
+    result = analytics.summarise(snapshot, **options)
+    result['snapshot'] = {'appointments': len(snapshot), 'age_seconds': round(time.time() - snapshot.built_at)}
+    response = jsonify(result)
+    response.headers['Cache-Control'] = 'private, max-age=60'
+    return response
+
+def read_api_request(resource_name, syncing=False):
+    """
+    Resource and selected fields of an /api/v1 request
+    Args: resource_name (str), syncing (bool): The request pages by updated_since
+    Returns: (resource, fields)
+    Raises: LookupError for an unknown resource, ValueError for unknown fields
+    """
+    resource = api.RESOURCES.get(resource_name)
+    if resource is None:
+        raise LookupError(f"Unknown resource '{resource_name}', use {', '.join(api.RESOURCES)}")
+    unavailable = ()
+    if resource_name == 'patients' and not rollups.patient_counters_available():
+        unavailable = api.PATIENT_COUNTER_FIELDS
+    fields = api.parse_fields(resource, request.args.get('fields', ''), unavailable)
+    # Fields with their own table version (patient counters) do not move updated_at,
+    # so an incremental sync would never see them change
+    untracked = [field for field in fields if field in resource.versions]
+    if syncing and untracked:
+        raise ValueError(f"{', '.join(untracked)} cannot be used with updated_since: "
+                         f"changes to them do not update updated_at")
+    return resource, fields
+
+def api_json(payload, etag, last_modified):
+    response = Response(api.dumps(payload), mimetype='application/json')
+    return with_validators(response, etag, last_modified)
+
+@app.route('/api/v1/<resource_name>')
+def api_v1_list(resource_name):
+    """
+    One page of patients, doctors or appointments for integrations
+    Query args: fields (str): Comma separated fields to return (default: the table's own columns),
+                after (str): next_cursor of the previous page, per_page (int),
+                updated_since (str): Only rows changed at or after this ISO datetime, oldest change first
+                                     (not with the patient counter fields, which do not touch updated_at),
+                specialization (doctors), start, end, doctor_id, patient_id, status (appointments)
+    Returns: JSON {data: [...], next_cursor, next_url}; with updated_since the last page also carries
+             sync_from, the updated_since of the next sync. Answers 304 to If-None-Match/If-Modified-Since.
+    """
+    if 'user_id' not in session:
+        return jsonify({'error': 'Authentication required'}), 401
+    try:
+        resource, fields = read_api_request(resource_name, syncing=bool(request.args.get('updated_since')))
+    except LookupError as e:
+        return jsonify({'error': str(e)}), 404
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    try:
+        where, params, first_day = api.filters(resource_name, request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    per_page = request.args.get('per_page', API_CONFIG['per_page'], type=int)
+    per_page = max(1, min(per_page, API_CONFIG['max_per_page']))
+    after = request.args.get('after', '')
+    # Incremental sync walks (updated_at, id), so rows changed while a client pages come again at the end
+    keyset = api.BY_UPDATE if request.args.get('updated_since') else api.BY_ID
+    
+    try:
+        with db_connection(read_only=True) as connection:
+            cursor = PreparedCursor(connection)
+            try:
+                _, etag, last_modified = page_validators(cursor, resource.tables(fields), resource_name,
+                                                         tuple(sorted(request.args.items(multi=True))))
+                unchanged = not_modified(etag, last_modified)
+                if unchanged:
+                    return unchanged
+                source = archive.source(cursor, first_day) if resource_name == 'appointments' else None
+                cursor.execute(*api.list_query(resource, fields, source, keyset, where, params,
+                                               after=after, per_page=per_page))
+                page = page_from_rows(cursor.fetchall(), keyset, after=after, per_page=per_page)
+            finally:
+                cursor.close()
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
+    except (Error, PoolTimeoutError) as e:
+        return jsonify({'error': str(e)}), 503
+    
+    payload = {'data': api.rows_json(page.items, fields), 'next_cursor': page.next_cursor, 'next_url': None}
+    if page.has_next:
+        args = {name: value for name, value in request.args.items() if name != 'after'}
+        payload['next_url'] = url_for('api_v1_list', resource_name=resource_name, after=page.next_cursor, **args)
+    elif keyset is api.BY_UPDATE:
+        # Inclusive, so changes made later within the same second are not missed; clients upsert by id
+        payload['sync_from'] = (page.items[-1].updated_at if page.items
+                                else api.parse_updated_since(request.args['updated_since']))
+    return api_json(payload, etag, last_modified)
+
+@app.route('/api/v1/<resource_name>/<int:row_id>')
+def api_v1_item(resource_name, row_id):
+    """
+    One patient, doctor or appointment for integrations
+    Query args: fields (str): Comma separated fields to return
+    Returns: JSON {data: {...}}, 404 if the row does not exist. Answers 304 like api_v1_list.
+    """
+    if 'user_id' not in session:
+        return jsonify({'error': 'Authentication required'}), 401
+    try:
+        resource, fields = read_api_request(resource_name)
+    except LookupError as e:
+        return jsonify({'error': str(e)}), 404
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    try:
+        with db_connection(read_only=True) as connection:
+            cursor = PreparedCursor(connection)
+            try:
+                _, etag, last_modified = page_validators(cursor, resource.tables(fields), resource_name, row_id,
+                                                         fields)
+                unchanged = not_modified(etag, last_modified)
+                if unchanged:
+                    return unchanged
+                source = archive.source(cursor) if resource_name == 'appointments' else None
+                cursor.execute(*api.item_query(resource, fields, source, row_id))
+                row = cursor.fetchone()
+            finally:
+                cursor.close()
+    except (Error, PoolTimeoutError) as e:
+        return jsonify({'error': str(e)}), 503
+    
+    if row is None:
+        return jsonify({'error': f'{resource_name[:-1].capitalize()} {row_id} not found'}), 404
+    return api_json({'data': api.rows_json([row], fields)[0]}, etag, last_modified)
+
+@app.route('/analytics')
+def analytics_page():
+    """
+    Analytics route - revenue, cancellations and doctor utilisation
+    """
+    if 'user_id' not in session:
+        return redirect(url_for('login'))
+    if not analytics.available():
+        flash('Analytics need numpy - pip install numpy', 'error')
+        return redirect(url_for('dashboard'))
+    
+    try:
+        options = get_analytics_args(request.args)
+    except ValueError as e:
+        flash(str(e), 'error')
+        return redirect(url_for('analytics_page'))
+    
+    appointment_analytics.refresh_if_stale()
+    snapshot = appointment_analytics.snapshot
+    report = analytics.summarise(snapshot, **options) if snapshot is not None else None
+    return render_template('analytics.html', report=report, snapshot=snapshot,
+                           specializations=snapshot.specializations if snapshot is not None else [],
+                           filters=options, buckets=analytics.BUCKETS,
+                           last_error=appointment_analytics.last_error,
+                           age_minutes=int((time.time() - snapshot.built_at) // 60) if snapshot is not None else None)
+
 @app.route('/appointments')
 def appointments():
     """
@@ -493,65 +1803,64 @@ def appointments():
         return redirect(url_for('login'))
     
     date_filter = request.args.get('date', '')
-    appointments_list = []
+    after, before, per_page = get_page_args()
+    key = (date_filter, after, before, per_page)
+    tables = ('appointments', 'patients', 'doctors')
+    table_html = etag = last_modified = None
     
-    connection = get_db_connection()
+    connection = get_db_connection(read_only=True)
     if connection:
         try:
-            cursor = connection.cursor(dictionary=True)
-            if date_filter:
-                query = """SELECT a.*, p.name as patient_name, d.name as doctor_name, d.specialization as doctor_specialization
-                          FROM appointments a 
-                          JOIN patients p ON a.patient_id = p.id 
-                          JOIN doctors d ON a.doctor_id = d.id 
-                          WHERE DATE(a.appointment_date) = %s 
-                          ORDER BY a.appointment_date DESC"""
-                cursor.execute(query, (date_filter,))
-            else:
-                query = """SELECT a.*, p.name as patient_name, d.name as doctor_name, d.specialization as doctor_specialization
-                          FROM appointments a 
-                          JOIN patients p ON a.patient_id = p.id 
-                          JOIN doctors d ON a.doctor_id = d.id 
-                          ORDER BY a.appointment_date DESC"""
-                cursor.execute(query)
-            appointments_list = cursor.fetchall()
+            cursor = PreparedCursor(connection)
+            versions, etag, last_modified = page_validators(cursor, tables, *key)
+            unchanged = not_modified(etag, last_modified)
+            if unchanged:
+                return unchanged
+            
+            def load():
+                where, params = [], []
+                # Unfiltered, the list pages through the appointments table; archived days need a date
+                source = archive.HOT
+                if date_filter:
+                    # Half-open range so idx_appointment_date can be used
+                    day = datetime.strptime(date_filter, '%Y-%m-%d')
+                    where.append("a.appointment_date >= %s AND a.appointment_date < %s")
+                    params.extend([day, day + timedelta(days=1)])
+                    source = archive.source(cursor, day)
+                page = fetch_page(cursor, dal.APPOINTMENT_LIST_FROM.format(source), APPOINTMENT_KEYSET, where, params,
+                                  after=after, before=before, per_page=per_page)
+                if PAGINATION_CONFIG['approx_total'] and not date_filter:
+                    page.approx_total = approximate_count(cursor, 'appointments')
+                set_page_urls(page, 'appointments', date=date_filter)
+                return {'appointments': page.items, 'date_filter': date_filter, 'page': page,
+                        'archived_before': archive.horizon(cursor)}
+            table_html = cached_fragment('appointments_table.html', tables, versions, key, load)
             
+        except InvalidCursor:
+            return redirect(url_for('appointments', date=date_filter or None))
+        except ValueError:
+            flash('Invalid date filter!', 'error')
+            etag = None
         except Error as e:
             flash(f'Error fetching appointments: {e}', 'error')
+            etag = None
         finally:
             cursor.close()
             connection.close()
     
-    return render_template('appointments.html', appointments=appointments_list, date_filter=date_filter)
+    response = make_response(render_template('appointments.html', table_html=table_html, date_filter=date_filter))
+    return with_validators(response, etag, last_modified)
 
 @app.route('/add_appointment', methods=['GET', 'POST'])
 def add_appointment():
     """
     Add appointment route - handles appointment scheduling
-    GET: Display appointment form with patient and doctor lists
+    GET: Display appointment form (patients and doctors are looked up as the user types)
     POST: Process appointment scheduling
     """
     if 'user_id' not in session:
         return redirect(url_for('login'))
     
-    patients_list = []
-    doctors_list = []
-    
-    # Get patients and doctors for dropdowns
-    connection = get_db_connection()
-    if connection:
-        try:
-            cursor = connection.cursor(dictionary=True)
-            cursor.execute("SELECT id, name, age FROM patients ORDER BY name")
-            patients_list = cursor.fetchall()
-            cursor.execute("SELECT id, name, specialization, fee FROM doctors ORDER BY name")
-            doctors_list = cursor.fetchall()
-        except Error as e:
-            flash(f'Error fetching data: {e}', 'error')
-        finally:
-            cursor.close()
-            connection.close()
-    
     if request.method == 'POST':
         # Get form data
         patient_id = request.form['patient_id']
@@ -562,17 +1871,43 @@ def add_appointment():
         notes = request.form['notes']
         
         # Combine date and time
-        appointment_datetime = f"{appointment_date} {appointment_time}"
+        appointment_datetime = parse_appointment_datetime(appointment_date, appointment_time)
+        if appointment_datetime is None or not doctor_id.isdigit():
+            flash('Please choose a doctor and a valid date and time.', 'error')
+            return redirect(url_for('add_appointment'))
         
         # Insert into database
         connection = get_db_connection()
         if connection:
             try:
                 cursor = connection.cursor()
-                query = """INSERT INTO appointments (patient_id, doctor_id, appointment_date, fee, notes) 
-                          VALUES (%s, %s, %s, %s, %s)"""
-                cursor.execute(query, (patient_id, doctor_id, appointment_datetime, fee, notes))
-                connection.commit()
+                # Hold the doctor's lock so two requests in this process cannot book the same slot;
+                # locked_conflicts() covers the other worker processes
+                with scheduler.lock(doctor_id):
+                    conflicts = scheduler.conflicts(cursor, doctor_id, appointment_datetime)
+                    if conflicts:
+                        flash(conflict_message(cursor, conflicts), 'error')
+                        return redirect(url_for('add_appointment'))
+                    
+                    query = """INSERT INTO appointments (patient_id, doctor_id, appointment_date, fee, notes) 
+                              VALUES (%s, %s, %s, %s, %s)"""
+                    connection.start_transaction()
+                    # Another worker may have booked the slot since this process loaded the schedule
+                    conflicts = locked_conflicts(cursor, doctor_id, appointment_datetime)
+                    if conflicts:
+                        connection.rollback()
+                        scheduler.forget(doctor_id)
+                        flash(conflict_message(cursor, conflicts), 'error')
+                        return redirect(url_for('add_appointment'))
+                    cursor.execute(query, (patient_id, doctor_id, appointment_datetime, fee, notes))
+                    appointment_id = cursor.lastrowid
+                    rollups.record_insert(cursor, appointment_id)
+                    after = audit_row(connection, 'appointments', appointment_id)
+                    dal.touch_tables(cursor, 'appointments')
+                    connection.commit()
+                    scheduler.add(doctor_id, appointment_id, appointment_datetime)
+                invalidate_tables('appointments')
+                audit('create', 'appointments', appointment_id, after=after)
                 flash('Appointment scheduled successfully!', 'success')
                 return redirect(url_for('appointments'))
                 
@@ -582,7 +1917,7 @@ def add_appointment():
                 cursor.close()
                 connection.close()
     
-    return render_template('add_appointment.html', patients=patients_list, doctors=doctors_list)
+    return render_template('add_appointment.html')
 
 @app.route('/edit_appointment/<int:appointment_id>', methods=['GET', 'POST'])
 def edit_appointment(appointment_id):
@@ -594,20 +1929,13 @@ def edit_appointment(appointment_id):
     if 'user_id' not in session:
         return redirect(url_for('login'))
     
-    patients_list = []
-    doctors_list = []
     appointment = None
+    etag = last_modified = None
     
     connection = get_db_connection()
     if connection:
         try:
-            cursor = connection.cursor(dictionary=True)
-            
-            # Get patients and doctors for dropdowns
-            cursor.execute("SELECT id, name, age FROM patients ORDER BY name")
-            patients_list = cursor.fetchall()
-            cursor.execute("SELECT id, name, specialization, fee FROM doctors ORDER BY name")
-            doctors_list = cursor.fetchall()
+            cursor = PreparedCursor(connection)
             
             if request.method == 'POST':
                 # Get form data
@@ -620,24 +1948,56 @@ def edit_appointment(appointment_id):
                 notes = request.form['notes']
                 
                 # Combine date and time
-                appointment_datetime = f"{appointment_date} {appointment_time}"
+                appointment_datetime = parse_appointment_datetime(appointment_date, appointment_time)
+                if appointment_datetime is None or not doctor_id.isdigit():
+                    flash('Please choose a doctor and a valid date and time.', 'error')
+                    return redirect(url_for('edit_appointment', appointment_id=appointment_id))
                 
-                # Update appointment in database
-                query = """UPDATE appointments SET patient_id = %s, doctor_id = %s, appointment_date = %s, 
-                          fee = %s, status = %s, notes = %s WHERE id = %s"""
-                cursor.execute(query, (patient_id, doctor_id, appointment_datetime, fee, status, notes, appointment_id))
-                connection.commit()
+                with scheduler.lock(doctor_id):
+                    # Only scheduled visits occupy a slot; the appointment may keep its own
+                    if status == 'Scheduled':
+                        conflicts = scheduler.conflicts(cursor, doctor_id, appointment_datetime,
+                                                        exclude_id=appointment_id)
+                        if conflicts:
+                            flash(conflict_message(cursor, conflicts), 'error')
+                            return redirect(url_for('edit_appointment', appointment_id=appointment_id))
+                    
+                    # Update appointment in database
+                    query = """UPDATE appointments SET patient_id = %s, doctor_id = %s, appointment_date = %s, 
+                              fee = %s, status = %s, notes = %s WHERE id = %s"""
+                    connection.start_transaction()
+                    if status == 'Scheduled':
+                        conflicts = locked_conflicts(cursor, doctor_id, appointment_datetime,
+                                                     exclude_id=appointment_id)
+                        if conflicts:
+                            connection.rollback()
+                            scheduler.forget(doctor_id)
+                            flash(conflict_message(cursor, conflicts), 'error')
+                            return redirect(url_for('edit_appointment', appointment_id=appointment_id))
+                    change = rollups.Change(cursor, "id = %s", (appointment_id,))
+                    before = audit_row(connection, 'appointments', appointment_id)
+                    cursor.execute(query, (patient_id, doctor_id, appointment_datetime, fee, status, notes, appointment_id))
+                    change.apply()
+                    after = audit_row(connection, 'appointments', appointment_id)
+                    dal.touch_tables(cursor, 'appointments')
+                    connection.commit()
+                    scheduler.discard(appointment_id)
+                    if status == 'Scheduled':
+                        scheduler.add(doctor_id, appointment_id, appointment_datetime)
+                invalidate_tables('appointments')
+                audit('update', 'appointments', appointment_id, before, after)
                 flash('Appointment updated successfully!', 'success')
                 return redirect(url_for('appointments'))
             else:
+                _, etag, last_modified = page_validators(cursor, ('appointments', 'patients', 'doctors'),
+                                                         appointment_id)
+                unchanged = not_modified(etag, last_modified)
+                if unchanged:
+                    return unchanged
+                
                 # Get appointment data for form
-                query = """SELECT a.*, p.name as patient_name, d.name as doctor_name 
-                          FROM appointments a 
-                          JOIN patients p ON a.patient_id = p.id 
-                          JOIN doctors d ON a.doctor_id = d.id 
-                          WHERE a.id = %s"""
-                cursor.execute(query, (appointment_id,))
-                appointment = cursor.fetchone()
+                appointment = query_cache.query(cursor, dal.APPOINTMENT_BY_ID, (appointment_id,),
+                                                tables=('appointments', 'patients', 'doctors'), one=True)
                 
                 if not appointment:
                     flash('Appointment not found!', 'error')
@@ -645,11 +2005,13 @@ def edit_appointment(appointment_id):
                     
         except Error as e:
             flash(f'Error updating appointment: {e}', 'error')
+            etag = None
         finally:
             cursor.close()
             connection.close()
     
-    return render_template('edit_appointment.html', appointment=appointment, patients=patients_list, doctors=doctors_list)
+    response = make_response(render_template('edit_appointment.html', appointment=appointment))
+    return with_validators(response, etag, last_modified)
 
 @app.route('/complete_appointment/<int:appointment_id>')
 def complete_appointment(appointment_id):
@@ -664,10 +2026,19 @@ def complete_appointment(appointment_id):
         try:
             cursor = connection.cursor()
             query = "UPDATE appointments SET status = 'Completed' WHERE id = %s"
+            connection.start_transaction()
+            change = rollups.Change(cursor, "id = %s", (appointment_id,))
+            before = audit_row(connection, 'appointments', appointment_id)
             cursor.execute(query, (appointment_id,))
+            updated = cursor.rowcount
+            change.apply()
+            dal.touch_tables(cursor, 'appointments')
             connection.commit()
+            scheduler.discard(appointment_id)
+            invalidate_tables('appointments')
             
-            if cursor.rowcount > 0:
+            if updated > 0:
+                audit('complete', 'appointments', appointment_id, before, dict(before or {}, status='Completed'))
                 flash('Appointment marked as completed!', 'success')
             else:
                 flash('Appointment not found!', 'error')
@@ -693,10 +2064,19 @@ def cancel_appointment(appointment_id):
         try:
             cursor = connection.cursor()
             query = "UPDATE appointments SET status = 'Cancelled' WHERE id = %s"
+            connection.start_transaction()
+            change = rollups.Change(cursor, "id = %s", (appointment_id,))
+            before = audit_row(connection, 'appointments', appointment_id)
             cursor.execute(query, (appointment_id,))
+            updated = cursor.rowcount
+            change.apply()
+            dal.touch_tables(cursor, 'appointments')
             connection.commit()
+            scheduler.discard(appointment_id)
+            invalidate_tables('appointments')
             
-            if cursor.rowcount > 0:
+            if updated > 0:
+                audit('cancel', 'appointments', appointment_id, before, dict(before or {}, status='Cancelled'))
                 flash('Appointment cancelled!', 'info')
             else:
                 flash('Appointment not found!', 'error')
@@ -721,10 +2101,19 @@ def delete_appointment(appointment_id):
     if connection:
         try:
             cursor = connection.cursor()
+            connection.start_transaction()
+            change = rollups.Change(cursor, "id = %s", (appointment_id,))
+            before = audit_row(connection, 'appointments', appointment_id)
             cursor.execute("DELETE FROM appointments WHERE id = %s", (appointment_id,))
+            deleted = cursor.rowcount
+            change.apply()
+            dal.touch_tables(cursor, 'appointments')
             connection.commit()
+            scheduler.discard(appointment_id)
+            invalidate_tables('appointments')
             
-            if cursor.rowcount > 0:
+            if deleted > 0:
+                audit('delete', 'appointments', appointment_id, before=before)
                 flash('Appointment deleted successfully!', 'success')
             else:
                 flash('Appointment not found!', 'error')
@@ -737,92 +2126,510 @@ def delete_appointment(appointment_id):
     
     return redirect(url_for('appointments'))
 
-@app.route('/download_patients_pdf')
-def download_patients_pdf():
+# Bulk action -> new status (None deletes) and the per-id result for a row it changed
+BULK_ACTIONS = {
+    'complete': ('Completed', 'completed'),
+    'cancel': ('Cancelled', 'cancelled'),
+    'delete': (None, 'deleted')
+}
+
+def read_bulk_selection(form):
     """
-    Generate and download PDF report of all patients
+    Parse the appointments a bulk action applies to
+    Args: form: ids (repeated or comma separated), or date (YYYY-MM-DD) with an optional doctor_id
+    Returns: (ids, None) for an explicit selection, or (None, (where, params)) for a filter
+    Raises: ValueError: Nothing selected, malformed values or too many ids
     """
+    raw_ids = [part for value in form.getlist('ids') for part in value.split(',') if part.strip()]
+    if raw_ids:
+        try:
+            ids = list(dict.fromkeys(int(value) for value in raw_ids))  # De-duplicated, in the order given
+        except ValueError:
+            raise ValueError('Appointment ids must be numbers')
+        if len(ids) > BULK_CONFIG['max_ids']:
+            raise ValueError(f"Select at most {BULK_CONFIG['max_ids']} appointments at a time")
+        return ids, None
+    
+    date_filter = form.get('date', '')
+    if not date_filter:
+        raise ValueError('Select appointments or a date first')
+    try:
+        day = datetime.strptime(date_filter, '%Y-%m-%d')
+    except ValueError:
+        raise ValueError('date must be in YYYY-MM-DD format')
+    # Half-open range so idx_appointment_date (idx_doctor_date with a doctor) can be used
+    where, params = ["appointment_date >= %s AND appointment_date < %s"], [day, day + timedelta(days=1)]
+    doctor_id = form.get('doctor_id', '')
+    if doctor_id:
+        if not doctor_id.isdigit():
+            raise ValueError('doctor_id must be a number')
+        where.insert(0, "doctor_id = %s")
+        params.insert(0, int(doctor_id))
+    return None, (' AND '.join(where), params)
+
+def apply_bulk_action(connection, action, ids, selection):
+    """
+    Change or delete appointments with one statement in one transaction
+    Args: action (str): Key of BULK_ACTIONS, ids (list): Appointment ids, or None to select by
+          `selection` ((where, params) from read_bulk_selection)
+    Returns: (results, before) - results: list of (id, result) in request order, result being the
+             action's result, 'unchanged', 'archived' (read-only) or 'not_found';
+             before: dict id -> row before the write, for the rows that changed
+    Raises: ValueError: The filter matches more than BULK_CONFIG['max_ids'] appointments
+    """
+    status, done = BULK_ACTIONS[action]
+    cursor = connection.cursor()
+    rows_cursor = connection.cursor(dictionary=True)
+    try:
+        connection.start_transaction()
+        if ids is None:
+            where, params = selection
+            cursor.execute(f"SELECT id FROM appointments WHERE {where} ORDER BY id LIMIT %s FOR UPDATE",
+                           params + [BULK_CONFIG['max_ids'] + 1])
+            ids = [row[0] for row in cursor.fetchall()]
+            if len(ids) > BULK_CONFIG['max_ids']:
+                connection.rollback()
+                raise ValueError(f"More than {BULK_CONFIG['max_ids']} appointments match - narrow the filter")
+        if not ids:
+            connection.rollback()
+            return [], {}
+        
+        in_ids = f"id IN ({', '.join(['%s'] * len(ids))})"
+        change = rollups.Change(cursor, in_ids, ids)
+        rows_cursor.execute(f"SELECT * FROM appointments WHERE {in_ids} FOR UPDATE", ids)
+        found = {row['id']: row for row in rows_cursor.fetchall()}
+        before = {row_id: row for row_id, row in found.items() if status is None or row['status'] != status}
+        if before:
+            changed_ids = list(before)
+            changed = f"id IN ({', '.join(['%s'] * len(changed_ids))})"
+            if status is None:
+                cursor.execute(f"DELETE FROM appointments WHERE {changed}", changed_ids)
+            else:
+                cursor.execute(f"UPDATE appointments SET status = %s WHERE {changed}", [status] + changed_ids)
+            change.apply()
+            dal.touch_tables(cursor, 'appointments')
+        
+        archived = set()
+        missing = [row_id for row_id in ids if row_id not in found]
+        if missing and archive.horizon(cursor) is not None:
+            cursor.execute(f"SELECT id FROM {archive.ARCHIVE} WHERE id IN ({', '.join(['%s'] * len(missing))})",
+                           missing)
+            archived = {row[0] for row in cursor.fetchall()}
+        connection.commit()
+    except Error:
+        connection.rollback()
+        raise
+    finally:
+        rows_cursor.close()
+        cursor.close()
+    
+    results = []
+    for row_id in ids:
+        if row_id in before:
+            results.append((row_id, done))
+        elif row_id in found:
+            results.append((row_id, 'unchanged'))
+        else:
+            results.append((row_id, 'archived' if row_id in archived else 'not_found'))
+    return results, before
+
+@app.route('/appointments/bulk', methods=['POST'])
+def bulk_appointments():
+    """
+    Bulk appointment actions route - completes, cancels or deletes many appointments at once
+    Form: action (str): complete, cancel or delete,
+          ids (int): Selected appointments (repeated or comma separated), or instead
+          date (str): Every appointment on this day YYYY-MM-DD, doctor_id (int): Only this doctor's
+    Returns: JSON {action, counts: {result: n}, results: [{id, result}]} when the client asks for
+             JSON, otherwise a redirect to the appointments list with a summary
+    """
+    wants_json = request.accept_mimetypes.best_match(['text/html', 'application/json']) == 'application/json'
     if 'user_id' not in session:
+        if wants_json:
+            return jsonify({'error': 'Authentication required'}), 401
         return redirect(url_for('login'))
     
-    patients_list = []
+    back = redirect(url_for('appointments', date=request.form.get('return_date') or request.form.get('date') or None))
+    
+    def failed(message, status):
+        if wants_json:
+            return jsonify({'error': message}), status
+        flash(message, 'error')
+        return back
+    
+    action = request.form.get('action', '')
+    if action not in BULK_ACTIONS:
+        return failed(f"action must be one of {', '.join(BULK_ACTIONS)}", 400)
+    try:
+        ids, selection = read_bulk_selection(request.form)
+    except ValueError as e:
+        return failed(str(e), 400)
+    
     connection = get_db_connection()
+    if not connection:
+        return failed('Database connection failed', 503)
+    try:
+        results, before = apply_bulk_action(connection, action, ids, selection)
+    except ValueError as e:
+        return failed(str(e), 400)
+    except Error as e:
+        return failed(f'Error updating appointments: {e}', 503)
+    finally:
+        connection.close()
     
-    if connection:
-        try:
-            cursor = connection.cursor(dictionary=True)
-            cursor.execute("SELECT * FROM patients ORDER BY name")
-            patients_list = cursor.fetchall()
-        except Error as e:
-            flash(f'Error fetching patients: {e}', 'error')
-            return redirect(url_for('patients'))
-        finally:
-            cursor.close()
-            connection.close()
+    if before:
+        for appointment_id in before:
+            scheduler.discard(appointment_id)
+        invalidate_tables('appointments')
+        status = BULK_ACTIONS[action][0]
+        for appointment_id, row in before.items():
+            audit(action, 'appointments', appointment_id, row, dict(row, status=status) if status else None)
     
-    # Render HTML template for PDF
-    html = render_template('pdf_patients.html', patients=patients_list, date=datetime.now().strftime('%Y-%m-%d'))
+    counts = Counter(result for _, result in results)
+    if wants_json:
+        return jsonify({'action': action, 'counts': counts,
+                        'results': [{'id': appointment_id, 'result': result} for appointment_id, result in results]})
+    if not results:
+        flash('No appointments matched.', 'info')
+    else:
+        flash('Appointments: ' + ', '.join(f"{count} {result.replace('_', ' ')}"
+                                           for result, count in counts.items()) + '.',
+              'success' if before else 'info')
+    return back
+
+@app.route('/import', methods=['GET', 'POST'])
+def bulk_import():
+    """
+    Bulk import route - loads patients, doctors or appointments from a CSV file
+    GET: Display upload form with the expected columns
+    POST: Stream the uploaded file into the database and show the results
+    """
+    if 'user_id' not in session:
+        return redirect(url_for('login'))
     
-    # Create PDF
-    pdf_buffer = io.BytesIO()
-    pisa_status = pisa.CreatePDF(html, dest=pdf_buffer)
+    result = None
+    report_name = None
+    if request.method == 'POST':
+        table = request.form.get('table')
+        upload = request.files.get('csv_file')
+        if table not in IMPORT_TABLES or not upload or not upload.filename:
+            flash('Please choose what to import and a CSV file.', 'error')
+            return redirect(url_for('bulk_import'))
+        
+        os.makedirs(IMPORT_CONFIG['report_dir'], exist_ok=True)
+        report_name = f"{table}-errors-{uuid.uuid4().hex}.csv"
+        report_path = os.path.join(IMPORT_CONFIG['report_dir'], report_name)
+        
+        connection = get_db_connection()
+        if connection:
+            try:
+                # The upload is parsed as it is read; only one chunk of rows is held in memory
+                csv_text = io.TextIOWrapper(upload.stream, encoding='utf-8-sig', newline='')
+                with open(report_path, 'w', encoding='utf-8', newline='') as error_file:
+                    importer = BulkImporter(connection, table, chunk_size=IMPORT_CONFIG['chunk_size'],
+                                            batch_size=IMPORT_CONFIG['batch_size'], error_stream=error_file,
+                                            max_errors_kept=IMPORT_CONFIG['errors_shown'],
+                                            visit_minutes=SCHEDULE_CONFIG['visit_minutes'])
+                    result = importer.run(csv_text)
+            except CSVImportError as e:
+                flash(str(e), 'error')
+            except UnicodeDecodeError:
+                flash('The file is not UTF-8 encoded text.', 'error')
+            except Error as e:
+                flash(f'Error importing {table}: {e}', 'error')
+            finally:
+                connection.close()
+            
+            if (result is None or not result.failed) and os.path.exists(report_path):
+                os.remove(report_path)
+                report_name = None
+            # Chunks committed before an error stay in the database, so always invalidate
+            invalidate_tables(table)
+            if table == 'patients':
+                patient_search_index.mark_stale()
+                patient_search_index.refresh_if_stale()
+            elif table == 'appointments':
+                scheduler.forget()
+            if result is not None:
+                # One entry for the whole file; rows are identified by the file name and counts
+                audit('import', table, None, after={'file': upload.filename, 'rows': result.rows,
+                                                    'inserted': result.inserted, 'failed': result.failed})
+                flash(f'Imported {result.inserted} of {result.rows} {table} rows in {result.seconds:.1f}s.',
+                      'success' if not result.failed else 'warning')
     
-    if pisa_status.err:
-        flash('Error generating PDF', 'error')
-        return redirect(url_for('patients'))
+    columns = {table: [(column.name, column.required) for column in columns]
+               for table, columns in IMPORT_TABLES.items()}
+    return render_template('import.html', columns=columns, result=result, report_name=report_name)
+
+@app.route('/import/errors/<name>')
+def download_import_errors(name):
+    """
+    Download the rejected rows of a bulk import as CSV
+    """
+    if 'user_id' not in session:
+        return redirect(url_for('login'))
+    return send_from_directory(IMPORT_CONFIG['report_dir'], name, mimetype='text/csv', as_attachment=True)
+
+def read_report_filters(kind):
+    """
+    Validate and normalise the query string filters of a report
+    Returns: tuple (filters dict, error message or None)
+    """
+    filters = {}
+    if kind == 'patients':
+        gender = request.args.get('gender')
+        if gender:
+            if gender not in ('Male', 'Female', 'Other'):
+                return None, 'Gender must be Male, Female or Other.'
+            filters['gender'] = gender
+        return filters, None
+    
+    for name in ('start', 'end'):
+        value = request.args.get(name)
+        if value:
+            try:
+                filters[name] = date.fromisoformat(value).isoformat()
+            except ValueError:
+                return None, 'Dates must be in YYYY-MM-DD format.'
+    doctor_id = request.args.get('doctor_id')
+    if doctor_id:
+        if not doctor_id.isdigit():
+            return None, 'Doctor id must be a number.'
+        filters['doctor_id'] = int(doctor_id)
+    status = request.args.get('status')
+    if status:
+        if status not in ('Scheduled', 'Completed', 'Cancelled'):
+            return None, 'Status must be Scheduled, Completed or Cancelled.'
+        filters['status'] = status
+    return filters, None
+
+def submit_report(kind, back_endpoint):
+    """
+    Queue a PDF report and send the user to its status page
+    A report already rendered for the current data is downloaded at once
+    """
+    if 'user_id' not in session:
+        return redirect(url_for('login'))
     
-    pdf_buffer.seek(0)
-    response = make_response(pdf_buffer.read())
-    response.headers['Content-Type'] = 'application/pdf'
-    response.headers['Content-Disposition'] = f'attachment; filename=patients_report_{datetime.now().strftime("%Y%m%d")}.pdf'
+    filters, problem = read_report_filters(kind)
+    if problem:
+        flash(problem, 'error')
+        return redirect(url_for(back_endpoint))
     
-    return response
+    try:
+        with db_connection(read_only=True) as connection:
+            source = connection.pool.db_config  # Render from the server the versions came from
+            cursor = connection.cursor()
+            try:
+                versions = load_table_versions(cursor, REPORTS[kind].tables)
+            finally:
+                cursor.close()
+    except (Error, PoolTimeoutError) as e:
+        flash(f'Database connection failed: {e}', 'error')
+        return redirect(url_for(back_endpoint))
+    
+    job = report_queue.submit(kind, filters, versions, db_config=source)
+    if job.status == 'done':
+        return redirect(url_for('download_report', job_id=job.id))
+    return redirect(url_for('report_status', job_id=job.id))
+
+@app.route('/download_patients_pdf')
+def download_patients_pdf():
+    """
+    Request a PDF report of all patients
+    The report is rendered by a background worker; the user waits on a status page
+    Query args: gender (str): Optional filter
+    """
+    return submit_report('patients', 'patients')
 
 @app.route('/download_appointments_pdf')
 def download_appointments_pdf():
     """
-    Generate and download PDF report of all appointments
+    Request a PDF report of appointments
+    The report is rendered by a background worker; the user waits on a status page
+    Query args: start, end (str): Inclusive YYYY-MM-DD range, doctor_id (int), status (str)
+    """
+    return submit_report('appointments', 'appointments')
+
+@app.route('/reports/<job_id>')
+def report_status(job_id):
+    """
+    Report status page - polls until the report is ready, then downloads it
     """
     if 'user_id' not in session:
         return redirect(url_for('login'))
     
-    appointments_list = []
-    connection = get_db_connection()
+    job = report_queue.get(job_id)
+    if job is None:
+        flash('Report not found - it may have expired. Please request it again.', 'error')
+        return redirect(url_for('dashboard'))
+    return render_template('report_status.html', job=job.to_dict())
+
+@app.route('/reports/<job_id>/status')
+def report_status_json(job_id):
+    """
+    Report job status for polling
+    Returns: JSON {id, kind, title, filters, status, error, size, seconds}
+    """
+    if 'user_id' not in session:
+        return jsonify({'error': 'Authentication required'}), 401
     
-    if connection:
+    job = report_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Report not found'}), 404
+    return jsonify(job.to_dict())
+
+@app.route('/reports/<job_id>/download')
+def download_report(job_id):
+    """
+    Download a finished PDF report
+    """
+    if 'user_id' not in session:
+        return redirect(url_for('login'))
+    
+    job = report_queue.get(job_id)
+    if job is None or (job.status == 'done' and not os.path.exists(job.path)):
+        flash('Report not found - it may have expired. Please request it again.', 'error')
+        return redirect(url_for('dashboard'))
+    if job.status != 'done':
+        return redirect(url_for('report_status', job_id=job_id))
+    name = job.kind or 'hms'
+    return send_file(job.path, mimetype='application/pdf', as_attachment=True,
+                     download_name=f'{name}_report_{datetime.now().strftime("%Y%m%d")}.pdf')
+
+def date_range_filter(where, params, column, first, last):
+    """
+    Add an inclusive date range on a datetime column as a sargable half-open range
+    Args: where (list), params (list): Query parts to extend, column (str): Column expression,
+          first (str), last (str): YYYY-MM-DD or empty
+    Raises: ValueError if a date is malformed
+    """
+    if first:
+        where.append(f"{column} >= %s")
+        params.append(date.fromisoformat(first))
+    if last:
+        where.append(f"{column} < %s")
+        params.append(date.fromisoformat(last) + timedelta(days=1))
+
+def export_response(connection, query, params, columns, fmt, filename):
+    """
+    Stream a query as a CSV or NDJSON download
+    The connection is handed back to the pool when the response is closed
+    """
+    rows = QueryStream(connection, query, tuple(params), batch_size=EXPORT_CONFIG['fetch_size'])
+    chunks = export_chunks(fmt, rows, columns, EXPORT_CONFIG['chunk_size'])
+    response = Response(chunks, mimetype=EXPORT_FORMATS[fmt])
+    response.headers['Content-Disposition'] = f'attachment; filename={filename}.{fmt}'
+    response.headers['X-Accel-Buffering'] = 'no'  # Let reverse proxies pass chunks straight through
+    response.call_on_close(rows.close)
+    return response
+
+APPOINTMENT_EXPORT_COLUMNS = ['id', 'appointment_date', 'status', 'fee', 'notes',
+                              'patient_id', 'patient_name', 'patient_phone',
+                              'doctor_id', 'doctor_name', 'specialization', 'created_at', 'updated_at']
+PATIENT_EXPORT_COLUMNS = ['id', 'name', 'age', 'gender', 'phone', 'email', 'address',
+                          'medical_history', 'created_at', 'updated_at']
+
+@app.route('/export/appointments.<fmt>')
+def export_appointments(fmt):
+    """
+    Export appointments joined with patient and doctor details
+    Args: fmt (str): csv or ndjson
+    Query args: start, end (str): Inclusive YYYY-MM-DD range, doctor_id, patient_id (int),
+                status (str): Scheduled, Completed or Cancelled
+    Returns: Streaming download ordered by appointment date
+    """
+    if 'user_id' not in session:
+        return redirect(url_for('login'))
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'error': f"Unknown format '{fmt}', use csv or ndjson"}), 404
+    
+    where, params = [], []
+    try:
+        date_range_filter(where, params, 'a.appointment_date', request.args.get('start'), request.args.get('end'))
+        start = date.fromisoformat(request.args['start']) if request.args.get('start') else None
+    except ValueError:
+        return jsonify({'error': 'start and end must be dates in YYYY-MM-DD format'}), 400
+    for name in ('doctor_id', 'patient_id'):
+        if request.args.get(name):
+            value = request.args.get(name, type=int)
+            if value is None:
+                return jsonify({'error': f'{name} must be a number'}), 400
+            where.append(f"a.{name} = %s")
+            params.append(value)
+    status = request.args.get('status')
+    if status:
+        if status not in ('Scheduled', 'Completed', 'Cancelled'):
+            return jsonify({'error': 'status must be Scheduled, Completed or Cancelled'}), 400
+        where.append("a.status = %s")
+        params.append(status)
+    
+    connection = get_db_connection(read_only=True)
+    if not connection:
+        return jsonify({'error': 'Database connection failed'}), 503
+    
+    try:
+        cursor = connection.cursor()
         try:
-            cursor = connection.cursor(dictionary=True)
-            query = """SELECT a.*, p.name as patient_name, d.name as doctor_name 
-                      FROM appointments a 
-                      JOIN patients p ON a.patient_id = p.id 
-                      JOIN doctors d ON a.doctor_id = d.id 
-                      ORDER BY a.appointment_date DESC"""
-            cursor.execute(query)
-            appointments_list = cursor.fetchall()
-        except Error as e:
-            flash(f'Error fetching appointments: {e}', 'error')
-            return redirect(url_for('appointments'))
+            source = archive.source(cursor, start)  # Both tables only if the range reaches archived months
         finally:
             cursor.close()
-            connection.close()
+    except Error as e:
+        connection.close()
+        return jsonify({'error': f'Error exporting appointments: {e}'}), 500
     
-    # Render HTML template for PDF
-    html = render_template('pdf_appointments.html', appointments=appointments_list, date=datetime.now().strftime('%Y-%m-%d'))
-    
-    # Create PDF
-    pdf_buffer = io.BytesIO()
-    pisa_status = pisa.CreatePDF(html, dest=pdf_buffer)
+    query = f"""SELECT a.id, a.appointment_date, a.status, a.fee, a.notes,
+                      a.patient_id, p.name AS patient_name, p.phone AS patient_phone,
+                      a.doctor_id, d.name AS doctor_name, d.specialization, a.created_at, a.updated_at
+               FROM {source} a
+               JOIN patients p ON a.patient_id = p.id
+               JOIN doctors d ON a.doctor_id = d.id
+               {'WHERE ' + ' AND '.join(where) if where else ''}
+               ORDER BY a.appointment_date, a.id"""
+    try:
+        return export_response(connection, query, params, APPOINTMENT_EXPORT_COLUMNS, fmt,
+                               f'appointments_{datetime.now().strftime("%Y%m%d")}')
+    except Error as e:
+        return jsonify({'error': f'Error exporting appointments: {e}'}), 500
+
+@app.route('/export/patients.<fmt>')
+def export_patients(fmt):
+    """
+    Export patient records
+    Args: fmt (str): csv or ndjson
+    Query args: created_from, created_to (str): Inclusive YYYY-MM-DD registration range,
+                gender (str): Male, Female or Other
+    Returns: Streaming download ordered by id
+    """
+    if 'user_id' not in session:
+        return redirect(url_for('login'))
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'error': f"Unknown format '{fmt}', use csv or ndjson"}), 404
     
-    if pisa_status.err:
-        flash('Error generating PDF', 'error')
-        return redirect(url_for('appointments'))
+    where, params = [], []
+    try:
+        date_range_filter(where, params, 'created_at', request.args.get('created_from'), request.args.get('created_to'))
+    except ValueError:
+        return jsonify({'error': 'created_from and created_to must be dates in YYYY-MM-DD format'}), 400
+    gender = request.args.get('gender')
+    if gender:
+        if gender not in ('Male', 'Female', 'Other'):
+            return jsonify({'error': 'gender must be Male, Female or Other'}), 400
+        where.append("gender = %s")
+        params.append(gender)
     
-    pdf_buffer.seek(0)
-    response = make_response(pdf_buffer.read())
-    response.headers['Content-Type'] = 'application/pdf'
-    response.headers['Content-Disposition'] = f'attachment; filename=appointments_report_{datetime.now().strftime("%Y%m%d")}.pdf'
+    connection = get_db_connection(read_only=True)
+    if not connection:
+        return jsonify({'error': 'Database connection failed'}), 503
     
-    return response
+    query = f"""SELECT {', '.join(PATIENT_EXPORT_COLUMNS)} FROM patients
+               {'WHERE ' + ' AND '.join(where) if where else ''}
+               ORDER BY id"""
+    try:
+        return export_response(connection, query, params, PATIENT_EXPORT_COLUMNS, fmt,
+                               f'patients_{datetime.now().strftime("%Y%m%d")}')
+    except Error as e:
+        return jsonify({'error': f'Error exporting patients: {e}'}), 500
 
 @app.route('/create-admin')
 def create_admin():
@@ -926,4 +2733,5 @@ if __name__ == '__main__':
     Run the Flask application
     Debug mode is enabled for development - disable in production
     """
+    assets.build()  # Refuse to start without the vendor files - run scripts/vendor_assets.py
     app.run(debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,110 @@
+"""
+Hospital Management System - Appointment Archive
+Author: HMS Development Team
+Description: Appointments before the archive horizon (a month boundary kept in
+archive_state) are moved from the appointments table to appointments_archive
+by scripts/archive_appointments.py, so the table every list, dashboard,
+scheduling check and counter refresh works against holds only recent months.
+Queries bounded to dates on or after the horizon read appointments alone;
+anything reaching further back reads both tables through source(), which
+returns a table expression to put after FROM. Archived rows keep their id and
+carry archived_at; roll-ups and patient counters still include them.
+"""
+
+import time
+from datetime import datetime
+
+from mysql.connector import Error, errorcode
+
+HOT = 'appointments'
+ARCHIVE = 'appointments_archive'
+COLUMNS = ('id', 'patient_id', 'doctor_id', 'appointment_date', 'fee', 'status', 'notes', 'created_at', 'updated_at')
+COLUMN_SQL = ', '.join(COLUMNS)
+
+# Both tables as one. MySQL pushes the outer query's conditions into each branch
+# (derived condition pushdown), so date and id predicates still use the indexes.
+BOTH = (f"(SELECT {COLUMN_SQL}, NULL AS archived_at FROM {HOT} "
+        f"UNION ALL SELECT {COLUMN_SQL}, archived_at FROM {ARCHIVE})")
+
+HORIZON_SQL = "SELECT archived_before FROM archive_state WHERE table_name = 'appointments'"
+
+# Seconds a process keeps using the horizon it read. The archive job publishes a new
+# horizon and waits longer than this before moving rows, so no process still routes
+# the months being moved to the appointments table alone.
+HORIZON_TTL = 60
+
+# False once archive_state turned out to be missing (migration 006 not run)
+_state = {'available': True, 'horizon': None, 'read_at': None}
+
+
+def available():
+    return _state['available']
+
+
+def missing_table(e):
+    # mysql.connector errors carry errno; aiomysql (PyMySQL) errors carry the code in args[0]
+    errno = getattr(e, 'errno', None) or (e.args[0] if e.args else None)
+    if errno != errorcode.ER_NO_SUCH_TABLE:
+        return False
+    if _state['available']:
+        print(f"{ARCHIVE} is missing - run scripts/migrations/006_appointment_archive.sql; "
+              f"all appointments are read from {HOT}")
+    _state['available'] = False
+    _state['horizon'] = None
+    return True
+
+
+def cached_horizon():
+    """
+    Returns: (fresh, horizon) - fresh is False when the horizon must be read again (HORIZON_SQL)
+    """
+    if not _state['available']:
+        return True, None
+    read_at = _state['read_at']
+    return read_at is not None and time.monotonic() - read_at < HORIZON_TTL, _state['horizon']
+
+
+def remember_horizon(value):
+    _state['horizon'] = value
+    _state['read_at'] = time.monotonic()
+
+
+def horizon(cursor):
+    """
+    First day still kept in the appointments table
+    Returns: date, or None when nothing has been archived (or the archive is not set up)
+    """
+    fresh, value = cached_horizon()
+    if fresh:
+        return value
+    try:
+        cursor.execute(HORIZON_SQL)
+        rows = cursor.fetchall()
+    except Error as e:
+        if not missing_table(e):
+            raise
+        return None
+    remember_horizon(rows[0][0] if rows else None)
+    return _state['horizon']
+
+
+def pick(horizon_day, first_day=None):
+    """
+    Table expression for appointments on or after first_day (None: all of them)
+    Only ranges starting at or after the horizon skip the archive: an appointment
+    moved back in time after archival stays in the appointments table.
+    """
+    if isinstance(first_day, datetime):
+        first_day = first_day.date()
+    if horizon_day is None or (first_day is not None and first_day >= horizon_day):
+        return HOT
+    return BOTH
+
+
+def source(cursor, first_day=None):
+    """
+    Table expression to read appointments from, e.g. f"SELECT ... FROM {archive.source(cursor, start)} a"
+    Args: cursor: Open cursor (reads the horizon at most every HORIZON_TTL seconds),
+          first_day (date): First day the query can match; None when it is not bounded below
+    """
+    return pick(horizon(cursor), first_day)
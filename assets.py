@@ -0,0 +1,217 @@
+"""
+Hospital Management System - Static Assets
+Author: HMS Development Team
+Description: Fingerprints the files under static/ with a content hash so they
+can be cached by browsers for a year, and keeps gzip (and brotli, when the
+brotli package is installed) copies next to them so they are compressed once
+instead of on every request. Also compresses dynamic responses on the fly.
+"""
+
+import gzip
+import hashlib
+import mimetypes
+import os
+import posixpath
+import re
+import threading
+
+try:
+    import brotli
+except ImportError:  # Optional - assets and pages are gzip-only without it
+    brotli = None
+
+# Already-compressed formats (images, woff/woff2 fonts) are not worth compressing again
+COMPRESSIBLE_SUFFIXES = ('.css', '.js', '.svg', '.json', '.map', '.txt', '.html', '.ttf', '.eot')
+_CSS_URL = re.compile(r'''url\(\s*(['"]?)([^'")]+)\1\s*\)''')
+
+
+class MissingAssetsError(FileNotFoundError):
+    """
+    Raised when required static files (e.g. vendor files not downloaded yet) are missing
+    """
+
+
+def accepted_encoding(accept_encodings, available=('br', 'gzip')):
+    """
+    Best content coding the client accepts, among those we can produce
+    Args: accept_encodings: werkzeug MIMEAccept-like object (request.accept_encodings)
+    Returns: 'br', 'gzip' or None
+    """
+    for encoding in available:
+        if encoding == 'br' and brotli is None:
+            continue
+        if accept_encodings[encoding]:
+            return encoding
+    return None
+
+
+def compress(data, encoding, gzip_level=6, brotli_quality=5):
+    if encoding == 'br':
+        return brotli.compress(data, quality=brotli_quality)
+    return gzip.compress(data, compresslevel=gzip_level, mtime=0)
+
+
+class Asset:
+    """
+    One built asset: the fingerprinted file and its precompressed variants
+    """
+
+    __slots__ = ('logical', 'name', 'path', 'mimetype', 'digest', 'size', 'variants')
+
+    def __init__(self, logical, name, path, mimetype, digest, size):
+        self.logical = logical      # Path under static/, e.g. css/hms.css
+        self.name = name            # Fingerprinted path, e.g. css/hms.3f2a9c1d04be.css
+        self.path = path            # Built file on disk
+        self.mimetype = mimetype
+        self.digest = digest
+        self.size = size
+        self.variants = {}          # encoding -> (path, size)
+
+
+class AssetPipeline:
+    """
+    Builds fingerprinted, precompressed copies of static files into build_dir.
+
+    CSS is rewritten so url() references to other static files point at their
+    fingerprinted names, which keeps a font or image change from being hidden
+    behind a stylesheet that is cached forever. The build fails while any of
+    the `required` files is missing; other files referenced from templates but
+    not present resolve to their entry in `fallbacks`, if any.
+    """
+
+    def __init__(self, static_dir, build_dir, url_prefix='/assets', fallbacks=None, required=(),
+                 gzip_level=9, brotli_quality=11):
+        """
+        Args:
+            static_dir (str): Source directory (the app's static/)
+            build_dir (str): Where fingerprinted and compressed copies are written
+            url_prefix (str): URL path the assets route is mounted at
+            fallbacks (dict): Logical path -> URL used when the file is missing
+            required (tuple): Logical paths that must be present for the build to succeed
+            gzip_level (int), brotli_quality (int): Precompression settings (built once, so use the maximum)
+        """
+        self.static_dir = static_dir
+        self.build_dir = build_dir
+        self.url_prefix = url_prefix.rstrip('/')
+        self.fallbacks = dict(fallbacks or {})
+        self.required = tuple(required)
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self._lock = threading.Lock()
+        self._by_logical = None
+        self._by_name = {}
+        self._missing = set()
+
+    def build(self):
+        """
+        Fingerprint and compress every static file now rather than on the first asset_url() call
+        Raises: MissingAssetsError if a required file is missing
+        """
+        if self._by_logical is None:
+            with self._lock:
+                if self._by_logical is None:
+                    self._build()
+
+    def _build(self):
+        by_logical = {}
+        sources = []
+        for folder, _, files in os.walk(self.static_dir):
+            for filename in files:
+                path = os.path.join(folder, filename)
+                logical = os.path.relpath(path, self.static_dir).replace(os.sep, '/')
+                sources.append((logical, path))
+        missing = sorted(set(self.required) - {logical for logical, _ in sources})
+        if missing:
+            raise MissingAssetsError(f"Missing from {self.static_dir}: {', '.join(missing)}")
+        # Stylesheets last so the files they reference already have fingerprinted names
+        sources.sort(key=lambda item: (item[0].endswith('.css'), item[0]))
+        for logical, path in sources:
+            with open(path, 'rb') as handle:
+                data = handle.read()
+            if logical.endswith('.css'):
+                data = self._rewrite_css(logical, data, by_logical)
+            by_logical[logical] = self._write(logical, data)
+        self._by_name = {asset.name: asset for asset in by_logical.values()}
+        self._by_logical = by_logical
+
+    def _rewrite_css(self, logical, data, built):
+        base = posixpath.dirname(logical)
+        text = data.decode('utf-8')
+
+        def replace(match):
+            quote, reference = match.groups()
+            if reference.startswith(('data:', 'http:', 'https:', '//', '#', '/')):
+                return match.group(0)
+            path, suffix = re.match(r'([^?#]*)(.*)', reference).groups()
+            target = built.get(posixpath.normpath(posixpath.join(base, path)))
+            if target is None:
+                return match.group(0)
+            relative = posixpath.relpath(target.name, base or '.')
+            return f'url({quote}{relative}{suffix}{quote})'
+
+        return _CSS_URL.sub(replace, text).encode('utf-8')
+
+    def _write(self, logical, data):
+        digest = hashlib.sha256(data).hexdigest()[:12]
+        stem, suffix = posixpath.splitext(logical)
+        name = f'{stem}.{digest}{suffix}'
+        path = os.path.join(self.build_dir, *name.split('/'))
+        mimetype = mimetypes.guess_type(logical)[0] or 'application/octet-stream'
+        asset = Asset(logical, name, path, mimetype, digest, len(data))
+        self._store(path, data)
+        if suffix.lower() in COMPRESSIBLE_SUFFIXES:
+            variants = [('gzip', '.gz', lambda: gzip.compress(data, compresslevel=self.gzip_level, mtime=0))]
+            if brotli is not None:
+                variants.insert(0, ('br', '.br', lambda: brotli.compress(data, quality=self.brotli_quality)))
+            for encoding, extension, build in variants:
+                variant_path = path + extension
+                if not os.path.exists(variant_path):
+                    self._store(variant_path, build())
+                size = os.path.getsize(variant_path)
+                if size < len(data):
+                    asset.variants[encoding] = (variant_path, size)
+        return asset
+
+    @staticmethod
+    def _store(path, data):
+        # Names contain the content hash, so an existing file already holds these bytes
+        if os.path.exists(path):
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f'{path}.{os.getpid()}.tmp'
+        with open(temp_path, 'wb') as handle:
+            handle.write(data)
+        os.replace(temp_path, path)
+
+    def url(self, logical):
+        """
+        URL for a static file - fingerprinted when it exists, else its fallback
+        Args: logical (str): Path under static/, e.g. 'css/hms.css'
+        """
+        self.build()
+        asset = self._by_logical.get(logical)
+        if asset is not None:
+            return f'{self.url_prefix}/{asset.name}'
+        if logical not in self._missing:
+            self._missing.add(logical)
+            print(f"Static asset {logical} not found; using {self.fallbacks.get(logical, 'an unversioned URL')}")
+        return self.fallbacks.get(logical) or f'{self.url_prefix}/{logical}'
+
+    def lookup(self, name):
+        """
+        Find an asset by its fingerprinted name
+        Returns: Asset or None
+        """
+        self.build()
+        return self._by_name.get(name)
+
+    def stats(self):
+        self.build()
+        assets = list(self._by_logical.values())
+        return {
+            'assets': len(assets),
+            'bytes': sum(asset.size for asset in assets),
+            'gzip_bytes': sum(asset.variants.get('gzip', (None, asset.size))[1] for asset in assets),
+            'brotli': brotli is not None,
+            'missing': sorted(self._missing),
+        }
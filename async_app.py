@@ -0,0 +1,540 @@
+"""
+Hospital Management System - Async Serving Mode
+Author: HMS Development Team
+Description: Optional ASGI entry point. The read-heavy pages (dashboard,
+patients, doctors, appointments) are served by coroutines on an aiomysql
+connection pool, so a slow query no longer holds a worker thread and one
+process keeps many of them in flight; the dashboard runs its independent
+statistics queries side by side. Every other route is the unchanged Flask
+app, run in a thread pool next to the event loop. Sessions (same cookie and
+secret key), templates, caches and ETags are shared with the Flask app.
+
+Requires: pip install Quart==0.18.4 aiomysql==0.2.0 (Quart brings Hypercorn)
+Usage: hypercorn async_app:application --bind 0.0.0.0:5000 --workers 2
+       python async_app.py
+"""
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from datetime import date, datetime, timedelta
+
+import aiomysql
+from hypercorn.middleware import AsyncioWSGIMiddleware
+from markupsafe import Markup
+from pymysql.constants import ER
+from quart import (Quart, Response, abort, flash, g, make_response, redirect, render_template, request,
+                   session, url_for)
+from werkzeug.exceptions import HTTPException
+
+import app as hms
+import archive
+import dal
+import rollups
+from assets import accepted_encoding, compress
+from db_pool import PoolTimeoutError
+from metrics import sql_operation
+from pagination import APPROXIMATE_COUNT_SQL, InvalidCursor, Page, page_from_rows, page_query
+from search_index import indexable
+
+# Routes served by coroutines; all others are dispatched to the Flask app
+ASYNC_ENDPOINTS = ('dashboard', 'patients', 'doctors', 'appointments')
+
+quart_app = Quart(__name__)
+quart_app.secret_key = hms.app.secret_key
+quart_app.config['SESSION_COOKIE_NAME'] = hms.app.config['SESSION_COOKIE_NAME']
+quart_app.add_template_global(hms.assets.url, 'asset_url')
+
+db_pool = None  # aiomysql pool, opened when the server starts
+
+
+@quart_app.before_serving
+async def open_pool():
+    global db_pool
+    config = hms.DB_CONFIG
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(hms.ASYNC_CONFIG['wsgi_threads'], thread_name_prefix='hms-wsgi'))
+    db_pool = await aiomysql.create_pool(host=config['host'], port=config['port'], user=config['user'],
+                                         password=config['password'], db=config['database'],
+                                         autocommit=config['autocommit'], charset='utf8mb4',
+                                         minsize=hms.ASYNC_CONFIG['pool_min'],
+                                         maxsize=hms.ASYNC_CONFIG['pool_max'],
+                                         pool_recycle=hms.ASYNC_CONFIG['pool_recycle'])
+
+
+@quart_app.after_serving
+async def close_pool():
+    # Write queued audit entries while the database is still reachable (atexit would too, later)
+    await asyncio.get_running_loop().run_in_executor(None, hms.audit_log.close)
+    if db_pool is not None:
+        db_pool.close()
+        await db_pool.wait_closed()
+
+
+class AsyncCursor:
+    """
+    aiomysql cursor returning named tuple rows like dal.PreparedCursor, so
+    rows, cached query results and fragments are interchangeable with the
+    Flask routes. Query time is reported to the metrics registry.
+    """
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self._rows = []
+        self._position = 0
+
+    async def execute(self, sql, params=()):
+        started = time.perf_counter()
+        try:
+            await self._cursor.execute(sql, tuple(params) if params else None)
+            rows = await self._cursor.fetchall() if self._cursor.description else ()
+        finally:
+            seconds = time.perf_counter() - started
+            hms.db_query_seconds.observe(seconds, sql_operation(sql))
+            g.db_seconds = g.get('db_seconds', 0.0) + seconds
+            g.db_queries = g.get('db_queries', 0) + 1
+        if rows:
+            make = dal.row_type([column[0] for column in self._cursor.description])._make
+            self._rows = [make(row) for row in rows]
+        else:
+            self._rows = []
+        self._position = 0
+
+    async def fetchone(self):
+        if self._position >= len(self._rows):
+            return None
+        row = self._rows[self._position]
+        self._position += 1
+        return row
+
+    async def fetchall(self):
+        rows = self._rows[self._position:]
+        self._position = len(self._rows)
+        return rows
+
+
+@asynccontextmanager
+async def db_cursor():
+    """
+    Borrow a connection from the async pool for the duration of the block
+    Usage: async with db_cursor() as cursor: ...
+    Raises: PoolTimeoutError if no connection is free within borrow_timeout
+    """
+    try:
+        connection = await asyncio.wait_for(db_pool.acquire(), hms.ASYNC_CONFIG['borrow_timeout'])
+    except asyncio.TimeoutError:
+        raise PoolTimeoutError(f"no connection free after {hms.ASYNC_CONFIG['borrow_timeout']}s")
+    try:
+        cursor = await connection.cursor()
+        try:
+            yield AsyncCursor(cursor)
+        finally:
+            await cursor.close()
+    finally:
+        db_pool.release(connection)
+
+
+async def scalar(sql, params=()):
+    """
+    Run a single-value query on its own connection
+    """
+    async with db_cursor() as cursor:
+        await cursor.execute(sql, params)
+        row = await cursor.fetchone()
+        return row[0] if row else None
+
+
+async def archive_horizon(cursor):
+    """
+    Async version of archive.horizon() - first day kept in the appointments table, or None
+    """
+    fresh, horizon = archive.cached_horizon()
+    if fresh:
+        return horizon
+    try:
+        await cursor.execute(archive.HORIZON_SQL)
+        rows = await cursor.fetchall()
+    except aiomysql.Error as e:
+        if not archive.missing_table(e):
+            raise
+        return None
+    archive.remember_horizon(rows[0][0] if rows else None)
+    return archive.cached_horizon()[1]
+
+
+async def load_dashboard_stats(day):
+    """
+    Dashboard statistics, each query on its own connection at the same time
+    Args: day (date): Day for the appointment count
+    Returns: dict of statistics
+    """
+    start = datetime.combine(day, datetime.min.time())
+    queries = {
+        'total_patients': ("SELECT COUNT(*) FROM patients", ()),
+        'total_doctors': ("SELECT COUNT(*) FROM doctors", ()),
+        'today_appointments': ("""SELECT COUNT(*) FROM appointments
+                                  WHERE appointment_date >= %s AND appointment_date < %s""",
+                               (start, start + timedelta(days=1))),
+        'total_income': ("SELECT COALESCE(SUM(fee), 0) FROM appointments", ()),
+    }
+    from_rollup = rollups.available()
+    if from_rollup:
+        queries['today_appointments'] = (rollups.DAY_COUNT_SQL, (day,))
+        queries['total_income'] = (rollups.income_sql(), ())
+    else:
+        async with db_cursor() as cursor:
+            source = archive.pick(await archive_horizon(cursor))
+        queries['total_income'] = (f"SELECT COALESCE(SUM(fee), 0) FROM {source} AS a", ())
+    try:
+        values = await asyncio.gather(*(scalar(sql, params) for sql, params in queries.values()))
+    except aiomysql.Error as e:
+        # Roll-up table missing (migration 003 not run): answer from appointments, like app.load_dashboard_stats
+        if from_rollup and (rollups.missing_day_totals(e) or rollups.missing_table(e)):
+            return await load_dashboard_stats(day)
+        raise
+    stats = dict(zip(queries, values))
+    stats['today_appointments'] = int(stats['today_appointments'])
+    return stats
+
+
+async def page_validators(cursor, tables, *key):
+    """
+    Async version of app.page_validators - same ETags, so either mode revalidates the other's pages
+    """
+    if not hms.CONDITIONAL_GET_CONFIG['enabled']:
+        return None, None, None
+    try:
+        await cursor.execute(*hms.table_state_query(tables))
+    except aiomysql.ProgrammingError as e:
+        if e.args[0] == ER.NO_SUCH_TABLE:
+            print("table_versions is missing - run scripts/migrations/002_table_versions.sql")
+            return None, None, None
+        raise
+    state = hms.table_state_from_rows(await cursor.fetchall())
+    return hms.validators_from_state(state, tables, request.endpoint, key, session)
+
+
+def not_modified(etag, last_modified):
+    if etag is None or not hms.client_is_current(request, etag, last_modified):
+        return None
+    return hms.with_validators(Response('', status=304), etag, last_modified)
+
+
+async def cached_fragment(name, tables, versions, key, load):
+    """
+    Async version of app.cached_fragment (shares its cache)
+    Args: load (callable): Coroutine function returning the template context
+    """
+    async def render():
+        return await render_template(name, **await load())
+    return Markup(await hms.fragment_cache.get_or_load_async((name, key, versions), tables, render))
+
+
+async def fetch_page(cursor, select_sql, keyset, where, params, after, before, per_page):
+    query, query_params = page_query(select_sql, keyset, where, params, after, before, per_page)
+    await cursor.execute(query, query_params)
+    return page_from_rows(await cursor.fetchall(), keyset, after, before, per_page)
+
+
+async def approximate_count(cursor, table):
+    await cursor.execute(APPROXIMATE_COUNT_SQL, (table,))
+    row = await cursor.fetchone()
+    return int(row[0]) if row and row[0] is not None else None
+
+
+async def search_patients(cursor, search, limit):
+    ids = hms.patient_search_index.search(search, limit=limit)
+    if not ids:
+        return []
+    placeholders = ', '.join(['%s'] * len(ids))
+    await cursor.execute(f"SELECT * FROM patients WHERE id IN ({placeholders})", tuple(ids))
+    rows_by_id = {row.id: row for row in await cursor.fetchall()}
+    return [rows_by_id[patient_id] for patient_id in ids if patient_id in rows_by_id]
+
+
+@quart_app.route('/dashboard')
+async def dashboard():
+    """
+    Dashboard route - displays system statistics
+    Requires authentication
+    """
+    if 'user_id' not in session:
+        return redirect(url_for('login'))
+
+    stats = {
+        'total_patients': 0,
+        'total_doctors': 0,
+        'today_appointments': 0,
+        'total_income': 0
+    }
+
+    today = date.today()
+    cached = hms.dashboard_cache.get(today)
+    if cached:
+        return await render_template('dashboard.html', stats=cached)
+
+    try:
+        stats = await load_dashboard_stats(today)
+        hms.dashboard_cache.set(today, stats)
+    except PoolTimeoutError as e:
+        print(f"Database pool exhausted: {e}")
+    except aiomysql.Error as e:
+        await flash(f'Error fetching dashboard data: {e}', 'error')
+
+    return await render_template('dashboard.html', stats=stats)
+
+
+@quart_app.route('/patients')
+async def patients():
+    """
+    Patients list route - displays all patients with search functionality
+    """
+    if 'user_id' not in session:
+        return redirect(url_for('login'))
+
+    search = request.args.get('search', '')
+    options = hms.get_patient_list_args(request.args)
+    after, before, per_page = hms.get_page_args(request.args)
+    key = (search, tuple(options.values()), after, before, per_page)
+    table_html = etag = last_modified = None
+
+    try:
+        async with db_cursor() as cursor:
+            versions, etag, last_modified = await page_validators(cursor, hms.PATIENT_LIST_TABLES, *key)
+            unchanged = not_modified(etag, last_modified)
+            if unchanged:
+                return unchanged
+
+            async def load():
+                if search:
+                    hms.patient_search_index.refresh_if_stale()
+                if search and hms.patient_search_index.ready and indexable(search):
+                    page = Page(await search_patients(cursor, search, per_page), per_page)
+                elif search:
+                    page = await fetch_page(cursor, dal.PATIENT_LIST, hms.PATIENT_KEYSET,
+                                            ["(name LIKE %s OR phone LIKE %s)"], [f'%{search}%', f'%{search}%'],
+                                            after, before, per_page)
+                    hms.set_page_urls(page, 'patients', url_for, search=search)
+                else:
+                    keyset, where, params = hms.patient_list_query(options)
+                    page = await fetch_page(cursor, dal.PATIENT_LIST, keyset, where, params, after, before, per_page)
+                    if hms.PAGINATION_CONFIG['approx_total'] and not where:
+                        page.approx_total = await approximate_count(cursor, 'patients')
+                    hms.set_page_urls(page, 'patients', url_for, **options)
+                return {'patients': page.items, 'search': search, 'page': page}
+            table_html = await cached_fragment('patients_table.html', hms.PATIENT_LIST_TABLES, versions, key,
+                                               load)
+
+    except InvalidCursor:
+        return redirect(url_for('patients', search=search or None))
+    except PoolTimeoutError as e:
+        print(f"Database pool exhausted: {e}")
+        etag = None
+    except aiomysql.Error as e:
+        if rollups.missing_patient_counters(e):
+            return redirect(url_for('patients', search=search or None))
+        await flash(f'Error fetching patients: {e}', 'error')
+        etag = None
+
+    response = await make_response(await render_template('patients.html', table_html=table_html, search=search,
+                                                         options=options, sorts=hms.PATIENT_SORTS))
+    return hms.with_validators(response, etag, last_modified)
+
+
+@quart_app.route('/doctors')
+async def doctors():
+    """
+    Doctors list route - displays all doctors with specialization filter
+    """
+    if 'user_id' not in session:
+        return redirect(url_for('login'))
+
+    specialization = request.args.get('specialization', '')
+    after, before, per_page = hms.get_page_args(request.args)
+    key = (specialization, after, before, per_page)
+    table_html = etag = last_modified = None
+    specializations = []
+
+    try:
+        async with db_cursor() as cursor:
+            versions, etag, last_modified = await page_validators(cursor, ('doctors',), *key)
+            unchanged = not_modified(etag, last_modified)
+            if unchanged:
+                return unchanged
+
+            rows = await hms.query_cache.query_async(cursor, dal.DOCTOR_SPECIALIZATIONS, tables=('doctors',))
+            specializations = [row.specialization for row in rows]
+
+            async def load():
+                where, params = [], []
+                if specialization:
+                    where.append("specialization = %s")
+                    params.append(specialization)
+                page = await fetch_page(cursor, dal.DOCTOR_LIST, hms.DOCTOR_KEYSET, where, params,
+                                        after, before, per_page)
+                if hms.PAGINATION_CONFIG['approx_total'] and not specialization:
+                    page.approx_total = await approximate_count(cursor, 'doctors')
+                hms.set_page_urls(page, 'doctors', url_for, specialization=specialization)
+                return {'doctors': page.items, 'selected_specialization': specialization, 'page': page}
+            table_html = await cached_fragment('doctors_table.html', ('doctors',), versions, key, load)
+
+    except InvalidCursor:
+        return redirect(url_for('doctors', specialization=specialization or None))
+    except PoolTimeoutError as e:
+        print(f"Database pool exhausted: {e}")
+        etag = None
+    except aiomysql.Error as e:
+        await flash(f'Error fetching doctors: {e}', 'error')
+        etag = None
+
+    response = await make_response(await render_template('doctors.html', table_html=table_html,
+                                                         specializations=specializations,
+                                                         selected_specialization=specialization))
+    return hms.with_validators(response, etag, last_modified)
+
+
+@quart_app.route('/appointments')
+async def appointments():
+    """
+    Appointments list route - displays all appointments with date filter
+    """
+    if 'user_id' not in session:
+        return redirect(url_for('login'))
+
+    date_filter = request.args.get('date', '')
+    after, before, per_page = hms.get_page_args(request.args)
+    key = (date_filter, after, before, per_page)
+    tables = ('appointments', 'patients', 'doctors')
+    table_html = etag = last_modified = None
+
+    try:
+        async with db_cursor() as cursor:
+            versions, etag, last_modified = await page_validators(cursor, tables, *key)
+            unchanged = not_modified(etag, last_modified)
+            if unchanged:
+                return unchanged
+
+            async def load():
+                where, params = [], []
+                horizon = await archive_horizon(cursor)
+                source = archive.HOT
+                if date_filter:
+                    day = datetime.strptime(date_filter, '%Y-%m-%d')
+                    where.append("a.appointment_date >= %s AND a.appointment_date < %s")
+                    params.extend([day, day + timedelta(days=1)])
+                    source = archive.pick(horizon, day)
+                page = await fetch_page(cursor, dal.APPOINTMENT_LIST_FROM.format(source), hms.APPOINTMENT_KEYSET,
+                                        where, params, after, before, per_page)
+                if hms.PAGINATION_CONFIG['approx_total'] and not date_filter:
+                    page.approx_total = await approximate_count(cursor, 'appointments')
+                hms.set_page_urls(page, 'appointments', url_for, date=date_filter)
+                return {'appointments': page.items, 'date_filter': date_filter, 'page': page,
+                        'archived_before': horizon}
+            table_html = await cached_fragment('appointments_table.html', tables, versions, key, load)
+
+    except InvalidCursor:
+        return redirect(url_for('appointments', date=date_filter or None))
+    except ValueError:
+        await flash('Invalid date filter!', 'error')
+        etag = None
+    except PoolTimeoutError as e:
+        print(f"Database pool exhausted: {e}")
+        etag = None
+    except aiomysql.Error as e:
+        await flash(f'Error fetching appointments: {e}', 'error')
+        etag = None
+
+    response = await make_response(await render_template('appointments.html', table_html=table_html,
+                                                          date_filter=date_filter))
+    return hms.with_validators(response, etag, last_modified)
+
+
+def served_by_flask(**kwargs):
+    # Only reached when quart_app is served without the dispatcher below
+    abort(404)
+
+
+# Register every other Flask route so url_for() in templates builds the same URLs
+for rule in hms.app.url_map.iter_rules():
+    if rule.endpoint not in quart_app.view_functions:
+        quart_app.add_url_rule(rule.rule, rule.endpoint, served_by_flask,
+                               methods=sorted(rule.methods - {'HEAD', 'OPTIONS'}))
+
+
+@quart_app.before_request
+async def start_request_timer():
+    g.request_started = time.perf_counter()
+
+
+@quart_app.after_request
+async def finish_response(response):
+    """
+    Request metrics and compression, as the Flask app's after_request hooks do
+    """
+    started = g.get('request_started')
+    if hms.METRICS_CONFIG['enabled'] and started is not None:
+        elapsed = time.perf_counter() - started
+        hms.request_seconds.observe(elapsed, request.endpoint or 'unmatched', request.method,
+                                    str(response.status_code))
+        hms.request_db_queries.observe(g.get('db_queries', 0), request.endpoint or 'unmatched')
+        hms.request_db_seconds.observe(g.get('db_seconds', 0.0), request.endpoint or 'unmatched')
+    config = hms.COMPRESSION_CONFIG
+    if (not config['enabled'] or response.status_code != 200 or 'Content-Encoding' in response.headers
+            or response.mimetype not in config['mimetypes']):
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = accepted_encoding(request.accept_encodings)
+    data = await response.get_data()
+    if encoding is None or len(data) < config['min_size']:
+        return response
+    response.set_data(compress(data, encoding, config['gzip_level'], config['brotli_quality']))
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+
+class Dispatcher:
+    """
+    ASGI application sending requests for ASYNC_ENDPOINTS to quart_app and
+    everything else to the Flask app (run in the event loop's thread pool).
+    The middleware buffers a request body before calling Flask and answers
+    400 above max_body_size, so it must admit the largest CSV upload.
+    """
+
+    def __init__(self, async_app, wsgi_app, endpoints, max_body_size):
+        self.async_app = async_app
+        self.wsgi_app = AsyncioWSGIMiddleware(wsgi_app, max_body_size)
+        self.endpoints = frozenset(endpoints)
+        self.urls = wsgi_app.url_map.bind('localhost')  # No host matching, so the name is unused
+
+    def is_async(self, scope):
+        try:
+            endpoint, _ = self.urls.match(scope['path'], method=scope['method'])
+        except HTTPException:
+            return False
+        return endpoint in self.endpoints
+
+    async def __call__(self, scope, receive, send):
+        # Lifespan events go to quart_app, which opens and closes the pool
+        if scope['type'] != 'http' or self.is_async(scope):
+            await self.async_app(scope, receive, send)
+        else:
+            await self.wsgi_app(scope, receive, send)
+
+
+# Build the static assets before serving; fails while vendor files are missing (scripts/vendor_assets.py)
+hms.assets.build()
+
+application = Dispatcher(quart_app, hms.app, ASYNC_ENDPOINTS,
+                         max(hms.ASYNC_CONFIG['max_body_mb'], hms.IMPORT_CONFIG['max_upload_mb']) * 1024 * 1024)
+
+if __name__ == '__main__':
+    """
+    Run the async server for development - use hypercorn directly in production
+    """
+    from hypercorn.asyncio import serve
+    from hypercorn.config import Config
+
+    config = Config()
+    config.bind = ['0.0.0.0:5000']
+    asyncio.run(serve(application, config))
@@ -0,0 +1,309 @@
+"""
+Hospital Management System - Audit Log
+Author: HMS Development Team
+Description: Records who created, edited, completed, cancelled or deleted
+patients, doctors and appointments, with the fields that changed. Routes
+hand each entry to AuditLog.record(), which only diffs the rows and puts the
+entry on a bounded in-process queue; a background thread writes the queue to
+the audit_log table in batches. When the writer falls behind or the database
+is unreachable, entries go to a local spill file that is replayed later, so
+requests never wait on the audit table.
+"""
+
+import json
+import os
+import queue
+import threading
+import time
+from datetime import date, datetime
+from decimal import Decimal
+
+from mysql.connector import Error
+
+INSERT_SQL = """INSERT INTO audit_log (occurred_at, user_id, username, action, table_name, row_id, changes, remote_addr)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)"""
+
+# Maintained by the database or by rollups.py, not by the user who made the change
+IGNORED_FIELDS = frozenset(('created_at', 'updated_at', 'total_appointments', 'last_appointment',
+                            'next_scheduled_appointment'))
+
+_STOP = object()
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (bytes, bytearray)):
+        return value.decode('utf-8', 'replace')
+    raise TypeError(f'{type(value).__name__} is not JSON serialisable')
+
+
+def diff(before, after):
+    """
+    Fields that differ between two versions of a row
+    Args: before, after (dict): Row before and after the write; None for a create or delete
+    Returns: dict field -> [old, new]
+    """
+    if before and after:
+        fields = after.keys()
+    else:
+        fields = (before or after or {}).keys()
+    before, after = before or {}, after or {}
+    return {field: [before.get(field), after.get(field)] for field in fields
+            if field not in IGNORED_FIELDS and before.get(field) != after.get(field)}
+
+
+def make_entry(action, table, row_id, before=None, after=None, user_id=None, username=None, remote_addr=None):
+    """
+    Build the audit_log row for one write
+    Returns: tuple in INSERT_SQL order, or None for an update that changed nothing
+    """
+    changes = diff(before, after)
+    if action == 'update' and not changes:
+        return None
+    return (datetime.now(), user_id, username, action, table, row_id,
+            json.dumps(changes, default=_json_default, separators=(',', ':')), remote_addr)
+
+
+class AuditLog:
+    """
+    Write-behind audit log.
+
+    record() is all a request pays for: a diff, a JSON dump and a queue put.
+    The writer thread (started on first use) waits for an entry, drains up
+    to `batch_size` more and inserts them with one multi-row INSERT over its
+    own connection. A full queue makes record() wait at most `put_timeout`
+    before appending the entry to `spill_path` instead; failed batches are
+    retried and then spilled too. The writer replays the spill file whenever
+    the queue is idle. close() (registered with atexit by the app) drains the
+    queue before the process exits.
+    """
+
+    def __init__(self, connect, max_queue=10000, batch_size=500, flush_interval=1.0, put_timeout=0.001,
+                 retries=3, retry_delay=0.5, spill_path=None):
+        """
+        Args:
+            connect (callable): Returns a new database connection for the writer
+            max_queue (int): Entries held in memory before spilling
+            batch_size (int): Entries per INSERT
+            flush_interval (float): Seconds the writer waits for an entry before checking the spill file
+            put_timeout (float): Seconds record() waits for queue space before spilling
+            retries (int), retry_delay (float): Attempts per batch and the first backoff in seconds
+            spill_path (str): JSON lines file for entries that could not be queued or written;
+                              None drops them (and counts them)
+        """
+        self.connect = connect
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.spill_path = spill_path
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._spill_lock = threading.Lock()
+        self._thread = None
+        self._connection = None
+        self._closed = False
+        self.recorded = 0
+        self.written = 0
+        self.batches = 0
+        self.spilled = 0
+        self.dropped = 0
+        self.replayed = 0
+        self.failures = 0
+        self.last_error = None
+        self.last_batch_seconds = None
+
+    def _start(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None and not self._closed:
+                    self._thread = threading.Thread(target=self._run, name='audit-writer', daemon=True)
+                    self._thread.start()
+
+    def record(self, action, table, row_id, before=None, after=None, user_id=None, username=None, remote_addr=None):
+        """
+        Queue an audit entry; call after the write committed
+        Args: action (str): create, update, complete, cancel, delete or import, table (str): Table written,
+              row_id (int): Row written (None for multi-row writes), before, after (dict): Row versions,
+              user_id, username, remote_addr: Who made the change
+        """
+        entry = make_entry(action, table, row_id, before, after, user_id, username, remote_addr)
+        if entry is None:
+            return
+        self.recorded += 1
+        if self._closed:
+            self._spill([entry])
+            return
+        self._start()
+        try:
+            self._queue.put(entry, timeout=self.put_timeout)
+        except queue.Full:
+            # The writer is behind - keep the entry on disk rather than hold the request
+            self._spill([entry])
+
+    # Writer thread
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            try:
+                entry = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                self._replay()
+                continue
+            batch = []
+            while True:
+                if entry is _STOP:
+                    stopping = True
+                else:
+                    batch.append(entry)
+                if len(batch) >= self.batch_size:
+                    self._write(batch)
+                    batch = []
+                try:
+                    entry = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            if batch:
+                self._write(batch)
+        self._replay()
+        self._disconnect()
+
+    def _insert(self, batch):
+        if self._connection is None:
+            self._connection = self.connect()
+        cursor = self._connection.cursor()
+        try:
+            cursor.executemany(INSERT_SQL, batch)  # Rewritten by the connector into one multi-row INSERT
+            self._connection.commit()
+        finally:
+            cursor.close()
+
+    def _disconnect(self):
+        connection, self._connection = self._connection, None
+        if connection is not None:
+            try:
+                connection.close()
+            except Exception:
+                pass
+
+    def _write(self, batch):
+        """
+        Insert a batch, retrying with backoff; spill it if every attempt fails
+        Returns: bool: True if written
+        """
+        started = time.perf_counter()
+        for attempt in range(self.retries):
+            try:
+                self._insert(batch)
+                self.written += len(batch)
+                self.batches += 1
+                self.last_batch_seconds = time.perf_counter() - started
+                return True
+            except Error as e:
+                self.failures += 1
+                self.last_error = str(e)
+                self._disconnect()
+                if attempt + 1 < self.retries and not self._closed:
+                    time.sleep(self.retry_delay * 2 ** attempt)
+        print(f"Audit log write failed ({self.last_error}); {len(batch)} entries spilled")
+        self._spill(batch)
+        return False
+
+    # Spill file
+
+    def _spill(self, entries):
+        if self.spill_path is None:
+            self.dropped += len(entries)
+            return
+        lines = ''.join(json.dumps(entry, default=_json_default, separators=(',', ':')) + '\n' for entry in entries)
+        with self._spill_lock:
+            with open(self.spill_path, 'a', encoding='utf-8') as handle:
+                handle.write(lines)
+            self.spilled += len(entries)
+
+    def _replay(self):
+        """
+        Write spilled entries back to the database (writer thread only)
+        """
+        if self.spill_path is None:
+            return
+        # Take the file over so new spills start a fresh one; the pid keeps other workers' replays apart.
+        # A replay file left by an earlier failed attempt is finished first.
+        replay_path = f'{self.spill_path}.{os.getpid()}.replay'
+        with self._spill_lock:
+            if not os.path.exists(replay_path):
+                try:
+                    os.replace(self.spill_path, replay_path)
+                except FileNotFoundError:
+                    return  # Nothing spilled, or another worker took it
+        with open(replay_path, encoding='utf-8') as handle:
+            entries = [json.loads(line) for line in handle if line.strip()]
+        for entry in entries:
+            entry[0] = datetime.fromisoformat(entry[0])
+        for start in range(0, len(entries), self.batch_size):
+            batch = [tuple(entry) for entry in entries[start:start + self.batch_size]]
+            try:
+                self._insert(batch)
+            except Error as e:
+                self.failures += 1
+                self.last_error = str(e)
+                self._disconnect()
+                # Still unreachable - keep what is left for the next attempt
+                rest = entries[start:]
+                with open(replay_path, 'w', encoding='utf-8') as handle:
+                    handle.write(''.join(json.dumps(entry, default=_json_default, separators=(',', ':')) + '\n'
+                                         for entry in rest))
+                return
+            self.replayed += len(batch)
+            self.written += len(batch)
+        os.remove(replay_path)
+
+    def close(self, timeout=10.0):
+        """
+        Stop accepting entries, write what is queued and stop the writer
+        Entries still queued after `timeout` seconds are spilled
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            thread = self._thread
+        if thread is None:
+            return
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            pass
+        thread.join(timeout)
+        if thread.is_alive():
+            leftover = []
+            while True:
+                try:
+                    entry = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if entry is not _STOP:
+                    leftover.append(entry)
+            if leftover:
+                self._spill(leftover)
+
+    def stats(self):
+        return {
+            'queued': self._queue.qsize(),
+            'capacity': self._queue.maxsize,
+            'recorded': self.recorded,
+            'written': self.written,
+            'batches': self.batches,
+            'spilled': self.spilled,
+            'replayed': self.replayed,
+            'dropped': self.dropped,
+            'failures': self.failures,
+            'last_error': self.last_error,
+            'last_batch_seconds': self.last_batch_seconds,
+            'writer_running': self._thread is not None and self._thread.is_alive(),
+        }
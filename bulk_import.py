@@ -0,0 +1,434 @@
+"""
+Hospital Management System - Bulk CSV Import
+Author: HMS Development Team
+Description: Streams patients, doctors or appointments from CSV files into the
+database. Rows are validated against the create_database.sql schema, inserted
+with batched executemany() inside chunked transactions, and rejected rows are
+written to an error report. A checkpoint file lets an interrupted import resume.
+"""
+
+import csv
+import json
+import os
+import time
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+from mysql.connector import Error
+
+import rollups
+from dal import touch_tables
+from scheduling import SchedulingEngine
+
+
+class CSVImportError(ValueError):
+    """Raised when a file cannot be imported at all (bad header, mismatched checkpoint)"""
+
+
+# Column parsers - each returns the database value or raises ValueError
+
+def _text(max_length=None):
+    def parse(value):
+        if max_length is not None and len(value) > max_length:
+            raise ValueError(f'longer than {max_length} characters')
+        return value
+    return parse
+
+
+def _email(max_length):
+    check_length = _text(max_length)
+
+    def parse(value):
+        if '@' not in value or value.startswith('@') or value.endswith('@'):
+            raise ValueError('not a valid email address')
+        return check_length(value)
+    return parse
+
+
+def _integer(minimum=None, maximum=None):
+    def parse(value):
+        try:
+            number = int(value)
+        except ValueError:
+            raise ValueError('not a whole number') from None
+        if (minimum is not None and number < minimum) or (maximum is not None and number > maximum):
+            raise ValueError(f'must be between {minimum} and {maximum}')
+        return number
+    return parse
+
+
+def _decimal(digits, places):
+    limit = Decimal(10) ** (digits - places)
+
+    def parse(value):
+        try:
+            number = Decimal(value.lstrip('$'))
+        except InvalidOperation:
+            raise ValueError('not a number') from None
+        if not number.is_finite() or number < 0 or number >= limit:
+            raise ValueError(f'must be between 0 and {limit - Decimal(1).scaleb(-places)}')
+        return number.quantize(Decimal(1).scaleb(-places))
+    return parse
+
+
+def _enum(*choices):
+    lookup = {choice.lower(): choice for choice in choices}
+
+    def parse(value):
+        try:
+            return lookup[value.lower()]
+        except KeyError:
+            raise ValueError(f"must be one of {', '.join(choices)}") from None
+    return parse
+
+
+def _datetime(value):
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError('not a date/time (YYYY-MM-DD HH:MM)') from None
+
+
+class Column:
+    """
+    One importable column: CSV header name, parser, and NOT NULL/default rules
+    """
+
+    __slots__ = ('name', 'parse', 'required', 'default')
+
+    def __init__(self, name, parse, required=False, default=None):
+        self.name = name
+        self.parse = parse
+        self.required = required
+        self.default = default
+
+
+# Importable tables, mirroring scripts/create_database.sql
+TABLES = {
+    'patients': (
+        Column('name', _text(100), required=True),
+        Column('age', _integer(0, 150), required=True),
+        Column('gender', _enum('Male', 'Female', 'Other'), required=True),
+        Column('phone', _text(20), required=True),
+        Column('email', _email(100)),
+        Column('address', _text(65535)),
+        Column('medical_history', _text(65535)),
+    ),
+    'doctors': (
+        Column('name', _text(100), required=True),
+        Column('specialization', _text(100), required=True),
+        Column('phone', _text(20), required=True),
+        Column('email', _email(100)),
+        Column('experience', _integer(0, 100), default=0),
+        Column('fee', _decimal(10, 2), default=Decimal('0.00')),
+    ),
+    'appointments': (
+        Column('patient_id', _integer(1), required=True),
+        Column('doctor_id', _integer(1), required=True),
+        Column('appointment_date', _datetime, required=True),
+        Column('fee', _decimal(10, 2), default=Decimal('0.00')),
+        Column('status', _enum('Scheduled', 'Completed', 'Cancelled'), default='Scheduled'),
+        Column('notes', _text(65535)),
+    ),
+}
+
+
+def insert_sql(table):
+    columns = TABLES[table]
+    return (f"INSERT INTO {table} ({', '.join(column.name for column in columns)}) "
+            f"VALUES ({', '.join(['%s'] * len(columns))})")
+
+
+def validate_row(columns, row):
+    """
+    Convert one CSV row to insert values
+    Args: columns (tuple): Column specs, row (dict): Row from csv.DictReader
+    Returns: tuple (values, errors) where errors is a list of (column, message)
+    """
+    values, errors = [], []
+    for column in columns:
+        raw = (row.get(column.name) or '').strip()
+        if not raw:
+            if column.required:
+                errors.append((column.name, 'is required'))
+            values.append(column.default)
+            continue
+        try:
+            values.append(column.parse(raw))
+        except ValueError as e:
+            errors.append((column.name, str(e)))
+            values.append(None)
+    return tuple(values), errors
+
+
+class Checkpoint:
+    """
+    JSON file recording how many data rows of a source file are committed
+    """
+
+    def __init__(self, path, table, source):
+        self.path = path
+        self.table = table
+        self.source = source
+        self.rows_done = 0
+        self.inserted = 0
+        self.failed = 0
+
+    def load(self):
+        """
+        Read an existing checkpoint. Returns True if there was one to resume from.
+        Raises: CSVImportError if it belongs to a different table or source file
+        """
+        if not self.path or not os.path.exists(self.path):
+            return False
+        with open(self.path, encoding='utf-8') as handle:
+            state = json.load(handle)
+        if state.get('table') != self.table or state.get('source') != self.source:
+            raise CSVImportError(f'Checkpoint {self.path} belongs to a different import '
+                                 f"({state.get('table')} from {state.get('source')})")
+        self.rows_done = state['rows_done']
+        self.inserted = state['inserted']
+        self.failed = state['failed']
+        return True
+
+    def save(self):
+        if not self.path:
+            return
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as handle:
+            json.dump({'table': self.table, 'source': self.source, 'rows_done': self.rows_done,
+                       'inserted': self.inserted, 'failed': self.failed}, handle)
+        os.replace(temp_path, self.path)  # Atomic, so a crash never leaves half a checkpoint
+
+    def remove(self):
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class ImportResult:
+    """
+    Outcome of an import run
+    """
+
+    def __init__(self, table):
+        self.table = table
+        self.rows = 0           # Data rows read in this run
+        self.skipped = 0        # Rows skipped because the checkpoint says they are done
+        self.inserted = 0
+        self.failed = 0
+        self.errors = []        # First few (line, column, message) for display
+        self.seconds = 0.0
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+
+class BulkImporter:
+    """
+    Streams CSV rows into one table.
+
+    Valid rows are buffered until `chunk_size` rows have been read, then
+    inserted with executemany() in batches of `batch_size` inside a single
+    transaction. If the database rejects a chunk (foreign key, duplicate...),
+    it is rolled back and replayed row by row so only the offending rows fail.
+    """
+
+    def __init__(self, connection, table, chunk_size=10000, batch_size=1000, error_stream=None,
+                 max_errors_kept=100, visit_minutes=None):
+        """
+        Args:
+            connection: Open MySQL connection (its autocommit setting is left alone)
+            table (str): One of TABLES
+            chunk_size (int): Rows per transaction (and per checkpoint)
+            batch_size (int): Rows per executemany() call
+            error_stream: Text file receiving the rejected rows as CSV, or None
+            max_errors_kept (int): Errors kept on the result for display
+            visit_minutes (int): For appointments, reject scheduled visits that
+                overlap another one for the same doctor (None disables the check)
+        """
+        if table not in TABLES:
+            raise CSVImportError(f"Unknown table '{table}', expected one of {', '.join(TABLES)}")
+        self.connection = connection
+        self.table = table
+        self.columns = TABLES[table]
+        self.sql = insert_sql(table)
+        self.chunk_size = chunk_size
+        self.batch_size = batch_size
+        self.error_stream = error_stream
+        self.max_errors_kept = max_errors_kept
+        self._error_writer = None
+        self._rejects = []          # Error CSV rows of the chunk being imported, written once it commits
+        self._scheduler = None
+        self._pending_key = 0
+        self._checkpoint_base = (0, 0)
+        if table == 'appointments' and visit_minutes:
+            self._scheduler = SchedulingEngine(self._load_schedule, visit_minutes=visit_minutes,
+                                               refresh_interval=float('inf'))
+
+    @staticmethod
+    def _load_schedule(cursor, doctor_id):
+        cursor.execute("SELECT id, appointment_date FROM appointments WHERE doctor_id = %s AND status = 'Scheduled'",
+                       (doctor_id,))
+        return cursor.fetchall()
+
+    def _report(self, result, fieldnames, line, row, errors):
+        result.failed += 1
+        for column, message in errors:
+            if len(result.errors) < self.max_errors_kept:
+                result.errors.append((line, column, message))
+        if self.error_stream is None:
+            return
+        message = '; '.join(f'{column}: {text}' for column, text in errors)
+        self._rejects.append([line, message] + [row.get(name, '') for name in fieldnames])
+
+    def _write_rejects(self, fieldnames):
+        """
+        Write the rejected rows of a committed chunk to the error CSV. Held back until the commit
+        so a chunk that fails and is resumed from the checkpoint does not report its rows twice.
+        """
+        if self.error_stream is None or not self._rejects:
+            return
+        if self._error_writer is None:
+            self._error_writer = csv.writer(self.error_stream)
+            if self.error_stream.tell() == 0:
+                self._error_writer.writerow(['line', 'error'] + list(fieldnames))
+        self._error_writer.writerows(self._rejects)
+        self._rejects = []
+        self.error_stream.flush()
+
+    def _check_schedule(self, cursor, values):
+        """
+        Reject a scheduled appointment overlapping one already booked or earlier in the file
+        Returns: (key, errors) - key identifies the tentative booking for rollback
+        """
+        if self._scheduler is None:
+            return None, []
+        _, doctor_id, start, _, status, _ = values
+        if status != 'Scheduled':
+            return None, []
+        if self._scheduler.conflicts(cursor, doctor_id, start):
+            return None, [('appointment_date', 'doctor already has an appointment at this time')]
+        self._pending_key -= 1   # Negative ids never clash with real appointment ids
+        self._scheduler.add(doctor_id, self._pending_key, start)
+        return self._pending_key, []
+
+    def _record(self, cursor, inserted):
+        # Keep the appointment roll-up and patient counters in step, inside the chunk's transaction
+        if self.table == 'appointments':
+            rollups.apply(cursor, added=[(start, doctor_id, status, fee, patient_id)
+                                         for patient_id, doctor_id, start, fee, status, _ in inserted])
+
+    def _flush(self, cursor, pending, result, fieldnames):
+        """
+        Insert buffered rows in one transaction
+        """
+        if not pending:
+            return
+        self.connection.start_transaction()
+        try:
+            for start in range(0, len(pending), self.batch_size):
+                cursor.executemany(self.sql, [values for _, _, values, _ in pending[start:start + self.batch_size]])
+            self._record(cursor, [values for _, _, values, _ in pending])
+            touch_tables(cursor, self.table)
+            self.connection.commit()
+            result.inserted += len(pending)
+            return
+        except Error:
+            self.connection.rollback()
+
+        # Replay row by row; a failed statement only undoes itself in InnoDB
+        self.connection.start_transaction()
+        try:
+            inserted = []
+            for line, row, values, key in pending:
+                try:
+                    cursor.execute(self.sql, values)
+                    inserted.append(values)
+                except Error as e:
+                    if key is not None:
+                        self._scheduler.discard(key)
+                    self._report(result, fieldnames, line, row, [('row', e.msg)])
+            self._record(cursor, inserted)
+            touch_tables(cursor, self.table)
+            self.connection.commit()
+            result.inserted += len(inserted)
+        except Exception:
+            self.connection.rollback()
+            raise
+
+    def run(self, text_stream, checkpoint=None, progress=None):
+        """
+        Import every row of a CSV text stream
+        Args:
+            text_stream: File-like object opened in text mode with newline=''
+            checkpoint (Checkpoint): Progress file to resume from and update, or None
+            progress (callable): progress(result) called after every committed chunk
+        Returns: ImportResult
+        Raises: CSVImportError if the header does not match the table
+        """
+        result = ImportResult(self.table)
+        reader = csv.DictReader(text_stream)
+        fieldnames = reader.fieldnames or []
+        expected = [column.name for column in self.columns]
+        missing = [column.name for column in self.columns if column.required and column.name not in fieldnames]
+        unknown = [name for name in fieldnames if name not in expected]
+        if missing or unknown:
+            raise CSVImportError(f"CSV header does not match the {self.table} table "
+                                 f"(missing: {', '.join(missing) or 'none'}; unknown: {', '.join(unknown) or 'none'}). "
+                                 f"Expected columns: {', '.join(expected)}")
+
+        skip = checkpoint.rows_done if checkpoint else 0
+        self._checkpoint_base = (checkpoint.inserted, checkpoint.failed) if checkpoint else (0, 0)
+        started = time.perf_counter()
+        cursor = self.connection.cursor()
+        pending = []
+        record = 0
+        try:
+            next_line = reader.line_num + 1
+            for row in reader:
+                # Quoted fields can span lines, so remember where each row starts
+                line, next_line = next_line, reader.line_num + 1
+                record += 1
+                if record <= skip:
+                    result.skipped += 1
+                    continue
+                result.rows += 1
+                values, errors = validate_row(self.columns, row)
+                key = None
+                if not errors:
+                    key, errors = self._check_schedule(cursor, values)
+                if errors:
+                    self._report(result, fieldnames, line, row, errors)
+                else:
+                    pending.append((line, row, values, key))
+
+                if (record - skip) % self.chunk_size == 0:
+                    self._commit_chunk(cursor, pending, result, fieldnames, checkpoint, record, progress, started)
+                    pending = []
+
+            self._commit_chunk(cursor, pending, result, fieldnames, checkpoint, record, progress, started)
+        except Exception:
+            self._rejects = []  # The unfinished chunk is imported again on resume
+            if self._scheduler is not None:
+                self._scheduler.forget()  # Drop tentative bookings from the unfinished chunk
+            raise
+        finally:
+            cursor.close()
+
+        result.seconds = time.perf_counter() - started
+        return result
+
+    def _commit_chunk(self, cursor, pending, result, fieldnames, checkpoint, record, progress, started):
+        self._flush(cursor, pending, result, fieldnames)
+        self._write_rejects(fieldnames)
+        if checkpoint is not None:
+            # Totals across runs: what earlier runs recorded plus this run so far
+            base_inserted, base_failed = self._checkpoint_base
+            checkpoint.rows_done = record
+            checkpoint.inserted = base_inserted + result.inserted
+            checkpoint.failed = base_failed + result.failed
+            checkpoint.save()
+        result.seconds = time.perf_counter() - started
+        if progress:
+            progress(result)
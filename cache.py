@@ -0,0 +1,212 @@
+"""
+Hospital Management System - In-Process Caches
+Author: HMS Development Team
+Description: Small thread-safe caches for read-mostly data
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    Key/value cache whose entries expire `ttl` seconds after being stored.
+    Holds at most `max_entries` items; the oldest entry is dropped when full.
+    """
+
+    def __init__(self, ttl, max_entries=256):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def get(self, key, default=None):
+        """
+        Return the cached value for key, or default if missing or expired
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return default
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            if key not in self._entries and len(self._entries) >= self.max_entries:
+                # Dicts keep insertion order, so the first key is the oldest
+                del self._entries[next(iter(self._entries))]
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+
+    def get_or_load(self, key, loader):
+        """
+        Return the cached value for key, calling loader() to fill it on a miss
+        """
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = loader()
+            self.set(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class QueryCache:
+    """
+    LRU cache of query results tagged with the tables they read.
+
+    Every table has a version number. Write paths call bump() for the tables
+    they modify; an entry remembers the versions it was loaded under and is
+    discarded as soon as any of them changes, so stale results are never
+    served after a write in this process. `ttl` bounds how long an entry can
+    live, which covers writes made by other processes.
+    """
+
+    def __init__(self, max_entries=1024, max_rows=5000, ttl=300):
+        """
+        Args:
+            max_entries (int): Entries kept before the least recently used is evicted
+            max_rows (int): Results with more rows than this are not cached
+            ttl (float): Maximum age of an entry in seconds
+        """
+        self.max_entries = max_entries
+        self.max_rows = max_rows
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._versions = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _snapshot(self, tables):
+        return tuple(self._versions.get(table, 0) for table in tables)
+
+    def bump(self, *tables):
+        """
+        Mark tables as modified so cached results that read them go stale
+        """
+        with self._lock:
+            for table in tables:
+                self._versions[table] = self._versions.get(table, 0) + 1
+
+    def version(self, table):
+        with self._lock:
+            return self._versions.get(table, 0)
+
+    def _lookup(self, key, tables):
+        """
+        Returns: (hit, value, snapshot) - snapshot is the table versions to store a loaded value under
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            snapshot = self._snapshot(tables)
+            if entry is not None:
+                entry_tables, entry_snapshot, expires, value = entry
+                if entry_tables == tables and entry_snapshot == snapshot and expires > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return True, value, snapshot
+                del self._entries[key]
+                self.invalidations += 1
+            self.misses += 1
+        return False, None, snapshot
+
+    def _store(self, key, tables, snapshot, value):
+        if isinstance(value, list) and len(value) > self.max_rows:
+            return
+        with self._lock:
+            self._entries[key] = (tables, snapshot, time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_load(self, key, tables, loader):
+        """
+        Return the cached result for key, or call loader() and cache its result
+        Args:
+            key (hashable): Cache key (usually the SQL text and parameters)
+            tables (tuple): Tables the result depends on
+            loader (callable): Produces the result on a miss
+        Returns: The cached or freshly loaded result (treat as read-only)
+        """
+        tables = tuple(tables)
+        hit, value, snapshot = self._lookup(key, tables)
+        if hit:
+            return value
+        # Load outside the lock; the snapshot taken before loading makes the
+        # entry stale at once if a write lands while the query runs
+        value = loader()
+        self._store(key, tables, snapshot, value)
+        return value
+
+    async def get_or_load_async(self, key, tables, loader):
+        """
+        get_or_load for coroutine loaders (async serving mode)
+        Args: loader (callable): Returns an awaitable producing the result on a miss
+        """
+        tables = tuple(tables)
+        hit, value, snapshot = self._lookup(key, tables)
+        if hit:
+            return value
+        value = await loader()
+        self._store(key, tables, snapshot, value)
+        return value
+
+    def query(self, cursor, sql, params=(), tables=(), one=False):
+        """
+        Run a SELECT through the cache. Rows are cached as the cursor returns
+        them, so always run a given query with the same cursor type.
+        Args:
+            cursor: Open database cursor (used only on a miss)
+            sql (str): Query text, params (tuple): Query parameters
+            tables (tuple): Tables the query reads
+            one (bool): Return a single row instead of a list
+        Returns: list of rows, or one row/None when one=True
+        """
+        def load():
+            cursor.execute(sql, params)
+            return cursor.fetchone() if one else cursor.fetchall()
+        return self.get_or_load((sql, tuple(params), one), tables, load)
+
+    async def query_async(self, cursor, sql, params=(), tables=(), one=False):
+        """
+        query() for cursors whose execute/fetch methods are coroutines; shares
+        its entries with query(), so use the same row type on both
+        """
+        async def load():
+            await cursor.execute(sql, params)
+            return await cursor.fetchone() if one else await cursor.fetchall()
+        return await self.get_or_load_async((sql, tuple(params), one), tables, load)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'table_versions': dict(self._versions),
+            }
@@ -0,0 +1,179 @@
+"""
+Hospital Management System - Data Access
+Author: HMS Development Team
+Description: Statements for patients, doctors, appointments and staff, and a
+cursor that runs them as server-side prepared statements cached per
+connection. Rows come back as named tuples instead of dicts: the column names
+are stored once per result shape rather than once per row.
+"""
+
+from collections import OrderedDict, namedtuple
+
+from mysql.connector import Error, errorcode
+
+# Patients
+PATIENT_LIST = "SELECT * FROM patients"
+PATIENT_BY_ID = "SELECT * FROM patients WHERE id = %s"
+
+# Doctors
+DOCTOR_LIST = "SELECT * FROM doctors"
+DOCTOR_BY_ID = "SELECT * FROM doctors WHERE id = %s"
+DOCTOR_SPECIALIZATIONS = "SELECT DISTINCT specialization FROM doctors ORDER BY specialization"
+
+# Appointments - APPOINTMENT_LIST_FROM takes the table expression from archive.source()
+APPOINTMENT_LIST_FROM = """SELECT a.*, p.name as patient_name, d.name as doctor_name, d.specialization as doctor_specialization
+                           FROM {} a
+                           JOIN patients p ON a.patient_id = p.id
+                           JOIN doctors d ON a.doctor_id = d.id"""
+APPOINTMENT_LIST = APPOINTMENT_LIST_FROM.format('appointments')
+APPOINTMENT_BY_ID = """SELECT a.*, p.name as patient_name, d.name as doctor_name
+                       FROM appointments a
+                       JOIN patients p ON a.patient_id = p.id
+                       JOIN doctors d ON a.doctor_id = d.id
+                       WHERE a.id = %s"""
+
+# Staff
+STAFF_LOGIN = "SELECT * FROM staff WHERE username = %s AND password = %s AND role = 'Admin'"
+
+# Table versions (migration 002) read by the caches and HTTP validators. Writers bump them
+# once per transaction as its last statement, so the shared row is only locked while committing.
+TOUCH_TABLES = "UPDATE table_versions SET version = version + 1 WHERE table_name IN ({})"
+
+_ROW_TYPES = {}
+
+
+def touch_tables(cursor, *tables):
+    """
+    Bump the versions of the tables the open transaction changed - call it right before commit()
+    Deleting patients or doctors changes appointments too (cascading foreign keys)
+    """
+    tables = sorted(set(tables))  # Concurrent writers lock the version rows in the same order
+    try:
+        cursor.execute(TOUCH_TABLES.format(', '.join(['%s'] * len(tables))), tuple(tables))
+    except Error as e:
+        if e.errno != errorcode.ER_NO_SUCH_TABLE:  # Migration 002 not run: there is nothing to bump
+            raise
+
+
+def row_type(columns):
+    """
+    Named tuple class for a result shape, shared by every query returning those columns
+    Args: columns (sequence): Column names in result order
+    """
+    columns = tuple(columns)
+    cls = _ROW_TYPES.get(columns)
+    if cls is None:
+        # rename=True turns names that are not identifiers (e.g. COUNT(*)) into _0, _1, ...
+        cls = _ROW_TYPES[columns] = namedtuple('Row', columns, rename=True)
+    return cls
+
+
+class StatementCache:
+    """
+    Prepared cursors of one connection, keyed by SQL text.
+    The least recently used statement is closed (freeing it on the server)
+    once more than `max_statements` are open.
+    """
+
+    def __init__(self, connection, max_statements=64):
+        self.connection = connection
+        self.max_statements = max_statements
+        self.prepares = 0
+        self.hits = 0
+        self._cursors = OrderedDict()
+
+    def get(self, sql):
+        """
+        Returns: (prepared cursor, sql) - execute with this exact sql object;
+        the connector only reuses a prepared statement for the same string object
+        """
+        entry = self._cursors.get(sql)
+        if entry is not None:
+            self._cursors.move_to_end(sql)
+            self.hits += 1
+            return entry
+        entry = self._cursors[sql] = (self.connection.cursor(prepared=True), sql)
+        self.prepares += 1
+        if len(self._cursors) > self.max_statements:
+            _, (cursor, _) = self._cursors.popitem(last=False)
+            try:
+                cursor.close()
+            except Exception:
+                pass
+        return entry
+
+
+def statement_cache(connection, max_statements=64):
+    """
+    The statement cache of a connection. Pooled connections keep theirs across
+    borrows; a plain connection gets a new one each call.
+    """
+    try:
+        cache = connection.connection_cache
+    except AttributeError:
+        return StatementCache(connection, max_statements)
+    statements = cache.get('statements')
+    if statements is None:
+        statements = cache['statements'] = StatementCache(connection, max_statements)
+    statements.connection = connection  # The wrapper of the current borrow opens new cursors
+    return statements
+
+
+class PreparedCursor:
+    """
+    Drop-in for connection.cursor() on read paths: each SQL text is prepared
+    once per connection and then only executed, and result rows are named
+    tuples (row.name, row[0]). Results are read in full by execute(), so the
+    connection is free for the next statement straight away.
+    """
+
+    def __init__(self, connection, max_statements=64):
+        self._statements = statement_cache(connection, max_statements)
+        self._rows = []
+        self._position = 0
+        self.rowcount = -1
+        self.lastrowid = None
+        self.column_names = ()
+
+    def execute(self, sql, params=()):
+        cursor, sql = self._statements.get(sql)
+        cursor.execute(sql, tuple(params or ()))  # Prepared cursors only take a tuple or list
+        if cursor.with_rows:
+            self.column_names = tuple(cursor.column_names)
+            make = row_type(self.column_names)._make
+            self._rows = [make(row) for row in cursor.fetchall()]
+        else:
+            self.column_names = ()
+            self._rows = []
+        self._position = 0
+        self.rowcount = cursor.rowcount
+        self.lastrowid = cursor.lastrowid
+
+    def fetchone(self):
+        if self._position >= len(self._rows):
+            return None
+        row = self._rows[self._position]
+        self._position += 1
+        return row
+
+    def fetchmany(self, size=1):
+        rows = self._rows[self._position:self._position + size]
+        self._position += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self._rows[self._position:] if self._position else self._rows
+        self._position = len(self._rows)
+        return rows
+
+    def __iter__(self):
+        while True:
+            row = self.fetchone()
+            if row is None:
+                return
+            yield row
+
+    def close(self):
+        # The prepared cursors stay open in the connection's cache
+        self._rows = []
+        self._position = 0
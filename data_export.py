@@ -0,0 +1,97 @@
+"""
+Hospital Management System - Data Export
+Author: HMS Development Team
+Description: Encodes row streams as CSV or NDJSON in bounded chunks, so an
+export of any size is sent with flat memory use.
+"""
+
+import csv
+import io
+import json
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+def _isoformat(value):
+    return value.isoformat()
+
+
+def _decode(value):
+    return value.decode('utf-8', 'replace')
+
+
+# Converters for values that are not already text/JSON friendly, by exact type
+# (a dict lookup per value is much cheaper than an isinstance chain)
+_CONVERTERS = {
+    datetime: _isoformat,
+    date: _isoformat,
+    time: _isoformat,
+    Decimal: str,
+    timedelta: str,
+    bytes: _decode,
+    bytearray: _decode,
+}
+
+
+def _plain(value):
+    """
+    Convert database values to text or JSON friendly ones
+    """
+    convert = _CONVERTERS.get(type(value))
+    return value if convert is None else convert(value)
+
+
+def csv_chunks(rows, columns, chunk_size=65536):
+    """
+    Yield CSV text for dict rows, header first, about chunk_size characters at a time
+    Args: rows (iterable): Dict rows, columns (list): Keys to export in order, chunk_size (int)
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    converters = _CONVERTERS
+    for row in rows:
+        values = [row[column] for column in columns]
+        for index, value in enumerate(values):
+            convert = converters.get(type(value))
+            if convert is not None:
+                values[index] = convert(value)
+        writer.writerow(values)  # csv writes None as an empty field
+        if buffer.tell() >= chunk_size:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def ndjson_chunks(rows, columns, chunk_size=65536):
+    """
+    Yield newline-delimited JSON (one object per row), about chunk_size characters at a time
+    Args: rows (iterable): Dict rows, columns (list): Keys to export in order, chunk_size (int)
+    """
+    encode = json.JSONEncoder(default=_plain, ensure_ascii=False, separators=(',', ':')).encode
+    lines, size = [], 0
+    for row in rows:
+        line = encode({column: row[column] for column in columns})
+        lines.append(line)
+        size += len(line) + 1
+        if size >= chunk_size:
+            lines.append('')
+            yield '\n'.join(lines)
+            lines, size = [], 0
+    if lines:
+        lines.append('')
+        yield '\n'.join(lines)
+
+
+def export_chunks(fmt, rows, columns, chunk_size=65536):
+    """
+    Encode rows in the given format ('csv' or 'ndjson')
+    """
+    encoder = csv_chunks if fmt == 'csv' else ndjson_chunks
+    return encoder(rows, columns, chunk_size)
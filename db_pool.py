@@ -0,0 +1,502 @@
+"""
+Hospital Management System - Database Connection Pool
+Author: HMS Development Team
+Description: Thread-safe MySQL connection pool with borrow timeouts, health checks,
+connection recycling and usage metrics, and a router spreading read-only work
+over read replicas
+"""
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import mysql.connector
+from mysql.connector import errorcode
+
+
+class PoolTimeoutError(Exception):
+    """
+    Raised when no connection becomes available within the borrow timeout
+    """
+
+
+class _PoolSlot:
+    """
+    A physical MySQL connection owned by the pool
+    """
+
+    __slots__ = ('raw', 'created_at', 'last_used', 'cache')
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.cache = {}   # State tied to this physical connection, e.g. prepared statements
+
+
+class PooledConnection:
+    """
+    Connection handed out by ConnectionPool for a single borrow.
+    Behaves like a normal mysql.connector connection, except that close()
+    returns the underlying connection to the pool instead of closing the socket.
+    Once closed the wrapper is detached and cannot be used again.
+    """
+
+    def __init__(self, pool, slot):
+        self._pool = pool
+        self._slot = slot
+
+    def __getattr__(self, name):
+        slot = self.__dict__.get('_slot')
+        if slot is None:
+            raise mysql.connector.errors.OperationalError('Pooled connection already returned to the pool')
+        return getattr(slot.raw, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """
+        Return the connection to the pool (safe to call more than once)
+        """
+        slot, self._slot = self._slot, None
+        if slot is not None:
+            self._pool._release(slot)
+
+    @property
+    def connection_cache(self):
+        """
+        Dict kept with the physical connection across borrows (dropped when it is closed)
+        """
+        slot = self._slot
+        if slot is None:
+            raise mysql.connector.errors.OperationalError('Pooled connection already returned to the pool')
+        return slot.cache
+
+    @property
+    def pool(self):
+        """
+        The ConnectionPool this connection belongs to (its db_config names the server)
+        """
+        return self._pool
+
+    def is_connected(self):
+        return self._slot is not None and self._slot.raw.is_connected()
+
+    def cursor(self, *args, **kwargs):
+        cursor = self.__getattr__('cursor')(*args, **kwargs)
+        wrapper = self._pool.cursor_wrapper
+        return cursor if wrapper is None else wrapper(cursor)
+
+
+class ConnectionPool:
+    """
+    Fixed-size MySQL connection pool.
+
+    Connections are opened lazily up to `size`. A borrower waits at most
+    `borrow_timeout` seconds for a free connection. Connections idle for longer
+    than `health_check_after` seconds are pinged before being handed out, and
+    connections older than `max_age` seconds are closed and replaced.
+    """
+
+    # Window (seconds) used to compute the connects-per-second rate
+    RATE_WINDOW = 60.0
+
+    def __init__(self, db_config, size=10, borrow_timeout=5.0, max_age=1800.0, health_check_after=5.0):
+        if size < 1:
+            raise ValueError('Pool size must be at least 1')
+        self.db_config = dict(db_config)
+        self.size = size
+        self.borrow_timeout = borrow_timeout
+        self.max_age = max_age
+        self.health_check_after = health_check_after
+        self.cursor_wrapper = None   # Optional callable wrapping every cursor (e.g. for query timing)
+
+        self._lock = threading.Lock()
+        self._available = threading.Condition(self._lock)
+        self._idle = []          # LIFO stack so the warmest connection is reused first
+        self._open = 0           # physical connections open or being opened
+        self._in_use = 0
+        self._waiting = 0
+
+        # Telemetry
+        self._borrows = 0
+        self._timeouts = 0
+        self._connects = 0
+        self._connect_failures = 0
+        self._recycled = 0
+        self._health_check_failures = 0
+        self._borrow_time_total = 0.0
+        self._borrow_time_max = 0.0
+        self._connect_times = deque()
+
+    def get_connection(self, timeout=None):
+        """
+        Borrow a connection from the pool
+        Args: timeout (float): Seconds to wait, defaults to the pool borrow_timeout
+        Returns: PooledConnection
+        Raises: PoolTimeoutError if the pool stays exhausted, mysql.connector.Error on connect failure
+        """
+        timeout = self.borrow_timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+
+        slot = None
+        with self._lock:
+            while not self._idle and self._open >= self.size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolTimeoutError(f'No database connection available after {timeout:.1f}s')
+                self._waiting += 1
+                try:
+                    self._available.wait(remaining)
+                finally:
+                    self._waiting -= 1
+
+            if self._idle:
+                slot = self._idle.pop()
+            else:
+                # Reserve a slot and open the connection outside the lock
+                self._open += 1
+            self._in_use += 1
+
+        try:
+            if slot is None:
+                slot = self._connect()
+            elif not self._is_usable(slot):
+                self._discard(slot)
+                slot = self._connect()
+        except Exception:
+            with self._lock:
+                self._open -= 1
+                self._in_use -= 1
+                self._available.notify()
+            raise
+
+        waited = time.monotonic() - started
+        with self._lock:
+            self._borrows += 1
+            self._borrow_time_total += waited
+            if waited > self._borrow_time_max:
+                self._borrow_time_max = waited
+        return PooledConnection(self, slot)
+
+    @contextmanager
+    def connection(self, timeout=None):
+        """
+        Context manager that borrows a connection and always returns it
+        Usage: with pool.connection() as connection: ...
+        """
+        connection = self.get_connection(timeout)
+        try:
+            yield connection
+        finally:
+            connection.close()
+
+    def _connect(self):
+        raw = None
+        try:
+            raw = mysql.connector.connect(**self.db_config)
+        except Exception:
+            with self._lock:
+                self._connect_failures += 1
+            raise
+        now = time.monotonic()
+        with self._lock:
+            self._connects += 1
+            self._connect_times.append(now)
+            self._trim_connect_times(now)
+        return _PoolSlot(raw)
+
+    def _is_usable(self, slot):
+        now = time.monotonic()
+        if self.max_age and now - slot.created_at > self.max_age:
+            with self._lock:
+                self._recycled += 1
+            return False
+        if now - slot.last_used >= self.health_check_after:
+            try:
+                slot.raw.ping(reconnect=False)
+            except Exception:
+                with self._lock:
+                    self._health_check_failures += 1
+                return False
+        return True
+
+    def _discard(self, slot):
+        try:
+            slot.raw.close()
+        except Exception:
+            pass
+
+    def _release(self, slot):
+        # A large unread result set (abandoned stream) is cheaper to drop than to drain
+        keep = not slot.raw.unread_result
+        if keep:
+            try:
+                # Leave no half-finished work behind for the next borrower
+                if slot.raw.in_transaction:
+                    slot.raw.rollback()
+                slot.raw.consume_results()
+            except Exception:
+                keep = False
+
+        slot.last_used = time.monotonic()
+        if keep and self.max_age and slot.last_used - slot.created_at > self.max_age:
+            keep = False
+            with self._lock:
+                self._recycled += 1
+
+        if not keep:
+            self._discard(slot)
+
+        with self._lock:
+            self._in_use -= 1
+            if keep:
+                self._idle.append(slot)
+            else:
+                self._open -= 1
+            self._available.notify()
+
+    @property
+    def in_use(self):
+        with self._lock:
+            return self._in_use
+
+    def _trim_connect_times(self, now):
+        cutoff = now - self.RATE_WINDOW
+        while self._connect_times and self._connect_times[0] < cutoff:
+            self._connect_times.popleft()
+
+    def close_all(self):
+        """
+        Close every idle connection (borrowed connections close when returned)
+        """
+        with self._lock:
+            idle, self._idle = self._idle, []
+            self._open -= len(idle)
+        for slot in idle:
+            self._discard(slot)
+
+    def stats(self):
+        """
+        Snapshot of pool usage for monitoring and sizing
+        Returns: dict of pool metrics
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._trim_connect_times(now)
+            borrows = self._borrows
+            return {
+                'size': self.size,
+                'open': self._open,
+                'idle': len(self._idle),
+                'in_use': self._in_use,
+                'waiting': self._waiting,
+                'borrows': borrows,
+                'timeouts': self._timeouts,
+                'connects': self._connects,
+                'connect_failures': self._connect_failures,
+                'connects_per_second': len(self._connect_times) / self.RATE_WINDOW,
+                'recycled': self._recycled,
+                'health_check_failures': self._health_check_failures,
+                'borrow_latency_avg_ms': (self._borrow_time_total / borrows * 1000) if borrows else 0.0,
+                'borrow_latency_max_ms': self._borrow_time_max * 1000,
+            }
+
+
+class ReplicationStopped(Exception):
+    """
+    Raised by replication_lag when the replica's SQL or IO thread is not running
+    """
+
+
+def replication_lag(connection):
+    """
+    Seconds the server behind connection is behind its source
+    Returns: int, or None if the server is not a replica or the lag cannot be read
+             (the account lacks the REPLICATION CLIENT privilege)
+    Raises: ReplicationStopped if replication is configured but not running
+    """
+    cursor = connection.cursor(dictionary=True)
+    try:
+        try:
+            cursor.execute("SHOW REPLICA STATUS")       # MySQL 8.0.22+
+        except mysql.connector.Error as e:
+            if e.errno == errorcode.ER_SPECIFIC_ACCESS_DENIED_ERROR:
+                return None
+            if e.errno != errorcode.ER_PARSE_ERROR:
+                raise
+            cursor.execute("SHOW SLAVE STATUS")
+        rows = cursor.fetchall()
+    finally:
+        cursor.close()
+    if not rows:
+        return None
+    lags = [row.get('Seconds_Behind_Source', row.get('Seconds_Behind_Master')) for row in rows]
+    if any(lag is None for lag in lags):
+        raise ReplicationStopped('Replication is not running')
+    return max(int(lag) for lag in lags)
+
+
+class _Replica:
+    """
+    One read replica: its pool and the outcome of the last health check
+    """
+
+    __slots__ = ('name', 'pool', 'healthy', 'lag', 'error', 'checked_at', 'checking', 'borrows')
+
+    def __init__(self, name, pool):
+        self.name = name
+        self.pool = pool
+        self.healthy = True
+        self.lag = None
+        self.error = None
+        self.checked_at = float('-inf')
+        self.checking = False
+        self.borrows = 0
+
+
+class ReplicaRouter:
+    """
+    Hands out connections for read-only work from a set of replica pools.
+
+    Each borrow goes to the usable replica with the fewest connections in
+    use. A replica is checked at most every `check_interval` seconds, by the
+    borrower that finds its check due: it is skipped until the next check if
+    it cannot be reached, replication has stopped, or it is more than
+    `max_lag` seconds behind. A replica whose pool is exhausted is waited on
+    for at most `replica_timeout` seconds before the next one is tried. With
+    no usable replica (or none configured, or all busy) reads go to the
+    primary pool.
+    """
+
+    def __init__(self, primary, replica_configs=(), check_interval=10.0, max_lag=30, replica_timeout=0.5,
+                 **pool_options):
+        """
+        Args:
+            primary (ConnectionPool): Pool of the primary, used as the fallback
+            replica_configs (list): One connection settings dict per replica
+            check_interval (float): Seconds between health checks of a replica
+            max_lag (int): Replicas further behind than this many seconds are skipped
+            replica_timeout (float): Seconds to wait for a busy replica before moving on
+            pool_options: ConnectionPool arguments for the replica pools (size, borrow_timeout, ...)
+        """
+        self.primary = primary
+        self.check_interval = check_interval
+        self.max_lag = max_lag
+        self.replica_timeout = replica_timeout
+        self.replicas = [_Replica(f"{config.get('host', 'localhost')}:{config.get('port', 3306)}",
+                                  ConnectionPool(config, **pool_options))
+                         for config in replica_configs]
+        self._lock = threading.Lock()
+        self._fallbacks = 0
+
+    @property
+    def cursor_wrapper(self):
+        return self.primary.cursor_wrapper
+
+    @cursor_wrapper.setter
+    def cursor_wrapper(self, wrapper):
+        for replica in self.replicas:
+            replica.pool.cursor_wrapper = wrapper
+
+    def _check(self, replica):
+        try:
+            with replica.pool.connection(timeout=1.0) as connection:
+                lag = replication_lag(connection)
+            replica.lag = lag
+            if lag is not None and lag > self.max_lag:
+                replica.healthy, replica.error = False, f'{lag}s behind the primary'
+            else:
+                replica.healthy, replica.error = True, None
+        except PoolTimeoutError:
+            pass  # Busy, so evidently reachable - keep the previous verdict
+        except Exception as e:
+            replica.healthy, replica.error = False, str(e) or type(e).__name__
+            replica.pool.close_all()
+        finally:
+            replica.checked_at = time.monotonic()
+            replica.checking = False
+        if replica.error:
+            print(f"Replica {replica.name} skipped: {replica.error}")
+
+    def _usable(self):
+        now = time.monotonic()
+        due = []
+        with self._lock:
+            for replica in self.replicas:
+                if not replica.checking and now - replica.checked_at >= self.check_interval:
+                    replica.checking = True
+                    due.append(replica)
+        for replica in due:
+            self._check(replica)
+        usable = [replica for replica in self.replicas if replica.healthy]
+        return sorted(usable, key=lambda replica: replica.pool.in_use / replica.pool.size)
+
+    def get_connection(self, timeout=None):
+        """
+        Borrow a connection for read-only work
+        Args: timeout (float): Seconds to wait for the primary; replicas are waited on for at most replica_timeout
+        Returns: PooledConnection to a replica, or to the primary if no replica is usable or free
+        Raises: PoolTimeoutError or mysql.connector.Error as ConnectionPool.get_connection
+        """
+        replica_timeout = self.replica_timeout if timeout is None else min(timeout, self.replica_timeout)
+        for replica in self._usable():
+            try:
+                connection = replica.pool.get_connection(replica_timeout)
+            except PoolTimeoutError:
+                continue  # Busy rather than broken - try the next replica, then the primary
+            except mysql.connector.Error as e:
+                # Unreachable since its last check - skip it until the next one
+                replica.healthy, replica.error = False, str(e)
+                print(f"Replica {replica.name} skipped: {e}")
+                continue
+            with self._lock:
+                replica.borrows += 1
+            return connection
+        if self.replicas:
+            with self._lock:
+                self._fallbacks += 1
+        return self.primary.get_connection(timeout)
+
+    @contextmanager
+    def connection(self, timeout=None):
+        """
+        Context manager version of get_connection
+        Usage: with router.connection() as connection: ...
+        """
+        connection = self.get_connection(timeout)
+        try:
+            yield connection
+        finally:
+            connection.close()
+
+    def close_all(self):
+        for replica in self.replicas:
+            replica.pool.close_all()
+
+    def stats(self):
+        """
+        Health and usage of each replica, plus reads that fell back to the primary
+        """
+        with self._lock:
+            fallbacks = self._fallbacks
+        now = time.monotonic()
+        return {
+            'replicas': [{
+                'name': replica.name,
+                'healthy': replica.healthy,
+                'lag_seconds': replica.lag,
+                'error': replica.error,
+                'checked_seconds_ago': None if replica.checked_at == float('-inf') else now - replica.checked_at,
+                'borrows': replica.borrows,
+                'pool': replica.pool.stats(),
+            } for replica in self.replicas],
+            'primary_fallbacks': fallbacks,
+        }
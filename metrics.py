@@ -0,0 +1,217 @@
+"""
+Hospital Management System - Metrics
+Author: HMS Development Team
+Description: Minimal thread-safe counters and histograms rendered in the
+Prometheus text exposition format, plus a cursor wrapper that times queries.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+
+# Seconds - covers fast cached pages up to slow report renders
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """
+    Monotonic counter with optional labels
+    """
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, amount=1, *labels):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def collect(self):
+        yield f'# HELP {self.name} {self.help_text}'
+        yield f'# TYPE {self.name} counter'
+        with self._lock:
+            values = list(self._values.items())
+        for labels, value in sorted(values):
+            yield f'{self.name}{_labels(self.labelnames, labels)} {_number(value)}'
+
+
+class Histogram:
+    """
+    Histogram with fixed buckets and optional labels.
+    observe() only increments the one bucket the value falls in; cumulative
+    counts are computed when metrics are scraped.
+    """
+
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._series = {}   # labels -> [bucket counts (+Inf last), sum]
+
+    def observe(self, value, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def time(self, *labels):
+        """
+        Context manager observing the duration of its block
+        """
+        return _Timer(self, labels)
+
+    def collect(self):
+        yield f'# HELP {self.name} {self.help_text}'
+        yield f'# TYPE {self.name} histogram'
+        with self._lock:
+            series = [(labels, list(counts), total) for labels, (counts, total) in self._series.items()]
+        for labels, counts, total in sorted(series, key=lambda item: item[0]):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = f'le="{_number(float(bound))}"'
+                yield f'{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}'
+            yield f'{self.name}_sum{_labels(self.labelnames, labels)} {_number(total)}'
+            yield f'{self.name}_count{_labels(self.labelnames, labels)} {cumulative}'
+
+
+class _Timer:
+    __slots__ = ('histogram', 'labels', 'started')
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.histogram.observe(time.perf_counter() - self.started, *self.labels)
+
+
+class MetricsRegistry:
+    """
+    Holds the metrics of one process and renders them for /metrics.
+    Collectors are callables returning (name, type, help, [(labels dict, value)])
+    tuples, evaluated at scrape time - used for gauges read from other objects.
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, name, help_text, labelnames=()):
+        metric = Counter(name, help_text, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        metric = Histogram(name, help_text, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def collector(self, func):
+        self._collectors.append(func)
+        return func
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.collect())
+        for func in self._collectors:
+            for name, kind, help_text, samples in func():
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} {kind}')
+                for labels, value in samples:
+                    label_text = _labels(labels.keys(), labels.values()) if labels else ''
+                    lines.append(f'{name}{label_text} {_number(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+def sql_operation(sql):
+    """
+    First keyword of a statement (SELECT, INSERT, ...) for use as a label
+    """
+    word = sql.lstrip()[:8].split(None, 1)
+    word = word[0].upper() if word else ''
+    return word if word in ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'REPLACE') else 'OTHER'
+
+
+class InstrumentedCursor:
+    """
+    Wraps a database cursor and reports the time spent in execute/fetch calls.
+    observe(operation, seconds, is_query) is called after each call; is_query
+    is True for execute()/executemany() and False for fetches.
+    """
+
+    __slots__ = ('_cursor', '_observe', '_operation')
+
+    def __init__(self, cursor, observe):
+        self._cursor = cursor
+        self._observe = observe
+        self._operation = 'OTHER'
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._cursor.close()
+
+    def _timed(self, method, is_query, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            self._observe(self._operation, time.perf_counter() - started, is_query)
+
+    def execute(self, operation, params=None, *args, **kwargs):
+        self._operation = sql_operation(operation)
+        return self._timed(self._cursor.execute, True, operation, params, *args, **kwargs)
+
+    def executemany(self, operation, seq_params, *args, **kwargs):
+        self._operation = sql_operation(operation)
+        return self._timed(self._cursor.executemany, True, operation, seq_params, *args, **kwargs)
+
+    def fetchone(self):
+        return self._timed(self._cursor.fetchone, False)
+
+    def fetchmany(self, *args, **kwargs):
+        return self._timed(self._cursor.fetchmany, False, *args, **kwargs)
+
+    def fetchall(self):
+        return self._timed(self._cursor.fetchall, False)
@@ -0,0 +1,250 @@
+"""
+Hospital Management System - Keyset Pagination
+Author: HMS Development Team
+Description: Cursor-based (keyset) pagination helpers for list pages.
+Each page seeks past the last row of the previous page on the sort index,
+so page cost stays constant no matter how deep the user pages.
+"""
+
+import base64
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+
+class InvalidCursor(ValueError):
+    """
+    Raised when a pagination cursor cannot be decoded
+    """
+
+
+def _row_value(row, key):
+    if isinstance(row, dict):
+        return row[key]
+    return getattr(row, key)
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {'dt': value.isoformat()}
+    if isinstance(value, date):
+        return {'d': value.isoformat()}
+    if isinstance(value, Decimal):
+        return {'dec': str(value)}
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict):
+        if 'dt' in value:
+            return datetime.fromisoformat(value['dt'])
+        if 'd' in value:
+            return date.fromisoformat(value['d'])
+        if 'dec' in value:
+            return Decimal(value['dec'])
+        raise InvalidCursor('Unknown cursor value type')
+    return value
+
+
+def encode_cursor(values):
+    """
+    Encode sort-key values into an opaque URL-safe cursor token
+    Args: values (list): Sort-key values of the boundary row
+    Returns: str: Cursor token
+    """
+    payload = json.dumps([_encode_value(v) for v in values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """
+    Decode a cursor token produced by encode_cursor
+    Args: token (str): Cursor token
+    Returns: list: Sort-key values
+    Raises: InvalidCursor if the token is malformed
+    """
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+        if not isinstance(values, list):
+            raise InvalidCursor('Invalid cursor')
+        # Inside the try: a malformed date or decimal is a bad cursor too
+        return [_decode_value(v) for v in values]
+    except InvalidCursor:
+        raise
+    except (ValueError, TypeError, ArithmeticError) as e:
+        raise InvalidCursor(f'Invalid cursor: {e}')
+
+
+class Keyset:
+    """
+    Sort specification for keyset pagination.
+    Each column is a tuple of (sql_expression, row_key, direction) where
+    direction is 'ASC' or 'DESC'. The last column must be unique (usually the id)
+    so that the ordering is total.
+    """
+
+    def __init__(self, *columns):
+        self.columns = [(expr, key, direction.upper()) for expr, key, direction in columns]
+
+    def order_by(self, backward=False):
+        """
+        Build the ORDER BY clause (reversed when paging backward)
+        """
+        parts = []
+        for expr, _, direction in self.columns:
+            if backward:
+                direction = 'ASC' if direction == 'DESC' else 'DESC'
+            parts.append(f'{expr} {direction}')
+        return ', '.join(parts)
+
+    def seek(self, values, backward=False):
+        """
+        Build the WHERE predicate that skips past the boundary row.
+        Expanded as (c1 > v1) OR (c1 = v1 AND c2 > v2) ... so MySQL can turn it
+        into index range scans.
+        Returns: tuple (sql, params)
+        """
+        if len(values) != len(self.columns):
+            raise InvalidCursor('Cursor does not match sort order')
+        clauses = []
+        params = []
+        for i, (expr, _, direction) in enumerate(self.columns):
+            op = '<' if (direction == 'DESC') != backward else '>'
+            terms = [f'{self.columns[j][0]} = %s' for j in range(i)]
+            terms.append(f'{expr} {op} %s')
+            clauses.append('(' + ' AND '.join(terms) + ')')
+            params.extend(values[:i])
+            params.append(values[i])
+        return '(' + ' OR '.join(clauses) + ')', params
+
+    def values_of(self, row):
+        return [_row_value(row, key) for _, key, _ in self.columns]
+
+
+class Page:
+    """
+    One page of results plus the cursors needed to move forward and backward
+    """
+
+    def __init__(self, items, per_page, next_cursor=None, prev_cursor=None, approx_total=None):
+        self.items = items
+        self.per_page = per_page
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.approx_total = approx_total
+        self.next_url = None
+        self.prev_url = None
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+
+def page_query(select_sql, keyset, where=None, params=None, after=None, before=None, per_page=25):
+    """
+    Build the SQL for one keyset page (see fetch_page for the arguments)
+    Returns: tuple (query, params) - the query fetches one extra row to detect a further page
+    Raises: InvalidCursor if a cursor token is malformed
+    """
+    where = list(where or [])
+    params = list(params or [])
+    backward = bool(before) and not after
+    token = after or before
+
+    if token:
+        seek_sql, seek_params = keyset.seek(decode_cursor(token), backward=backward)
+        where.append(seek_sql)
+        params.extend(seek_params)
+
+    query = select_sql
+    if where:
+        query += ' WHERE ' + ' AND '.join(where)
+    query += f' ORDER BY {keyset.order_by(backward)} LIMIT %s'
+    params.append(per_page + 1)
+    return query, tuple(params)
+
+
+def union_page_query(select_sqls, keyset, where=None, params=None, after=None, before=None, per_page=25):
+    """
+    page_query over the UNION ALL of SELECTs returning the same columns (e.g. a table and its archive).
+    Every branch seeks, sorts and limits on its own, so each reads at most one page from its index;
+    the outer query merges them on the keyset's row keys, which must be the SELECTs' column names.
+    Returns: tuple (query, params) for page_from_rows
+    Raises: InvalidCursor if a cursor token is malformed
+    """
+    branches, union_params = [], []
+    for select_sql in select_sqls:
+        query, branch_params = page_query(select_sql, keyset, where, params, after, before, per_page)
+        branches.append(f'({query})')
+        union_params.extend(branch_params)
+    merged = Keyset(*[(key, key, direction) for _, key, direction in keyset.columns])
+    backward = bool(before) and not after
+    union_params.append(per_page + 1)
+    return f"{' UNION ALL '.join(branches)} ORDER BY {merged.order_by(backward)} LIMIT %s", tuple(union_params)
+
+
+def page_from_rows(rows, keyset, after=None, before=None, per_page=25):
+    """
+    Turn the rows fetched with page_query or union_page_query into a Page
+    """
+    backward = bool(before) and not after
+    token = after or before
+    has_more = len(rows) > per_page
+    rows = list(rows[:per_page])
+    if backward:
+        rows.reverse()
+
+    next_cursor = prev_cursor = None
+    if rows:
+        first = encode_cursor(keyset.values_of(rows[0]))
+        last = encode_cursor(keyset.values_of(rows[-1]))
+        if backward:
+            next_cursor = last
+            prev_cursor = first if has_more else None
+        else:
+            next_cursor = last if has_more else None
+            prev_cursor = first if token else None
+    return Page(rows, per_page, next_cursor, prev_cursor)
+
+
+def fetch_page(cursor, select_sql, keyset, where=None, params=None, after=None, before=None, per_page=25):
+    """
+    Run a keyset-paginated SELECT
+    Args:
+        cursor: Open database cursor
+        select_sql (str): SELECT ... FROM ... [JOIN ...] without WHERE/ORDER BY/LIMIT
+        keyset (Keyset): Sort specification
+        where (list): Extra WHERE predicates (ANDed together)
+        params (list): Parameters for the extra predicates
+        after (str): Cursor token - return the page after this row
+        before (str): Cursor token - return the page before this row
+        per_page (int): Page size
+    Returns: Page
+    Raises: InvalidCursor if a cursor token is malformed
+    """
+    query, params = page_query(select_sql, keyset, where, params, after, before, per_page)
+    cursor.execute(query, params)
+    return page_from_rows(cursor.fetchall(), keyset, after, before, per_page)
+
+
+APPROXIMATE_COUNT_SQL = ("SELECT TABLE_ROWS FROM information_schema.TABLES "
+                         "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s")
+
+
+def approximate_count(cursor, table):
+    """
+    Cheap row-count estimate from InnoDB table statistics (no table scan)
+    Args: cursor: Open database cursor, table (str): Table name
+    Returns: int or None if the estimate is unavailable
+    """
+    cursor.execute(APPROXIMATE_COUNT_SQL, (table,))
+    row = cursor.fetchone()
+    if not row:
+        return None
+    value = row['TABLE_ROWS'] if isinstance(row, dict) else row[0]
+    return int(value) if value is not None else None
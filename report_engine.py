@@ -0,0 +1,366 @@
+"""
+Hospital Management System - Streaming PDF Report Engine
+Author: HMS Development Team
+Description: Builds paginated table reports straight from a row iterator and
+emits the PDF page by page, so memory stays bounded whatever the row count.
+Text layout uses reportlab font metrics; the PDF objects are written
+incrementally with the standard Helvetica fonts (nothing to embed).
+"""
+
+import zlib
+
+from reportlab.lib.pagesizes import A4, landscape
+from reportlab.lib.utils import simpleSplit
+from reportlab.pdfbase.pdfmetrics import stringWidth
+
+# Colours matching the old HTML report stylesheet
+HEADER_FILL = (0.173, 0.243, 0.314)     # #2c3e50
+STRIPE_FILL = (0.976, 0.976, 0.976)     # #f9f9f9
+BORDER_STROKE = (0.867, 0.867, 0.867)   # #ddd
+MUTED_TEXT = (0.4, 0.4, 0.4)            # #666
+STATUS_COLOURS = {
+    'Scheduled': (0.953, 0.612, 0.071),  # #f39c12
+    'Completed': (0.153, 0.682, 0.376),  # #27ae60
+    'Cancelled': (0.906, 0.298, 0.235),  # #e74c3c
+}
+
+FONT = 'Helvetica'
+BOLD_FONT = 'Helvetica-Bold'
+
+
+_CHAR_WIDTHS = {}
+
+
+def text_width(text, font=FONT, size=8):
+    """
+    Width of text in points, using cached per-character Type1 metrics
+    (much cheaper than calling stringWidth for every cell of a large report)
+    """
+    widths = _CHAR_WIDTHS.get(font)
+    if widths is None:
+        widths = _CHAR_WIDTHS[font] = {}
+    total = 0.0
+    for char in text:
+        width = widths.get(char)
+        if width is None:
+            width = widths[char] = stringWidth(char, font, 1000)
+        total += width
+    return total * size / 1000
+
+
+def _pdf_string(text):
+    """
+    Encode text as a PDF literal string (WinAnsi encoding)
+    """
+    data = text.encode('cp1252', errors='replace')
+    data = data.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)')
+    return b'(' + data + b')'
+
+
+class StreamingPDFWriter:
+    """
+    Incremental PDF writer.
+    begin(), add_page() and finish() each return the bytes to send next; only
+    the byte offsets of written objects are kept, so memory does not grow with
+    page content.
+    """
+
+    CATALOG, PAGES, FONT_REGULAR, FONT_BOLD = 1, 2, 3, 4
+
+    def __init__(self, pagesize=landscape(A4), compress=True, title='Report'):
+        self.width, self.height = pagesize
+        self.compress = compress
+        self.title = title
+        self._offsets = {}
+        self._position = 0
+        self._next_id = 5
+        self._page_ids = []
+
+    def _object(self, obj_id, body):
+        self._offsets[obj_id] = self._position
+        data = b'%d 0 obj\n' % obj_id + body + b'\nendobj\n'
+        self._position += len(data)
+        return data
+
+    def _emit(self, data):
+        self._position += len(data)
+        return data
+
+    def begin(self):
+        out = self._emit(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+        font = b'<< /Type /Font /Subtype /Type1 /BaseFont /%s /Encoding /WinAnsiEncoding >>'
+        out += self._object(self.FONT_REGULAR, font % FONT.encode())
+        out += self._object(self.FONT_BOLD, font % BOLD_FONT.encode())
+        return out
+
+    def add_page(self, content):
+        content_id, page_id = self._next_id, self._next_id + 1
+        self._next_id += 2
+        self._page_ids.append(page_id)
+
+        if self.compress:
+            content = zlib.compress(content, 6)
+            stream_dict = b'<< /Length %d /Filter /FlateDecode >>' % len(content)
+        else:
+            stream_dict = b'<< /Length %d >>' % len(content)
+        out = self._object(content_id, stream_dict + b'\nstream\n' + content + b'\nendstream')
+        out += self._object(page_id, (
+            b'<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %.2f %.2f] '
+            b'/Resources << /Font << /F1 %d 0 R /F2 %d 0 R >> >> /Contents %d 0 R >>'
+        ) % (self.PAGES, self.width, self.height, self.FONT_REGULAR, self.FONT_BOLD, content_id))
+        return out
+
+    def finish(self):
+        kids = b' '.join(b'%d 0 R' % page_id for page_id in self._page_ids)
+        out = self._object(self.PAGES, b'<< /Type /Pages /Kids [%s] /Count %d >>' % (kids, len(self._page_ids)))
+        out += self._object(self.CATALOG, b'<< /Type /Catalog /Pages %d 0 R >>' % self.PAGES)
+        info_id = self._next_id
+        out += self._object(info_id, b'<< /Title %s /Producer (HMS Report Engine) >>' % _pdf_string(self.title))
+
+        xref_at = self._position
+        size = info_id + 1
+        xref = [b'xref\n0 %d\n' % size, b'0000000000 65535 f \n']
+        for obj_id in range(1, size):
+            xref.append(b'%010d 00000 n \n' % self._offsets[obj_id])
+        out += b''.join(xref)
+        out += b'trailer\n<< /Size %d /Root %d 0 R /Info %d 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (
+            size, self.CATALOG, info_id, xref_at)
+        return out
+
+
+class _Canvas:
+    """
+    Collects drawing operators for a single page
+    """
+
+    def __init__(self):
+        self._ops = []
+
+    def fill_colour(self, rgb):
+        self._ops.append(b'%.3f %.3f %.3f rg' % rgb)
+
+    def stroke_colour(self, rgb):
+        self._ops.append(b'%.3f %.3f %.3f RG' % rgb)
+
+    def rect(self, x, y, width, height, fill=False, stroke=False):
+        op = b'B' if fill and stroke else b'f' if fill else b'S'
+        self._ops.append(b'%.2f %.2f %.2f %.2f re %s' % (x, y, width, height, op))
+
+    def line(self, x1, y1, x2, y2):
+        self._ops.append(b'%.2f %.2f m %.2f %.2f l S' % (x1, y1, x2, y2))
+
+    def text(self, x, y, text, font=FONT, size=9):
+        font_ref = b'/F2' if font == BOLD_FONT else b'/F1'
+        self._ops.append(b'BT %s %.1f Tf %.2f %.2f Td %s Tj ET' % (font_ref, size, x, y, _pdf_string(text)))
+
+    def centred_text(self, centre_x, y, text, font=FONT, size=9):
+        self.text(centre_x - text_width(text, font, size) / 2, y, text, font, size)
+
+    def getvalue(self):
+        return b'\n'.join(self._ops)
+
+
+class ReportColumn:
+    """
+    A report table column
+    Args:
+        title (str): Header text
+        width (float): Relative width (columns are scaled to the page)
+        value (callable): Function row -> display text
+        colour (callable): Optional function row -> RGB tuple for the cell text
+        max_lines (int): Wrap long values up to this many lines
+    """
+
+    def __init__(self, title, width, value, colour=None, max_lines=1):
+        self.title = title
+        self.width = width
+        self.value = value
+        self.colour = colour
+        self.max_lines = max_lines
+
+
+class TableReport:
+    """
+    Lays out a titled table over as many pages as needed
+    """
+
+    MARGIN = 36
+    FONT_SIZE = 8
+    LEADING = 10
+    CELL_PADDING = 4
+    HEADER_HEIGHT = 18
+
+    def __init__(self, title, columns, generated_on, total_label, footer_lines=(), pagesize=landscape(A4)):
+        self.title = title
+        self.columns = columns
+        self.generated_on = generated_on
+        self.total_label = total_label
+        self.footer_lines = footer_lines
+        self.page_width, self.page_height = pagesize
+
+        usable = self.page_width - 2 * self.MARGIN
+        scale = usable / sum(column.width for column in columns)
+        self._widths = [column.width * scale for column in columns]
+
+    def _cell_lines(self, column, width, row):
+        text = column.value(row)
+        text = '' if text is None else str(text).replace('\r', ' ').replace('\n', ' ')
+        max_width = width - 2 * self.CELL_PADDING
+        if text_width(text, FONT, self.FONT_SIZE) <= max_width:
+            return [text]
+        lines = simpleSplit(text, FONT, self.FONT_SIZE, max_width) or ['']
+        if len(lines) > column.max_lines:
+            lines = lines[:column.max_lines]
+            lines[-1] = self._truncate(lines[-1] + '...', max_width)
+        return [self._truncate(line, max_width) for line in lines]
+
+    def _truncate(self, text, max_width):
+        if text_width(text, FONT, self.FONT_SIZE) <= max_width:
+            return text
+        while text and text_width(text + '...', FONT, self.FONT_SIZE) > max_width:
+            text = text[:-1]
+        return text + '...'
+
+    def _start_page(self, page_number):
+        canvas = _Canvas()
+        y = self.page_height - self.MARGIN
+        centre = self.page_width / 2
+        if page_number == 1:
+            canvas.fill_colour(HEADER_FILL)
+            canvas.centred_text(centre, y - 16, 'Hospital Management System', BOLD_FONT, 18)
+            canvas.centred_text(centre, y - 36, self.title, BOLD_FONT, 13)
+            canvas.fill_colour(MUTED_TEXT)
+            canvas.centred_text(centre, y - 52, f'Generated on: {self.generated_on}', FONT, 9)
+            y -= 66
+        else:
+            canvas.fill_colour(MUTED_TEXT)
+            canvas.text(self.MARGIN, y - 10, f'{self.title} (continued)', FONT, 9)
+            y -= 20
+
+        # Table header row
+        x = self.MARGIN
+        canvas.fill_colour(HEADER_FILL)
+        canvas.rect(x, y - self.HEADER_HEIGHT, sum(self._widths), self.HEADER_HEIGHT, fill=True)
+        canvas.fill_colour((1, 1, 1))
+        for column, width in zip(self.columns, self._widths):
+            canvas.text(x + self.CELL_PADDING, y - self.HEADER_HEIGHT + 6, column.title, BOLD_FONT, self.FONT_SIZE)
+            x += width
+        return canvas, y - self.HEADER_HEIGHT
+
+    def _finish_page(self, canvas, page_number):
+        canvas.fill_colour(MUTED_TEXT)
+        canvas.centred_text(self.page_width / 2, self.MARGIN / 2, f'Page {page_number}', FONT, 8)
+        return canvas.getvalue()
+
+    def pages(self, rows):
+        """
+        Generate page content streams for the given rows
+        Args: rows (iterable): Row objects (dicts or attribute rows)
+        Returns: generator of bytes, one content stream per page
+        """
+        page_number = 1
+        canvas, y = self._start_page(page_number)
+        bottom = self.MARGIN + 12
+        total = 0
+
+        for row in rows:
+            cells = [self._cell_lines(column, width, row) for column, width in zip(self.columns, self._widths)]
+            row_height = max(len(lines) for lines in cells) * self.LEADING + 2 * self.CELL_PADDING - 2
+
+            if y - row_height < bottom:
+                yield self._finish_page(canvas, page_number)
+                page_number += 1
+                canvas, y = self._start_page(page_number)
+
+            x = self.MARGIN
+            if total % 2:
+                canvas.fill_colour(STRIPE_FILL)
+                canvas.rect(x, y - row_height, sum(self._widths), row_height, fill=True)
+            canvas.stroke_colour(BORDER_STROKE)
+            canvas.line(x, y - row_height, x + sum(self._widths), y - row_height)
+
+            for column, width, lines in zip(self.columns, self._widths, cells):
+                colour = column.colour(row) if column.colour else None
+                canvas.fill_colour(colour or (0, 0, 0))
+                font = BOLD_FONT if colour else FONT
+                line_y = y - self.CELL_PADDING - self.FONT_SIZE + 1
+                for line in lines:
+                    canvas.text(x + self.CELL_PADDING, line_y, line, font, self.FONT_SIZE)
+                    line_y -= self.LEADING
+                x += width
+
+            y -= row_height
+            total += 1
+
+        # Summary and footer go after the last row
+        if y - 60 < bottom:
+            yield self._finish_page(canvas, page_number)
+            page_number += 1
+            canvas, y = self._start_page(page_number)
+        canvas.fill_colour((0, 0, 0))
+        canvas.text(self.MARGIN, y - 18, f'{self.total_label}: {total}', BOLD_FONT, 9)
+        canvas.fill_colour(MUTED_TEXT)
+        line_y = y - 38
+        for line in self.footer_lines:
+            canvas.centred_text(self.page_width / 2, line_y, line, FONT, 8)
+            line_y -= 11
+        yield self._finish_page(canvas, page_number)
+
+    def stream(self, rows, compress=True):
+        """
+        Generate the complete PDF file in chunks (one chunk per page)
+        Args: rows (iterable): Report rows, consumed lazily
+        Returns: generator of bytes
+        """
+        writer = StreamingPDFWriter((self.page_width, self.page_height), compress=compress, title=self.title)
+        yield writer.begin()
+        for content in self.pages(rows):
+            yield writer.add_page(content)
+        yield writer.finish()
+
+
+def _get(row, key):
+    return row[key] if isinstance(row, dict) else getattr(row, key)
+
+
+def _format_date(value, fmt):
+    return value.strftime(fmt) if value else 'N/A'
+
+
+def patients_report(generated_on):
+    """
+    Report layout matching templates/pdf_patients.html
+    """
+    columns = [
+        ReportColumn('ID', 0.5, lambda r: _get(r, 'id')),
+        ReportColumn('Name', 1.6, lambda r: _get(r, 'name')),
+        ReportColumn('Age', 0.5, lambda r: _get(r, 'age')),
+        ReportColumn('Gender', 0.8, lambda r: _get(r, 'gender')),
+        ReportColumn('Phone', 1.2, lambda r: _get(r, 'phone')),
+        ReportColumn('Email', 1.8, lambda r: _get(r, 'email') or 'N/A'),
+        ReportColumn('Medical History', 3.0, lambda r: _get(r, 'medical_history') or 'None', max_lines=3),
+    ]
+    return TableReport('Patients Report', columns, generated_on, 'Total Patients', footer_lines=(
+        'Hospital Management System - Confidential Patient Information',
+        'This report contains sensitive medical information and should be handled according to HIPAA guidelines.',
+    ))
+
+
+def appointments_report(generated_on):
+    """
+    Report layout matching templates/pdf_appointments.html
+    """
+    columns = [
+        ReportColumn('ID', 0.5, lambda r: _get(r, 'id')),
+        ReportColumn('Patient', 1.5, lambda r: _get(r, 'patient_name')),
+        ReportColumn('Doctor', 1.5, lambda r: _get(r, 'doctor_name')),
+        ReportColumn('Date', 0.9, lambda r: _format_date(_get(r, 'appointment_date'), '%Y-%m-%d')),
+        ReportColumn('Time', 0.8, lambda r: _format_date(_get(r, 'appointment_date'), '%I:%M %p')),
+        ReportColumn('Status', 0.9, lambda r: _get(r, 'status'), colour=lambda r: STATUS_COLOURS.get(_get(r, 'status'))),
+        ReportColumn('Fee', 0.8, lambda r: '$%.2f' % (_get(r, 'fee') or 0)),
+        ReportColumn('Notes', 2.5, lambda r: _get(r, 'notes') or 'N/A', max_lines=3),
+    ]
+    return TableReport('Appointments Report', columns, generated_on, 'Total Appointments', footer_lines=(
+        'Hospital Management System - Appointment Schedule Report',
+        'This report contains confidential medical appointment information.',
+    ))
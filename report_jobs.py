@@ -0,0 +1,365 @@
+"""
+Hospital Management System - Report Jobs
+Author: HMS Development Team
+Description: Renders PDF reports in a process pool, off the request threads.
+Finished reports are cached on disk under a key made of the report type, its
+filters and the versions of the tables it reads, so repeated requests are
+served from disk until one of those tables changes.
+"""
+
+import hashlib
+import json
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import date, datetime, timedelta
+
+import mysql.connector
+
+import archive
+from dal import row_type
+from report_engine import patients_report, appointments_report
+
+
+class ReportSpec:
+    """
+    What a report reads and how it is laid out
+    """
+
+    def __init__(self, title, tables, factory, build_query):
+        self.title = title
+        self.tables = tables
+        self.factory = factory
+        self.build_query = build_query
+
+
+def _patients_query(cursor, filters):
+    where, params = [], []
+    if filters.get('gender'):
+        where.append("gender = %s")
+        params.append(filters['gender'])
+    return (f"SELECT * FROM patients {'WHERE ' + ' AND '.join(where) if where else ''} ORDER BY name, id",
+            tuple(params))
+
+
+def _appointments_query(cursor, filters):
+    where, params = [], []
+    first_day = date.fromisoformat(filters['start']) if filters.get('start') else None
+    if filters.get('start'):
+        where.append("a.appointment_date >= %s")
+        params.append(date.fromisoformat(filters['start']))
+    if filters.get('end'):
+        where.append("a.appointment_date < %s")
+        params.append(date.fromisoformat(filters['end']) + timedelta(days=1))
+    if filters.get('doctor_id'):
+        where.append("a.doctor_id = %s")
+        params.append(int(filters['doctor_id']))
+    if filters.get('status'):
+        where.append("a.status = %s")
+        params.append(filters['status'])
+    return (f"""SELECT a.*, p.name as patient_name, d.name as doctor_name
+                FROM {archive.source(cursor, first_day)} a
+                JOIN patients p ON a.patient_id = p.id
+                JOIN doctors d ON a.doctor_id = d.id
+                {'WHERE ' + ' AND '.join(where) if where else ''}
+                ORDER BY a.appointment_date DESC, a.id DESC""", tuple(params))
+
+
+REPORTS = {
+    'patients': ReportSpec('Patients Report', ('patients',), patients_report, _patients_query),
+    'appointments': ReportSpec('Appointments Report', ('appointments', 'patients', 'doctors'),
+                               appointments_report, _appointments_query),
+}
+
+
+def render_report(db_config, kind, filters, path, fetch_size=1000):
+    """
+    Render one report to path. Runs in a worker process with its own connection.
+    Returns: dict with size (bytes), rows and seconds spent querying and rendering
+    """
+    started = time.perf_counter()
+    row_count = 0
+    connection = mysql.connector.connect(**db_config)
+    temp_path = f'{path}.{os.getpid()}.tmp'
+    try:
+        cursor = connection.cursor()  # Unbuffered: rows arrive as they are read
+        query, params = REPORTS[kind].build_query(cursor, filters)
+
+        def rows():
+            nonlocal row_count
+            make = row_type(cursor.column_names)._make  # Named tuples: no per-row dict
+            while True:
+                batch = cursor.fetchmany(fetch_size)
+                if not batch:
+                    return
+                row_count += len(batch)
+                yield from map(make, batch)
+
+        cursor.execute(query, params)
+        report = REPORTS[kind].factory(datetime.now().strftime('%Y-%m-%d'))
+        with open(temp_path, 'wb') as handle:
+            for chunk in report.stream(rows()):
+                handle.write(chunk)
+        os.replace(temp_path, path)  # Readers never see a half-written file
+        return {'size': os.path.getsize(path), 'rows': row_count, 'seconds': time.perf_counter() - started}
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        connection.close()
+
+
+class ReportJob:
+    """
+    One requested report. The id is the cache key, so identical requests share a job.
+    """
+
+    def __init__(self, job_id, kind, filters, path):
+        self.id = job_id
+        self.kind = kind
+        self.filters = filters
+        self.path = path
+        self.status = 'queued'
+        self.error = None
+        self.size = None
+        self.submitted_at = time.time()
+        self.finished_at = None
+        self.render_seconds = None
+        self.rows = None
+        self.future = None
+
+    def state(self):
+        """
+        What other web workers need to answer for this job (written next to the PDF)
+        """
+        return {'id': self.id, 'kind': self.kind, 'filters': self.filters, 'status': self.status,
+                'error': self.error, 'size': self.size, 'rows': self.rows,
+                'submitted_at': self.submitted_at, 'finished_at': self.finished_at}
+
+    @classmethod
+    def from_state(cls, state, path):
+        job = cls(state['id'], state['kind'], state['filters'], path)
+        job.status, job.error, job.size, job.rows = state['status'], state['error'], state['size'], state['rows']
+        job.submitted_at, job.finished_at = state['submitted_at'], state['finished_at']
+        return job
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'title': REPORTS[self.kind].title if self.kind in REPORTS else 'Report',
+            'filters': self.filters,
+            'status': self.status,
+            'error': self.error,
+            'size': self.size,
+            'rows': self.rows,
+            'seconds': None if self.finished_at is None else round(self.finished_at - self.submitted_at, 2),
+        }
+
+
+class ReportJobQueue:
+    """
+    Submits report renders to a process pool and tracks them.
+
+    Jobs live in memory in the submitting process, and their state is written
+    to `{id}.json` next to the rendered `{id}.pdf` in `cache_dir` on submit and
+    when the render finishes, so any web worker can answer the status page,
+    the polls and the download, and does not render the same report twice.
+    A queued job whose state is older than `max_age` is treated as lost (its
+    process ended without finishing it) and may be submitted again. The pool is
+    started on first use with the 'spawn' method, which is safe next to the
+    request threads and open database connections of the web process.
+    """
+
+    def __init__(self, db_config, cache_dir, workers=2, max_cached=200, fetch_size=1000, on_finished=None,
+                 max_age=3600):
+        """
+        Args:
+            db_config (dict): Connection settings for the worker processes
+            cache_dir (str): Directory holding rendered reports
+            workers (int): Reports rendered at the same time
+            max_cached (int): Rendered files kept; the least recently used are deleted
+            fetch_size (int): Rows fetched per round trip while rendering
+            on_finished (callable): on_finished(job) after a render succeeds or fails
+            max_age (float): Seconds job states are kept (and a queued job is waited for)
+        """
+        self.db_config = dict(db_config)
+        self.cache_dir = cache_dir
+        self.workers = workers
+        self.max_cached = max_cached
+        self.fetch_size = fetch_size
+        self.on_finished = on_finished
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._executor = None
+        self._jobs = {}
+
+    def _pool(self):
+        if self._executor is None:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                 mp_context=multiprocessing.get_context('spawn'))
+        return self._executor
+
+    @staticmethod
+    def job_id(kind, filters, versions):
+        """
+        Cache key for a report; versions=None disables caching for this request
+        """
+        payload = {'kind': kind, 'filters': filters,
+                   'versions': versions if versions is not None else os.urandom(8).hex()}
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()[:32]
+
+    def path_for(self, job_id):
+        return os.path.join(self.cache_dir, f'{job_id}.pdf')
+
+    def state_path_for(self, job_id):
+        return os.path.join(self.cache_dir, f'{job_id}.json')
+
+    def _save(self, job):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self.state_path_for(job.id)
+        temp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as handle:
+            json.dump(job.state(), handle)
+        os.replace(temp_path, path)  # Other workers never read a half-written state
+
+    def _load(self, job_id):
+        """
+        Job state written by any web worker, or None if there is none or it is too old
+        """
+        try:
+            with open(self.state_path_for(job_id), encoding='utf-8') as handle:
+                job = ReportJob.from_state(json.load(handle), self.path_for(job_id))
+        except (OSError, ValueError, KeyError):
+            return None
+        return job if time.time() - (job.finished_at or job.submitted_at) <= self.max_age else None
+
+    def submit(self, kind, filters, versions, db_config=None):
+        """
+        Queue a report unless an identical one is cached or already being rendered
+        Args: kind (str): Key of REPORTS, filters (dict): Normalised filters,
+              versions (dict): Table versions the report depends on, or None if unknown,
+              db_config (dict): Server to read from (e.g. a replica), default the queue's db_config
+        Returns: ReportJob
+        """
+        job_id = self.job_id(kind, filters, versions)
+        path = self.path_for(job_id)
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None and job.status != 'failed':
+                return job
+            self._forget_old_jobs()
+            if os.path.exists(path):
+                job = self._jobs[job_id] = ReportJob(job_id, kind, filters, path)
+                os.utime(path)  # Mark as recently used
+                job.status, job.size, job.finished_at = 'done', os.path.getsize(path), job.submitted_at
+                return job
+            shared = self._load(job_id)
+            if shared is not None and shared.status == 'queued':
+                return shared  # Being rendered by another web worker
+            job = ReportJob(job_id, kind, filters, path)
+            self._jobs[job_id] = job
+            self._save(job)
+            job.future = self._pool().submit(render_report, db_config or self.db_config, kind, filters, path,
+                                             self.fetch_size)
+        job.future.add_done_callback(lambda future: self._finished(job, future))
+        return job
+
+    def _finished(self, job, future):
+        try:
+            outcome = future.result()
+            job.size, job.rows, job.render_seconds = outcome['size'], outcome['rows'], outcome['seconds']
+            job.status = 'done'
+        except Exception as e:
+            job.error = str(e) or e.__class__.__name__
+            job.status = 'failed'
+            if isinstance(e, BrokenProcessPool):
+                # A worker died (e.g. killed for memory); start a fresh pool next time
+                with self._lock:
+                    if self._executor is not None:
+                        self._executor.shutdown(wait=False)
+                        self._executor = None
+            print(f"Report job {job.id} ({job.kind}) failed: {job.error}")
+        job.finished_at = time.time()
+        job.future = None
+        try:
+            self._save(job)
+        except OSError as e:
+            print(f"Report job {job.id}: could not save its state: {e}")
+        if self.on_finished is not None:
+            self.on_finished(job)
+        self.prune()
+
+    def get(self, job_id):
+        """
+        Look up a job. Jobs of another web worker are read from their state file,
+        and finished reports are found on disk.
+        Returns: ReportJob or None
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is not None:
+            if job.status == 'queued' and job.future is not None and job.future.running():
+                job.status = 'running'
+            return job
+        job = self._load(job_id)
+        path = self.path_for(job_id)
+        if os.path.exists(path):
+            if job is None or job.status != 'done':
+                job = ReportJob(job_id, None if job is None else job.kind, None if job is None else job.filters, path)
+                job.status, job.size = 'done', os.path.getsize(path)
+            return job
+        return job if job is not None and job.status != 'done' else None
+
+    def prune(self):
+        """
+        Delete the least recently used rendered reports beyond max_cached, with their
+        states, and the states of jobs that ended (or were lost) more than max_age ago
+        """
+        try:
+            entries = list(os.scandir(self.cache_dir))
+        except FileNotFoundError:
+            return
+        reports = sorted((entry for entry in entries if entry.name.endswith('.pdf')),
+                         key=lambda entry: entry.stat().st_mtime)
+        expired = []
+        for entry in reports[:max(len(reports) - self.max_cached, 0)]:
+            expired += [entry.path, self.state_path_for(entry.name[:-len('.pdf')])]
+        cutoff = time.time() - self.max_age
+        expired += [entry.path for entry in entries
+                    if entry.name.endswith('.json') and entry.stat().st_mtime < cutoff
+                    and not os.path.exists(self.path_for(entry.name[:-len('.json')]))]
+        if not expired:
+            return
+        for path in expired:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        with self._lock:
+            for job_id in [job_id for job_id, job in self._jobs.items()
+                           if job.status == 'done' and not os.path.exists(job.path)]:
+                del self._jobs[job_id]
+
+    def _forget_old_jobs(self):
+        # Callers hold the lock. Failed jobs are kept a while so their status can be shown.
+        cutoff = time.time() - self.max_age
+        for job_id in [job_id for job_id, job in self._jobs.items()
+                       if job.finished_at is not None and job.finished_at < cutoff]:
+            del self._jobs[job_id]
+
+    def stats(self):
+        with self._lock:
+            counts = {}
+            for job in self._jobs.values():
+                status = 'running' if job.future is not None and job.future.running() else job.status
+                counts[status] = counts.get(status, 0) + 1
+        return {'workers': self.workers, 'jobs': counts, 'cache_dir': self.cache_dir}
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
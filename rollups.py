@@ -0,0 +1,450 @@
+"""
+Hospital Management System - Appointment Roll-ups
+Author: HMS Development Team
+Description: Maintains appointment_daily_rollup - the number of appointments
+and their fee total per day, doctor and status - so the dashboard and revenue
+reports read a few summary rows instead of scanning appointments, its sum per
+day (appointment_day_totals) for the dashboard's all-time income, and the
+appointment counters stored on each patient (total_appointments,
+last_appointment, next_scheduled_appointment). Write paths capture the
+appointments they are about to change and update both in the same
+transaction. rebuild() and rebuild_patient_counters() recompute them from the
+appointments table; check() and check_patient_counters() list disagreements.
+Archived appointments (archive.py) stay counted in both.
+"""
+
+from collections import defaultdict
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from mysql.connector import Error, errorcode
+
+import archive
+from dal import touch_tables
+
+TABLE = 'appointment_daily_rollup'
+DAY_TOTALS = 'appointment_day_totals'
+
+_UPSERT = f"""INSERT INTO {TABLE} (day, doctor_id, status, appointments, fee_total) VALUES (%s, %s, %s, %s, %s)
+              ON DUPLICATE KEY UPDATE appointments = appointments + %s, fee_total = fee_total + %s"""
+_DAY_TOTAL_UPSERT = f"""INSERT INTO {DAY_TOTALS} (day, appointments, fee_total) VALUES (%s, %s, %s)
+                        ON DUPLICATE KEY UPDATE appointments = appointments + %s, fee_total = fee_total + %s"""
+
+# Dashboard figures, answered from the roll-up's primary key. All-time income sums one row
+# per day rather than every (day, doctor, status) group; see income_sql().
+DAY_COUNT_SQL = f"SELECT COALESCE(SUM(appointments), 0) FROM {TABLE} WHERE day = %s"
+INCOME_SQL = f"SELECT COALESCE(SUM(fee_total), 0) FROM {DAY_TOTALS}"
+_ROLLUP_INCOME_SQL = f"SELECT COALESCE(SUM(fee_total), 0) FROM {TABLE}"
+
+SUMMARY_GROUPS = {
+    'day': 'r.day',
+    'doctor': 'r.doctor_id',
+    'status': 'r.status',
+}
+
+# Per-patient counters over a patient_id predicate, read from idx_patient_status_date
+_PATIENT_TOTALS = """SELECT patient_id, COUNT(*) AS total, MAX(appointment_date) AS last_date,
+                           MIN(CASE WHEN status = 'Scheduled' THEN appointment_date END) AS next_date
+                    FROM {} WHERE {} GROUP BY patient_id"""
+# Sets the counters of the patients matching a predicate from _patient_counter_source().
+# updated_at is set to itself so it keeps recording the last edit of the patient's details.
+# Counter changes bump their own table version, not that of patients, so appointment writes
+# leave pages, reports and API responses built only from patient details cached.
+COUNTER_VERSION = 'patient_counters'
+_PATIENT_COUNTERS = """UPDATE patients p LEFT JOIN ({}) a ON a.patient_id = p.id
+                       SET p.total_appointments = COALESCE(a.total, 0),
+                           p.last_appointment = a.last_date,
+                           p.next_scheduled_appointment = a.next_date,
+                           p.updated_at = p.updated_at
+                       WHERE {}"""
+PATIENT_BATCH = 1000    # Patients per counter UPDATE
+
+# False once the tables or columns turned out to be missing (migrations 003, 004 and 010 not run)
+_state = {'available': True, 'patient_counters': True, 'day_totals': True}
+
+
+def available():
+    return _state['available']
+
+
+def patient_counters_available():
+    return _state['patient_counters']
+
+
+def income_sql():
+    """
+    All-time income query - from the day totals, or the whole roll-up until migration 010 has run
+    """
+    return INCOME_SQL if _state['day_totals'] else _ROLLUP_INCOME_SQL
+
+
+def missing_day_totals(e):
+    # Test before missing_table() where DAY_TOTALS is read, so only the day totals are given up.
+    # mysql.connector errors carry errno; aiomysql (PyMySQL) errors carry the code in args[0]
+    errno = getattr(e, 'errno', None) or (e.args[0] if e.args else None)
+    if errno != errorcode.ER_NO_SUCH_TABLE or DAY_TOTALS not in str(e):
+        return False
+    if _state['day_totals']:
+        print(f"{DAY_TOTALS} is missing - run scripts/migrations/010_appointment_day_totals.sql; "
+              f"total income is summed over {TABLE}")
+    _state['day_totals'] = False
+    return True
+
+
+def missing_patient_counters(e):
+    # mysql.connector errors carry errno; aiomysql (PyMySQL) errors carry the code in args[0]
+    errno = getattr(e, 'errno', None) or (e.args[0] if e.args else None)
+    if errno != errorcode.ER_BAD_FIELD_ERROR:
+        return False
+    if _state['patient_counters']:
+        print("Patient appointment counters are missing - run scripts/migrations/004_patient_appointment_counters.sql")
+    _state['patient_counters'] = False
+    return True
+
+
+def missing_table(e):
+    # mysql.connector errors carry errno; aiomysql (PyMySQL) errors carry the code in args[0]
+    errno = getattr(e, 'errno', None) or (e.args[0] if e.args else None)
+    if errno != errorcode.ER_NO_SUCH_TABLE:
+        return False
+    if _state['available']:
+        print(f"{TABLE} is missing - run scripts/migrations/003_appointment_rollup.sql; "
+              f"dashboard and revenue figures fall back to the appointments table")
+    _state['available'] = False
+    return True
+
+
+def _day_range(first_day, last_day):
+    start = datetime.combine(first_day, datetime.min.time())
+    return start, datetime.combine(last_day, datetime.min.time()) + timedelta(days=1)
+
+
+def _load(cursor, where, params, lock, archived=False):
+    query = f"SELECT appointment_date, doctor_id, status, fee, patient_id FROM {{}} WHERE {where}" + (
+        " FOR UPDATE" if lock else "")
+    if archived and archive.horizon(cursor) is not None:
+        cursor.execute(f"({query.format(archive.HOT)}) UNION ALL ({query.format(archive.ARCHIVE)})",
+                       tuple(params) * 2)
+    else:
+        cursor.execute(query.format(archive.HOT), tuple(params))
+    return [tuple(row) for row in cursor.fetchall()]
+
+
+def _patient_counter_source(cursor, where):
+    """
+    Per-patient totals over a patient_id predicate, including archived appointments
+    Returns: (SQL, number of times the predicate's parameters appear in it)
+    """
+    if archive.horizon(cursor) is None:
+        return _PATIENT_TOTALS.format(archive.HOT, where), 1
+    return (f"""SELECT patient_id, SUM(total) AS total, MAX(last_date) AS last_date, MIN(next_date) AS next_date
+                FROM ({_PATIENT_TOTALS.format(archive.HOT, where)}
+                      UNION ALL {_PATIENT_TOTALS.format(archive.ARCHIVE, where)}) AS combined
+                GROUP BY patient_id""", 2)
+
+
+def refresh_patients(cursor, patient_ids):
+    """
+    Recompute the stored appointment counters of some patients (call before commit)
+    """
+    patient_ids = sorted(set(patient_ids))   # Lock patient rows in id order, like concurrent writers
+    if not _state['patient_counters'] or not patient_ids:
+        return
+    for start in range(0, len(patient_ids), PATIENT_BATCH):
+        batch = tuple(patient_ids[start:start + PATIENT_BATCH])
+        marks = ', '.join(['%s'] * len(batch))
+        source, copies = _patient_counter_source(cursor, f"patient_id IN ({marks})")
+        try:
+            cursor.execute(_PATIENT_COUNTERS.format(source, f"p.id IN ({marks})"), batch * (copies + 1))
+        except Error as e:
+            if not missing_patient_counters(e):
+                raise
+            return
+    touch_tables(cursor, COUNTER_VERSION)
+
+
+def apply(cursor, removed=(), added=()):
+    """
+    Move appointments out of and into the roll-up and refresh their patients' counters
+    Args: cursor: Cursor inside the transaction that wrote the appointments,
+          removed, added: (appointment_date, doctor_id, status, fee, patient_id) tuples
+    """
+    _apply_daily(cursor, removed, added)
+    refresh_patients(cursor, [row[4] for rows in (removed, added) for row in rows])
+
+
+def _apply_daily(cursor, removed, added):
+    if not _state['available']:
+        return
+    deltas = defaultdict(lambda: [0, Decimal('0.00')])
+    for rows, sign in ((removed, -1), (added, 1)):
+        for appointment_date, doctor_id, status, fee, _ in rows:
+            if status is None:
+                continue
+            delta = deltas[(appointment_date.date(), doctor_id, status)]
+            delta[0] += sign
+            delta[1] += sign * Decimal(fee or 0)
+    day_deltas = defaultdict(lambda: [0, Decimal('0.00')])
+    # Sorted so concurrent writers lock roll-up rows in the same order
+    for (day, doctor_id, status), (count, fee) in sorted(deltas.items()):
+        if count or fee:
+            try:
+                cursor.execute(_UPSERT, (day, doctor_id, status, count, fee, count, fee))
+            except Error as e:
+                if not missing_table(e):
+                    raise
+                return
+            day_deltas[day][0] += count
+            day_deltas[day][1] += fee
+    if not _state['day_totals']:
+        return
+    for day, (count, fee) in sorted(day_deltas.items()):
+        if count or fee:
+            try:
+                cursor.execute(_DAY_TOTAL_UPSERT, (day, count, fee, count, fee))
+            except Error as e:
+                if not missing_day_totals(e):
+                    raise
+                return
+
+
+class Change:
+    """
+    Appointments about to be updated or deleted. The rows are read (and
+    locked) before the write; apply() re-reads them after it, moves the
+    difference into the roll-up and refreshes the counters of every patient
+    involved before or after. Run both inside the write's transaction.
+
+    Usage:
+        change = rollups.Change(cursor, "id = %s", (appointment_id,))
+        cursor.execute("UPDATE appointments SET ... WHERE id = %s", ...)
+        change.apply()
+        connection.commit()
+    """
+
+    def __init__(self, cursor, where, params=(), archived=False):
+        """
+        Args: cursor: Open cursor, where (str): Predicate on appointments selecting the rows
+              the write touches (e.g. "patient_id = %s" before a cascading delete), params: Its parameters,
+              archived (bool): The write also reaches archived appointments (cascading deletes)
+        """
+        self.cursor = cursor
+        self.where = where
+        self.params = tuple(params)
+        self.archived = archived
+        self.tracking = _state['available'] or _state['patient_counters']
+        self.before = _load(cursor, where, self.params, lock=True, archived=archived) if self.tracking else []
+
+    def apply(self):
+        if self.tracking:
+            apply(self.cursor, removed=self.before,
+                  added=_load(self.cursor, self.where, self.params, lock=False, archived=self.archived))
+
+
+def record_insert(cursor, appointment_id):
+    """
+    Add a newly inserted appointment to the roll-up (call before commit)
+    """
+    if _state['available'] or _state['patient_counters']:
+        apply(cursor, added=_load(cursor, "id = %s", (appointment_id,), lock=False))
+
+
+def summary(cursor, first_day, last_day, group='day', doctor_id=None):
+    """
+    Appointment counts and fees over a date range, grouped by day, doctor or status
+    Args: first_day, last_day (date): Inclusive range, group (str): Key of SUMMARY_GROUPS,
+          doctor_id (int): Only this doctor's appointments
+    Returns: list of dicts {key, appointments, scheduled, completed, cancelled, fees, completed_fees}
+    """
+    key = SUMMARY_GROUPS[group]
+    where, params = ["r.day BETWEEN %s AND %s"], [first_day, last_day]
+    if doctor_id is not None:
+        where.append("r.doctor_id = %s")
+        params.append(doctor_id)
+    cursor.execute(f"""SELECT {key} AS bucket, SUM(r.appointments),
+                              SUM(CASE WHEN r.status = 'Scheduled' THEN r.appointments ELSE 0 END),
+                              SUM(CASE WHEN r.status = 'Completed' THEN r.appointments ELSE 0 END),
+                              SUM(CASE WHEN r.status = 'Cancelled' THEN r.appointments ELSE 0 END),
+                              SUM(r.fee_total),
+                              SUM(CASE WHEN r.status = 'Completed' THEN r.fee_total ELSE 0 END)
+                       FROM {TABLE} r WHERE {' AND '.join(where)}
+                       GROUP BY bucket HAVING SUM(r.appointments) <> 0 ORDER BY bucket""", tuple(params))
+    return [{'key': row[0], 'appointments': int(row[1]), 'scheduled': int(row[2]), 'completed': int(row[3]),
+             'cancelled': int(row[4]), 'fees': row[5], 'completed_fees': row[6]} for row in cursor.fetchall()]
+
+
+def appointment_extent(cursor):
+    """
+    First and last day covered by appointments (archived ones included) or the roll-up
+    Returns: (first_day, last_day), or (None, None) if all are empty
+    """
+    days = []
+    # One query per table: MIN/MAX are then read from idx_appointment_date instead of a scan
+    for table in (archive.HOT, archive.ARCHIVE) if archive.horizon(cursor) is not None else (archive.HOT,):
+        cursor.execute(f"SELECT MIN(appointment_date), MAX(appointment_date) FROM {table}")
+        days.extend(value.date() for value in cursor.fetchone() if value is not None)
+    cursor.execute(f"SELECT MIN(day), MAX(day) FROM {TABLE}")
+    days.extend(value for value in cursor.fetchone() if value is not None)
+    return (min(days), max(days)) if days else (None, None)
+
+
+def rebuild(connection, first_day, last_day, chunk_days=31, progress=None):
+    """
+    Recompute the roll-up and its day totals for a date range from the
+    appointments table, one transaction per chunk of days. Safe while the application runs: the
+    INSERT ... SELECT locks the appointments it reads, so concurrent writes
+    wait for the chunk and then apply their change on top of it.
+    Args: connection: Open connection, first_day, last_day (date): Inclusive range,
+          chunk_days (int): Days per transaction, progress (callable): progress(last day done, rows)
+    Returns: int: Roll-up rows written
+    """
+    written = 0
+    cursor = connection.cursor()
+    try:
+        day = first_day
+        while day <= last_day:
+            end = min(day + timedelta(days=chunk_days - 1), last_day)
+            start, stop = _day_range(day, end)
+            if not connection.in_transaction:
+                connection.start_transaction()
+            cursor.execute(f"DELETE FROM {TABLE} WHERE day BETWEEN %s AND %s", (day, end))
+            cursor.execute(f"""INSERT INTO {TABLE} (day, doctor_id, status, appointments, fee_total)
+                               SELECT DATE(appointment_date), doctor_id, status, COUNT(*), COALESCE(SUM(fee), 0)
+                               FROM {archive.source(cursor, day)} AS a
+                               WHERE appointment_date >= %s AND appointment_date < %s AND status IS NOT NULL
+                               GROUP BY DATE(appointment_date), doctor_id, status""", (start, stop))
+            written += max(cursor.rowcount, 0)
+            if _state['day_totals']:
+                try:
+                    cursor.execute(f"DELETE FROM {DAY_TOTALS} WHERE day BETWEEN %s AND %s", (day, end))
+                    cursor.execute(f"""INSERT INTO {DAY_TOTALS} (day, appointments, fee_total)
+                                       SELECT day, SUM(appointments), SUM(fee_total) FROM {TABLE}
+                                       WHERE day BETWEEN %s AND %s GROUP BY day""", (day, end))
+                except Error as e:
+                    if not missing_day_totals(e):
+                        raise
+            connection.commit()
+            if progress:
+                progress(end, written)
+            day = end + timedelta(days=1)
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+    return written
+
+
+def check(cursor, first_day, last_day):
+    """
+    Compare the roll-up with the appointments table over a date range
+    Returns: list of (day, doctor_id, status, actual count, actual fees, roll-up count, roll-up fees)
+             for every group that disagrees
+    """
+    start, stop = _day_range(first_day, last_day)
+    cursor.execute(f"""SELECT day, doctor_id, status, SUM(actual_count), SUM(actual_fees),
+                              SUM(rollup_count), SUM(rollup_fees)
+                       FROM (SELECT DATE(appointment_date) AS day, doctor_id, status,
+                                    COUNT(*) AS actual_count, COALESCE(SUM(fee), 0) AS actual_fees,
+                                    0 AS rollup_count, 0 AS rollup_fees
+                             FROM {archive.source(cursor, first_day)} AS a
+                             WHERE appointment_date >= %s AND appointment_date < %s AND status IS NOT NULL
+                             GROUP BY DATE(appointment_date), doctor_id, status
+                             UNION ALL
+                             SELECT day, doctor_id, status, 0, 0, appointments, fee_total
+                             FROM {TABLE} WHERE day BETWEEN %s AND %s) AS combined
+                       GROUP BY day, doctor_id, status
+                       HAVING SUM(actual_count) <> SUM(rollup_count) OR SUM(actual_fees) <> SUM(rollup_fees)
+                       ORDER BY day, doctor_id, status""", (start, stop, first_day, last_day))
+    return [tuple(row) for row in cursor.fetchall()]
+
+
+def check_day_totals(cursor, first_day, last_day):
+    """
+    Compare the day totals with the roll-up they sum over a date range
+    Returns: list of (day, roll-up count, roll-up fees, stored count, stored fees) for every day that
+             disagrees; empty when migration 010 has not run
+    """
+    if not _state['day_totals']:
+        return []
+    try:
+        cursor.execute(f"""SELECT day, SUM(rollup_count), SUM(rollup_fees), SUM(total_count), SUM(total_fees)
+                           FROM (SELECT day, SUM(appointments) AS rollup_count, SUM(fee_total) AS rollup_fees,
+                                        0 AS total_count, 0 AS total_fees
+                                 FROM {TABLE} WHERE day BETWEEN %s AND %s GROUP BY day
+                                 UNION ALL
+                                 SELECT day, 0, 0, appointments, fee_total
+                                 FROM {DAY_TOTALS} WHERE day BETWEEN %s AND %s) AS combined
+                           GROUP BY day
+                           HAVING SUM(rollup_count) <> SUM(total_count) OR SUM(rollup_fees) <> SUM(total_fees)
+                           ORDER BY day""", (first_day, last_day, first_day, last_day))
+    except Error as e:
+        if not missing_day_totals(e):
+            raise
+        return []
+    return [tuple(row) for row in cursor.fetchall()]
+
+
+def patient_extent(cursor):
+    """
+    Returns: (lowest, highest) patient id, or (None, None) if there are no patients
+    """
+    cursor.execute("SELECT MIN(id), MAX(id) FROM patients")
+    return tuple(cursor.fetchone())
+
+
+def rebuild_patient_counters(connection, first_id, last_id, chunk_ids=5000, progress=None):
+    """
+    Recompute the stored appointment counters of a range of patient ids, one
+    transaction per chunk. The GROUP BY locks the appointments it reads, so
+    concurrent appointment writes wait for the chunk and refresh afterwards.
+    Args: connection: Open connection, first_id, last_id (int): Inclusive id range,
+          chunk_ids (int): Ids per transaction, progress (callable): progress(last id done, rows changed)
+    Returns: int: Patients whose counters changed
+    """
+    changed = 0
+    cursor = connection.cursor()
+    try:
+        start = first_id
+        while start <= last_id:
+            end = min(start + chunk_ids - 1, last_id)
+            source, copies = _patient_counter_source(cursor, "patient_id BETWEEN %s AND %s")
+            if not connection.in_transaction:
+                connection.start_transaction()
+            cursor.execute(_PATIENT_COUNTERS.format(source, "p.id BETWEEN %s AND %s"), (start, end) * (copies + 1))
+            changed += max(cursor.rowcount, 0)
+            touch_tables(cursor, COUNTER_VERSION)
+            connection.commit()
+            if progress:
+                progress(end, changed)
+            start = end + 1
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+    return changed
+
+
+def check_patient_counters(cursor, first_id, last_id, chunk_ids=50000):
+    """
+    Compare the stored patient counters with the appointments table
+    Returns: list of (patient_id, stored (total, last, next), actual (total, last, next))
+             for every patient that disagrees
+    """
+    mismatches = []
+    start = first_id
+    while start <= last_id:
+        end = min(start + chunk_ids - 1, last_id)
+        source, copies = _patient_counter_source(cursor, "patient_id BETWEEN %s AND %s")
+        cursor.execute(f"""SELECT p.id, p.total_appointments, p.last_appointment, p.next_scheduled_appointment,
+                                  COALESCE(a.total, 0), a.last_date, a.next_date
+                           FROM patients p LEFT JOIN ({source}) a ON a.patient_id = p.id
+                           WHERE p.id BETWEEN %s AND %s
+                             AND NOT (p.total_appointments <=> COALESCE(a.total, 0)
+                                      AND p.last_appointment <=> a.last_date
+                                      AND p.next_scheduled_appointment <=> a.next_date)
+                           ORDER BY p.id""", (start, end) * (copies + 1))
+        mismatches.extend((row[0], tuple(row[1:4]), tuple(row[4:7])) for row in cursor.fetchall())
+        start = end + 1
+    return mismatches
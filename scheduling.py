@@ -0,0 +1,190 @@
+"""
+Hospital Management System - Appointment Scheduling Engine
+Author: HMS Development Team
+Description: Per-doctor interval index over scheduled appointments.
+Detects double bookings and lists free slots with O(log n) lookups per doctor.
+"""
+
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+
+
+class DoctorSchedule:
+    """
+    Sorted start times of one doctor's scheduled appointments.
+    Every visit lasts the same duration, so two visits overlap exactly when
+    their start times are less than one duration apart.
+    """
+
+    __slots__ = ('starts', 'ids', 'loaded_at')
+
+    def __init__(self, rows=()):
+        pairs = sorted((start, appointment_id) for appointment_id, start in rows)
+        self.starts = [start for start, _ in pairs]
+        self.ids = [appointment_id for _, appointment_id in pairs]
+        self.loaded_at = time.monotonic()
+
+    def add(self, appointment_id, start):
+        index = bisect_right(self.starts, start)
+        self.starts.insert(index, start)
+        self.ids.insert(index, appointment_id)
+
+    def remove(self, appointment_id, start):
+        index = bisect_left(self.starts, start)
+        while index < len(self.starts) and self.starts[index] == start:
+            if self.ids[index] == appointment_id:
+                del self.starts[index]
+                del self.ids[index]
+                return
+            index += 1
+
+    def overlapping(self, start, duration, exclude_id=None):
+        """
+        Appointment ids whose visit overlaps [start, start + duration)
+        """
+        index = bisect_right(self.starts, start - duration)
+        end = start + duration
+        found = []
+        while index < len(self.starts) and self.starts[index] < end:
+            if self.ids[index] != exclude_id:
+                found.append(self.ids[index])
+            index += 1
+        return found
+
+
+class SchedulingEngine:
+    """
+    Availability and conflict checks for all doctors.
+
+    A doctor's scheduled appointments are loaded on first use through
+    loader(cursor, doctor_id) and kept in a DoctorSchedule. Writes in this
+    process update it via add()/discard(); schedules older than
+    `refresh_interval` seconds are reloaded to pick up other processes' writes.
+    Until then another process may have booked a slot shown as free, so a
+    booking re-checks the database inside its transaction; conflicts() is the
+    fast pre-check that rejects most clashes without a locking read.
+    """
+
+    def __init__(self, loader, visit_minutes=30, day_start='09:00', day_end='17:00', refresh_interval=60):
+        """
+        Args:
+            loader (callable): loader(cursor, doctor_id) -> iterable of (appointment_id, start)
+            visit_minutes (int): Length of one visit
+            day_start (str), day_end (str): Bookable hours as HH:MM
+            refresh_interval (float): Seconds before a loaded schedule is reloaded
+        """
+        self.loader = loader
+        self.duration = timedelta(minutes=visit_minutes)
+        self.day_start = datetime.strptime(day_start, '%H:%M').time()
+        self.day_end = datetime.strptime(day_end, '%H:%M').time()
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._schedules = {}
+        self._appointments = {}   # appointment_id -> (doctor_id, start) for loaded doctors
+        self._doctor_locks = {}
+
+    def lock(self, doctor_id):
+        """
+        Lock to hold while checking and booking a doctor's slot, so two requests
+        in this process cannot book the same slot at once
+        """
+        with self._lock:
+            return self._doctor_locks.setdefault(int(doctor_id), threading.Lock())
+
+    def _schedule(self, cursor, doctor_id):
+        doctor_id = int(doctor_id)
+        with self._lock:
+            schedule = self._schedules.get(doctor_id)
+            if schedule is not None and time.monotonic() - schedule.loaded_at <= self.refresh_interval:
+                return schedule
+
+        rows = list(self.loader(cursor, doctor_id))
+        schedule = DoctorSchedule(rows)
+        with self._lock:
+            old = self._schedules.get(doctor_id)
+            if old is not None:
+                for appointment_id in old.ids:
+                    self._appointments.pop(appointment_id, None)
+            self._schedules[doctor_id] = schedule
+            for appointment_id, start in rows:
+                self._appointments[appointment_id] = (doctor_id, start)
+        return schedule
+
+    def conflicts(self, cursor, doctor_id, start, exclude_id=None):
+        """
+        Scheduled appointments of the doctor that overlap a visit starting at start
+        Args:
+            cursor: Open database cursor (used only if the schedule must be loaded)
+            doctor_id (int): Doctor to check
+            start (datetime): Proposed visit start
+            exclude_id (int): Appointment being edited, ignored in the check
+        Returns: list of conflicting appointment ids
+        """
+        schedule = self._schedule(cursor, doctor_id)
+        with self._lock:
+            return schedule.overlapping(start, self.duration, exclude_id)
+
+    def free_slots(self, cursor, doctor_id, first_day, last_day, exclude_id=None, now=None):
+        """
+        Bookable visit start times for a doctor between two dates (inclusive)
+        Slots already past, or overlapping a scheduled visit other than exclude_id, are left out
+        Returns: dict of date -> list of datetimes
+        """
+        schedule = self._schedule(cursor, doctor_id)
+        now = now or datetime.now()
+        slots = {}
+        day = first_day
+        with self._lock:
+            while day <= last_day:
+                free = []
+                slot = datetime.combine(day, self.day_start)
+                closing = datetime.combine(day, self.day_end)
+                while slot + self.duration <= closing:
+                    if slot >= now and not schedule.overlapping(slot, self.duration, exclude_id):
+                        free.append(slot)
+                    slot += self.duration
+                slots[day] = free
+                day += timedelta(days=1)
+        return slots
+
+    def add(self, doctor_id, appointment_id, start):
+        """
+        Record a newly scheduled appointment
+        """
+        doctor_id = int(doctor_id)
+        with self._lock:
+            schedule = self._schedules.get(doctor_id)
+            if schedule is None:
+                return  # Loaded from the database on first use
+            self._remove(appointment_id)
+            schedule.add(appointment_id, start)
+            self._appointments[appointment_id] = (doctor_id, start)
+
+    def discard(self, appointment_id):
+        """
+        Forget an appointment that was completed, cancelled, moved or deleted
+        """
+        with self._lock:
+            self._remove(appointment_id)
+
+    def _remove(self, appointment_id):
+        entry = self._appointments.pop(appointment_id, None)
+        if entry is not None:
+            doctor_id, start = entry
+            schedule = self._schedules.get(doctor_id)
+            if schedule is not None:
+                schedule.remove(appointment_id, start)
+
+    def forget(self, doctor_id=None):
+        """
+        Drop a doctor's loaded schedule (or every schedule) so it is reloaded
+        """
+        with self._lock:
+            doctors = [int(doctor_id)] if doctor_id is not None else list(self._schedules)
+            for doctor in doctors:
+                schedule = self._schedules.pop(doctor, None)
+                if schedule is not None:
+                    for appointment_id in schedule.ids:
+                        self._appointments.pop(appointment_id, None)
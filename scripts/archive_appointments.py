@@ -0,0 +1,190 @@
+"""
+Hospital Management System - Appointment Archival
+Author: HMS Development Team
+Description: Moves appointments older than the retention window from the
+appointments table to appointments_archive (migration 006), a chunk of rows
+per transaction, so it can run while the application is serving. The new
+archive horizon is published in archive_state first; the job then waits
+longer than archive.HORIZON_TTL so every process reads both tables for those
+months before any row leaves appointments. The horizon only moves forward.
+Roll-ups and patient counters are not touched: they count both tables, and
+each chunk bumps the appointments table version, which drops cached pages.
+--verify runs the checks of scripts/rebuild_rollups.py --check over the
+archived days before and after moving, and fails if moving introduced drift.
+
+Run it nightly, e.g. from cron:
+    30 2 * * * cd /srv/hms && python scripts/archive_appointments.py
+
+Usage: python scripts/archive_appointments.py
+       python scripts/archive_appointments.py --dry-run
+       python scripts/archive_appointments.py --retention-months 24 --chunk-rows 2000
+       python scripts/archive_appointments.py --verify --settle 0   # First run on a quiet database
+"""
+
+import argparse
+import os
+import sys
+import time
+from datetime import date, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import mysql.connector  # noqa: E402
+
+import archive  # noqa: E402
+import rollups  # noqa: E402
+from app import ARCHIVE_CONFIG, DB_CONFIG  # noqa: E402
+from dal import touch_tables  # noqa: E402
+
+# The new value is passed twice rather than read back with VALUES(), which is deprecated
+# (warning 1287) and DB_CONFIG raises on warnings
+PUBLISH_SQL = f"""INSERT INTO archive_state (table_name, archived_before) VALUES ('{archive.HOT}', %s)
+                  ON DUPLICATE KEY UPDATE archived_before = GREATEST(archived_before, %s)"""
+
+
+def cutoff(today, retention_months):
+    """
+    First day of the month `retention_months` before the current one - the new horizon
+    """
+    months = today.year * 12 + today.month - 1 - retention_months
+    return date(months // 12, months % 12 + 1, 1)
+
+
+def read_horizon(cursor):
+    cursor.execute(archive.HORIZON_SQL)
+    rows = cursor.fetchall()
+    return rows[0][0] if rows else None
+
+
+def verify(connection, last_day):
+    """
+    Roll-up groups up to last_day and patients whose counters disagree with the appointments
+    (both tables), as scripts/rebuild_rollups.py --check reports them
+    Returns: set of ('day', day, doctor_id, status) and ('patient', patient_id)
+    """
+    cursor = connection.cursor()
+    try:
+        archive.remember_horizon(read_horizon(cursor))  # The horizon just published, not a cached one
+        found = set()
+        try:
+            first_day, _ = rollups.appointment_extent(cursor)
+            if first_day is not None and first_day <= last_day:
+                found.update(('day',) + tuple(row[:3]) for row in rollups.check(cursor, first_day, last_day))
+        except mysql.connector.Error as e:
+            if not rollups.missing_table(e):
+                raise
+        try:
+            first_id, last_id = rollups.patient_extent(cursor)
+            if first_id is not None:
+                found.update(('patient', row[0]) for row in rollups.check_patient_counters(cursor, first_id, last_id))
+        except mysql.connector.Error as e:
+            if not rollups.missing_patient_counters(e):
+                raise
+        return found
+    finally:
+        cursor.close()
+
+
+def move_chunk(connection, before, chunk_rows):
+    """
+    Move up to chunk_rows appointments dated before `before` in one transaction
+    Returns: int: Rows moved (0 when none are left)
+    """
+    cursor = connection.cursor()
+    try:
+        connection.start_transaction()
+        cursor.execute(f"""SELECT id FROM {archive.HOT} WHERE appointment_date < %s
+                           ORDER BY id LIMIT %s FOR UPDATE""", (before, chunk_rows))
+        ids = [row[0] for row in cursor.fetchall()]
+        if not ids:
+            connection.rollback()
+            return 0
+        placeholders = ', '.join(['%s'] * len(ids))
+        cursor.execute(f"""INSERT INTO {archive.ARCHIVE} ({archive.COLUMN_SQL})
+                           SELECT {archive.COLUMN_SQL} FROM {archive.HOT} WHERE id IN ({placeholders})""", ids)
+        cursor.execute(f"DELETE FROM {archive.HOT} WHERE id IN ({placeholders})", ids)
+        touch_tables(cursor, archive.HOT)
+        connection.commit()
+        return len(ids)
+    except mysql.connector.Error:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Move old appointments to appointments_archive')
+    parser.add_argument('--retention-months', type=int, default=ARCHIVE_CONFIG['retention_months'],
+                        help='Whole months kept in appointments besides the current one')
+    parser.add_argument('--chunk-rows', type=int, default=ARCHIVE_CONFIG['chunk_rows'],
+                        help='Appointments moved per transaction')
+    parser.add_argument('--settle', type=float, default=2 * archive.HORIZON_TTL + 10,
+                        help='Seconds to wait after moving the horizon before moving rows')
+    parser.add_argument('--dry-run', action='store_true', help='Only report what would be archived')
+    parser.add_argument('--verify', action='store_true',
+                        help='Check roll-ups and patient counters before and after moving (exit 1 on new drift)')
+    args = parser.parse_args(argv)
+    if args.retention_months < 0 or args.chunk_rows < 1:
+        print('--retention-months must be >= 0 and --chunk-rows >= 1', file=sys.stderr)
+        return 2
+
+    connection = mysql.connector.connect(**DB_CONFIG)
+    try:
+        cursor = connection.cursor()
+        try:
+            try:
+                current = read_horizon(cursor)
+            except mysql.connector.Error as e:
+                if archive.missing_table(e):
+                    return 2
+                raise
+            before = cutoff(date.today(), args.retention_months)
+            if current is not None and current > before:
+                before = current  # Never pull months back out of the archive
+            cursor.execute(f"SELECT COUNT(*) FROM {archive.HOT} WHERE appointment_date < %s", (before,))
+            pending = cursor.fetchall()[0][0]
+            print(f'Horizon {current or "not set"} -> {before}: {pending:,} appointments to archive')
+        finally:
+            cursor.close()
+
+        last_day = before - timedelta(days=1)
+        baseline = verify(connection, last_day) if args.verify else set()
+        if args.verify:
+            print(f'Before archiving: {len(baseline):,} roll-up groups and patients disagree with appointments')
+        if args.dry_run or (pending == 0 and current == before):
+            return 0
+
+        cursor = connection.cursor()
+        try:
+            if current != before:
+                cursor.execute(PUBLISH_SQL, (before, before))
+                connection.commit()
+                print(f'Published horizon {before}; waiting {args.settle:.0f}s for every process to pick it up')
+                time.sleep(args.settle)
+        finally:
+            cursor.close()
+
+        moved = 0
+        started = time.perf_counter()
+        while True:
+            rows = move_chunk(connection, before, args.chunk_rows)
+            if not rows:
+                break
+            moved += rows
+            print(f'  {moved:,} moved')
+        print(f'Done: {moved:,} appointments archived in {time.perf_counter() - started:.1f}s')
+        if args.verify:
+            drift = sorted(verify(connection, last_day) - baseline, key=str)
+            for mismatch in drift[:50]:
+                print(f'  new mismatch: {mismatch}')
+            print(f'After archiving: {len(drift):,} new mismatches')
+            return 1 if drift else 0
+        return 0
+    finally:
+        connection.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,170 @@
+"""
+Hospital Management System - Analytics Benchmark
+Author: HMS Development Team
+Description: Times analytics.summarise() on a synthetic snapshot of millions
+of appointments (doctor, specialization and month group-bys, a single
+specialization, a single doctor) next to the same totals accumulated row by
+row in Python. With --live it also times loading the snapshot from the
+database and the equivalent GROUP BY queries against the appointments table.
+
+Usage: python scripts/benchmark_analytics.py [row_count ...]
+       python scripts/benchmark_analytics.py --live 5000000
+"""
+
+import argparse
+import os
+import sys
+import time
+from datetime import date, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np  # noqa: E402
+
+import analytics  # noqa: E402
+
+SPECIALIZATIONS = ['Cardiology', 'Dermatology', 'Emergency Medicine', 'Endocrinology', 'Gastroenterology',
+                   'General Practice', 'Neurology', 'Oncology', 'Orthopedics', 'Pediatrics', 'Psychiatry',
+                   'Radiology']
+LAST_DAY = date(2025, 12, 31)
+
+
+def synthetic_snapshot(count, doctors=500, days=730, seed=42):
+    """
+    Snapshot shaped like generate_data.py output: skewed doctor popularity,
+    mostly completed past visits, fees from the doctor's fee
+    """
+    rng = np.random.default_rng(seed)
+    doctor_rows = [(i, f'Dr. Doctor {i}', SPECIALIZATIONS[i % len(SPECIALIZATIONS)]) for i in range(1, doctors + 1)]
+    popularity = 1 / (np.arange(doctors) + 10)
+    doctor_id = rng.choice(np.arange(1, doctors + 1), size=count, p=popularity / popularity.sum())
+    last = (LAST_DAY - analytics.EPOCH).days
+    day = rng.integers(last - days + 1, last + 1, size=count)
+    doctor_fee = rng.choice([10000, 15000, 17500, 20000, 25000], size=doctors + 1)
+    fee = doctor_fee[doctor_id]
+    status = rng.choice([analytics.SCHEDULED, analytics.COMPLETED, analytics.CANCELLED], size=count,
+                        p=[0.1, 0.75, 0.15])
+    return analytics.Snapshot(doctor_rows, doctor_id, day, fee, status)
+
+
+def python_totals(snapshot, first_day, last_day):
+    """
+    The same per-doctor, per-specialization and per-month totals with dicts, row by row
+    """
+    first, last = (first_day - analytics.EPOCH).days, (last_day - analytics.EPOCH).days
+    specialization = snapshot.doctor_specialization.tolist()
+    by_doctor, by_specialization, by_month = {}, {}, {}
+    for doctor, day, fee, status in zip(snapshot.doctor.tolist(), snapshot.day.tolist(),
+                                        snapshot.fee.tolist(), snapshot.status.tolist()):
+        if not first <= day <= last:
+            continue
+        month = (analytics.EPOCH + timedelta(days=day)).strftime('%Y-%m')
+        for totals, key in ((by_doctor, doctor), (by_specialization, specialization[doctor]), (by_month, month)):
+            entry = totals.get(key)
+            if entry is None:
+                entry = totals[key] = [0, 0, 0, 0]
+            entry[0] += 1
+            if status == analytics.COMPLETED:
+                entry[1] += 1
+                entry[3] += fee
+            elif status == analytics.CANCELLED:
+                entry[2] += 1
+    return by_doctor, by_specialization, by_month
+
+
+def best_of(function, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def offline(count):
+    started = time.perf_counter()
+    snapshot = synthetic_snapshot(count)
+    print(f'{count:,} appointments: snapshot built in {time.perf_counter() - started:.2f}s, '
+          f'{snapshot.nbytes / 1e6:.0f} MB')
+    year = (LAST_DAY - timedelta(days=364), LAST_DAY)
+    cases = [
+        ('all doctors, by month, 1 year', dict(bucket='month')),
+        ('all doctors, by week, 1 year', dict(bucket='week')),
+        ('one specialization, by day', dict(bucket='day', specialization='Cardiology')),
+        ('one doctor, by month', dict(bucket='month', doctor_id=1)),
+    ]
+    for label, options in cases:
+        seconds = best_of(lambda: analytics.summarise(snapshot, *year, **options))
+        print(f'  summarise {label:<32} {seconds * 1000:>9.1f} ms')
+
+    sample = min(count, 1000000)
+    sampled = synthetic_snapshot(sample)
+    seconds = best_of(lambda: python_totals(sampled, *year), repeat=1) * count / sample
+    print(f'  {"Python row loop (same totals)":<42} {seconds * 1000:>9.1f} ms'
+          + (f'  (measured on {sample:,} rows, scaled)' if sample < count else ''))
+
+
+def live(chunk_rows):
+    import mysql.connector
+    from app import DB_CONFIG
+
+    connection = mysql.connector.connect(**DB_CONFIG)
+    try:
+        started = time.perf_counter()
+        snapshot = analytics.load_snapshot(connection, chunk_rows)
+        print(f'Snapshot load: {len(snapshot):,} appointments in {time.perf_counter() - started:.2f}s, '
+              f'{snapshot.nbytes / 1e6:.0f} MB')
+        if not len(snapshot):
+            print('No appointments - generate data first (scripts/generate_data.py)')
+            return
+        last_day = analytics.EPOCH + timedelta(days=int(snapshot.day.max()))
+        first_day = last_day - timedelta(days=364)
+        seconds = best_of(lambda: analytics.summarise(snapshot, first_day, last_day))
+        print(f'summarise, 1 year by month: {seconds * 1000:.1f} ms')
+
+        cursor = connection.cursor()
+        queries = [
+            ('by doctor', """SELECT doctor_id, COUNT(*), SUM(status = 'Completed'), SUM(status = 'Cancelled'),
+                                    SUM(CASE WHEN status = 'Completed' THEN fee ELSE 0 END)
+                             FROM appointments WHERE appointment_date >= %s AND appointment_date < %s
+                             GROUP BY doctor_id"""),
+            ('by specialization', """SELECT d.specialization, COUNT(*), SUM(a.status = 'Cancelled'),
+                                            SUM(CASE WHEN a.status = 'Completed' THEN a.fee ELSE 0 END)
+                                     FROM appointments a JOIN doctors d ON a.doctor_id = d.id
+                                     WHERE a.appointment_date >= %s AND a.appointment_date < %s
+                                     GROUP BY d.specialization"""),
+            ('by month', """SELECT DATE_FORMAT(appointment_date, '%Y-%m'), COUNT(*), SUM(status = 'Cancelled'),
+                                   SUM(CASE WHEN status = 'Completed' THEN fee ELSE 0 END)
+                            FROM appointments WHERE appointment_date >= %s AND appointment_date < %s
+                            GROUP BY 1"""),
+        ]
+        total = 0
+        for label, query in queries:
+            started = time.perf_counter()
+            cursor.execute(query, (first_day, last_day + timedelta(days=1)))
+            cursor.fetchall()
+            seconds = time.perf_counter() - started
+            total += seconds
+            print(f'SQL GROUP BY {label:<18} {seconds * 1000:>9.1f} ms')
+        print(f'SQL total {total * 1000:.1f} ms, every time the page is viewed')
+        cursor.close()
+    finally:
+        connection.close()
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Vectorised analytics versus row-by-row and SQL group-bys')
+    parser.add_argument('rows', nargs='*', type=int, default=[1000000, 5000000])
+    parser.add_argument('--live', action='store_true', help='Also measure against the database in DB_CONFIG')
+    parser.add_argument('--chunk-rows', type=int, default=100000)
+    args = parser.parse_args(argv)
+    for count in args.rows:
+        offline(count)
+        print()
+    if args.live:
+        live(args.chunk_rows)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,66 @@
+"""
+Hospital Management System - Page Weight Benchmark
+Author: HMS Development Team
+Description: Measures the bytes transferred for a page load - the HTML and
+every stylesheet and script it references - without compression and with
+each content coding the application offers, on a first visit and on a
+repeat visit (where fingerprinted assets come from the browser cache and
+only the HTML is fetched again). Runs against the Flask test client, so no
+server is needed; assets still served from the CDN are listed but not counted.
+
+Usage: python scripts/benchmark_assets.py [path]   (default /login)
+"""
+
+import os
+import re
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from app import app  # noqa: E402
+from assets import brotli  # noqa: E402
+
+_REFERENCE = re.compile(r'<(?:link|script)\b[^>]*?(?:href|src)="([^"]+)"')
+
+
+def fetch(client, path, encoding):
+    headers = {'Accept-Encoding': encoding} if encoding else {}
+    response = client.get(path, headers=headers)
+    size = len(response.get_data())
+    cache_control = response.headers.get('Cache-Control', '')
+    response.close()
+    return response.status_code, size, cache_control
+
+
+def main(argv):
+    page = argv[0] if argv else '/login'
+    client = app.test_client()
+    html = client.get(page).get_data(as_text=True)
+    references = _REFERENCE.findall(html)
+    local = [reference for reference in references if reference.startswith('/')]
+    remote = [reference for reference in references if not reference.startswith('/')]
+
+    encodings = [('identity', None), ('gzip', 'gzip')]
+    if brotli is not None:
+        encodings.append(('br', 'br'))
+    print(f'{page}: {len(local)} local asset(s), {len(remote)} from a CDN\n')
+    print(f"{'coding':<10} {'html':>9} {'assets':>9} {'first visit':>12} {'repeat visit':>13}")
+    for label, encoding in encodings:
+        _, html_bytes, _ = fetch(client, page, encoding)
+        asset_bytes = 0
+        for reference in local:
+            status, size, _ = fetch(client, reference, encoding)
+            asset_bytes += size if status == 200 else 0
+        print(f'{label:<10} {html_bytes:>9,} {asset_bytes:>9,} {html_bytes + asset_bytes:>12,} {html_bytes:>13,}')
+
+    print()
+    for reference in local:
+        _, _, cache_control = fetch(client, reference, None)
+        print(f'  {reference}  [{cache_control}]')
+    for reference in remote:
+        print(f'  {reference}  [CDN - run scripts/vendor_assets.py]')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,194 @@
+"""
+Hospital Management System - Audit Log Benchmark
+Author: HMS Development Team
+Description: Measures what the write-behind audit log adds to a write. Offline,
+request threads alternate a simulated write (a sleep, like waiting on the
+database) with AuditLog.record() while the background writer drains into a
+stand-in connection with a fixed INSERT latency; it reports the time record()
+adds to each write, including a run where the writer cannot keep up and
+entries spill to disk. With --live it times a real appointment edit transaction
+against the database three ways: without auditing, with a synchronous audit
+INSERT in the same transaction, and the way the routes do it (row reads plus
+record()). The live run restores the edited appointment and deletes its audit
+entries afterwards.
+
+Usage: python scripts/benchmark_audit.py
+       python scripts/benchmark_audit.py --threads 16 --insert-ms 5
+       python scripts/benchmark_audit.py --live --appointment-id 1 --iterations 2000
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from decimal import Decimal
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import audit  # noqa: E402
+
+USERNAME = 'benchmark-audit'  # Live entries are written under this name and deleted afterwards
+
+
+class SimulatedConnection:
+    """
+    Stands in for the writer's database connection: each batch takes
+    `insert_ms` plus `row_us` per entry
+    """
+
+    def __init__(self, insert_ms, row_us):
+        self.insert_ms = insert_ms
+        self.row_us = row_us
+
+    def cursor(self):
+        return self
+
+    def executemany(self, query, rows):
+        time.sleep(self.insert_ms / 1000 + self.row_us * len(rows) / 1e6)
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def appointment_row(appointment_id, status='Scheduled'):
+    return {'id': appointment_id, 'patient_id': 4711, 'doctor_id': 42, 'appointment_date': datetime(2025, 3, 14, 9, 30),
+            'fee': Decimal('150.00'), 'status': status, 'notes': 'Follow-up', 'created_at': datetime(2025, 3, 1),
+            'updated_at': datetime(2025, 3, 1)}
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    pick = lambda pct: samples[min(len(samples) - 1, int(len(samples) * pct / 100))]  # noqa: E731
+    return pick(50), pick(99), samples[-1]
+
+
+def print_timings(label, samples):
+    p50, p99, worst = percentiles(samples)
+    print(f'  {label:<40} p50 {p50 * 1e6:>8.1f} us   p99 {p99 * 1e6:>8.1f} us   max {worst * 1e3:>7.2f} ms')
+
+
+def offline(threads, per_thread, write_ms, insert_ms, row_us, max_queue, label):
+    spill_path = os.path.join(tempfile.mkdtemp(prefix='hms_audit_bench_'), 'spill.jsonl')
+    log = audit.AuditLog(lambda: SimulatedConnection(insert_ms, row_us), max_queue=max_queue,
+                         flush_interval=0.05, spill_path=spill_path)
+    samples = [[] for _ in range(threads)]
+
+    def worker(index):
+        timings = samples[index]
+        for i in range(per_thread):
+            appointment_id = index * per_thread + i
+            before, after = appointment_row(appointment_id), appointment_row(appointment_id, 'Cancelled')
+            time.sleep(write_ms / 1000)
+            started = time.perf_counter()
+            log.record('cancel', 'appointments', appointment_id, before, after, user_id=1, username='admin',
+                       remote_addr='127.0.0.1')
+            timings.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    workers = [threading.Thread(target=worker, args=(index,)) for index in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    recorded = time.perf_counter() - started
+    log.close(timeout=60)
+    drained = time.perf_counter() - started
+    stats = log.stats()
+
+    print(f'{label}: {threads} threads x {per_thread:,} writes of {write_ms} ms, '
+          f'INSERT {insert_ms} ms + {row_us} us/row, queue {max_queue:,}')
+    print_timings('record()', [seconds for timings in samples for seconds in timings])
+    print(f'  recorded in {recorded:.2f}s, all written after {drained:.2f}s in {stats["batches"]:,} batches; '
+          f'{stats["spilled"]:,} spilled and replayed')
+    print(f'  a synchronous audit INSERT would add {insert_ms + row_us / 1000:.2f} ms to every write')
+
+
+def live(appointment_id, iterations):
+    import mysql.connector
+    from app import DB_CONFIG, audit_row
+
+    connection = mysql.connector.connect(**DB_CONFIG)
+    original = audit_row(connection, 'appointments', appointment_id)
+    if original is None:
+        print(f'Appointment {appointment_id} does not exist - pass --appointment-id')
+        connection.close()
+        return
+    cursor = connection.cursor()
+    try:
+        log = audit.AuditLog(lambda: mysql.connector.connect(**DB_CONFIG))
+        update = "UPDATE appointments SET notes = %s WHERE id = %s"
+
+        def plain(i):
+            connection.start_transaction()
+            cursor.execute(update, (f'benchmark {i}', appointment_id))
+            connection.commit()
+
+        def synchronous(i):
+            connection.start_transaction()
+            before = audit_row(connection, 'appointments', appointment_id)
+            cursor.execute(update, (f'benchmark {i}', appointment_id))
+            after = audit_row(connection, 'appointments', appointment_id)
+            entry = audit.make_entry('update', 'appointments', appointment_id, before, after, username=USERNAME)
+            cursor.execute(audit.INSERT_SQL, entry)
+            connection.commit()
+
+        def write_behind(i):
+            connection.start_transaction()
+            before = audit_row(connection, 'appointments', appointment_id)
+            cursor.execute(update, (f'benchmark {i}', appointment_id))
+            after = audit_row(connection, 'appointments', appointment_id)
+            connection.commit()
+            log.record('update', 'appointments', appointment_id, before, after, username=USERNAME)
+
+        print(f'Appointment edit transaction, {iterations:,} iterations each:')
+        for label, write in (('no audit', plain), ('synchronous audit INSERT', synchronous),
+                             ('write-behind audit (as the routes do)', write_behind)):
+            samples = []
+            for i in range(iterations):
+                started = time.perf_counter()
+                write(i)
+                samples.append(time.perf_counter() - started)
+            print_timings(label, samples)
+        log.close()
+        print(f'  writer: {log.stats()["batches"]} batches for {log.stats()["written"]:,} entries')
+    finally:
+        cursor.execute("UPDATE appointments SET notes = %s WHERE id = %s", (original['notes'], appointment_id))
+        cursor.execute("DELETE FROM audit_log WHERE username = %s", (USERNAME,))
+        connection.commit()
+        cursor.close()
+        connection.close()
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Cost of the write-behind audit log per write')
+    parser.add_argument('--threads', type=int, default=8, help='Request threads recording entries')
+    parser.add_argument('--entries', type=int, default=2000, help='Writes per thread')
+    parser.add_argument('--write-ms', type=float, default=2.0, help='Simulated database time of one write')
+    parser.add_argument('--insert-ms', type=float, default=2.0, help='Simulated INSERT round trip per batch')
+    parser.add_argument('--row-us', type=float, default=20.0, help='Simulated INSERT cost per entry')
+    parser.add_argument('--max-queue', type=int, default=10000)
+    parser.add_argument('--live', action='store_true', help='Also time real writes against the database in DB_CONFIG')
+    parser.add_argument('--appointment-id', type=int, default=1, help='Appointment edited by --live')
+    parser.add_argument('--iterations', type=int, default=1000, help='Writes per variant with --live')
+    args = parser.parse_args(argv)
+
+    offline(args.threads, args.entries, args.write_ms, args.insert_ms, args.row_us, args.max_queue,
+            'Writer keeping up')
+    print()
+    # A database too slow for the audit writer: the queue fills and record() falls back to the spill file
+    offline(args.threads, args.entries, args.write_ms, args.insert_ms * 50, args.row_us * 50, 100,
+            'Writer falling behind')
+    if args.live:
+        print()
+        live(args.appointment_id, args.iterations)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
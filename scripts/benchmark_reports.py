@@ -0,0 +1,93 @@
+"""
+Hospital Management System - PDF Report Benchmark
+Author: HMS Development Team
+Description: Compares the old xhtml2pdf (pisa) report path with the streaming
+report engine on synthetic appointment rows. Reports wall time, peak Python
+memory (tracemalloc) and output size for each row count.
+
+Usage: python scripts/benchmark_reports.py [row_count ...]
+       python scripts/benchmark_reports.py --engine-only 100000 1000000
+"""
+
+import io
+import os
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from report_engine import appointments_report  # noqa: E402
+
+STATUSES = ['Scheduled', 'Completed', 'Cancelled']
+NOTES = [None, 'Regular checkup', 'Follow-up visit after treatment, review test results and adjust medication']
+
+
+def synthetic_appointments(count, seed=42):
+    """
+    Generate appointment rows shaped like the appointments report query
+    """
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1, 8, 0)
+    for i in range(count):
+        yield {
+            'id': i + 1,
+            'patient_name': f'Patient {rng.randint(1, 50000)}',
+            'doctor_name': f'Dr. Doctor {rng.randint(1, 200)}',
+            'appointment_date': start + timedelta(minutes=15 * i),
+            'status': rng.choice(STATUSES),
+            'fee': Decimal(rng.choice(['150.00', '175.00', '200.00'])),
+            'notes': rng.choice(NOTES),
+        }
+
+
+def run_pisa(count):
+    from jinja2 import Environment, FileSystemLoader
+    from xhtml2pdf import pisa
+
+    env = Environment(loader=FileSystemLoader(os.path.join(ROOT, 'templates')), autoescape=True)
+    template = env.get_template('pdf_appointments.html')
+    rows = list(synthetic_appointments(count))
+    html = template.render(appointments=rows, date='2024-01-01')
+    buffer = io.BytesIO()
+    status = pisa.CreatePDF(html, dest=buffer)
+    if status.err:
+        raise RuntimeError('pisa failed to render the report')
+    return len(buffer.getvalue())
+
+
+def run_engine(count):
+    size = 0
+    for chunk in appointments_report('2024-01-01').stream(synthetic_appointments(count)):
+        size += len(chunk)  # Chunks are discarded as a streaming response would
+    return size
+
+
+def measure(func, count):
+    tracemalloc.start()
+    started = time.perf_counter()
+    size = func(count)
+    elapsed = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak, size
+
+
+def main(argv):
+    engine_only = '--engine-only' in argv
+    counts = [int(arg) for arg in argv if not arg.startswith('--')] or [500, 2000, 5000]
+
+    print(f"{'rows':>10} {'engine':>8} {'seconds':>9} {'peak MB':>9} {'PDF KB':>9}")
+    for count in counts:
+        engines = [('stream', run_engine)] if engine_only else [('pisa', run_pisa), ('stream', run_engine)]
+        for name, func in engines:
+            elapsed, peak, size = measure(func, count)
+            print(f'{count:>10} {name:>8} {elapsed:>9.2f} {peak / 1e6:>9.1f} {size / 1024:>9.0f}')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
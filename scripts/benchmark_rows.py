@@ -0,0 +1,155 @@
+"""
+Hospital Management System - Row Object Benchmark
+Author: HMS Development Team
+Description: Compares dictionary cursor rows with the named tuple rows of the
+data access layer: CPU time to build 100k rows, memory held by them and field
+access time. With --live it also runs against the database, comparing a
+dictionary cursor with PreparedCursor on the appointment list query and on
+repeated by-id lookups.
+
+Usage: python scripts/benchmark_rows.py [row_count]
+       python scripts/benchmark_rows.py --live 100000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import dal  # noqa: E402
+
+# Columns of the appointments list query (a.*, patient_name, doctor_name, doctor_specialization)
+COLUMNS = ('id', 'patient_id', 'doctor_id', 'appointment_date', 'fee', 'status', 'notes', 'created_at',
+           'updated_at', 'patient_name', 'doctor_name', 'doctor_specialization')
+
+
+def raw_rows(count, seed=42):
+    """
+    Tuples shaped like what the connector reads off the wire for the appointment list
+    """
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1, 9, 0)
+    rows = []
+    for i in range(count):
+        when = start + timedelta(minutes=30 * i)
+        rows.append((i + 1, rng.randint(1, 50000), rng.randint(1, 200), when,
+                     Decimal(rng.choice(['150.00', '175.00', '200.00'])),
+                     rng.choice(['Scheduled', 'Completed', 'Cancelled']),
+                     rng.choice([None, 'Regular checkup', 'Follow-up visit']), when, when,
+                     f'Patient {rng.randint(1, 50000)}', f'Dr. Doctor {rng.randint(1, 200)}', 'Cardiology'))
+    return rows
+
+
+def as_dicts(rows, columns):
+    # What the dictionary cursors do for every row
+    return [dict(zip(columns, row)) for row in rows]
+
+
+def as_named_tuples(rows, columns):
+    make = dal.row_type(columns)._make
+    return [make(row) for row in rows]
+
+
+def measure(build, rows, columns, repeat=5):
+    """
+    Returns: (best seconds, bytes allocated for the result list)
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = build(rows, columns)
+        best = min(best, time.perf_counter() - started)
+        del result
+    tracemalloc.start()
+    result = build(rows, columns)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return best, size
+
+
+def access_time(result, read):
+    started = time.perf_counter()
+    for row in result:
+        read(row)
+    return time.perf_counter() - started
+
+
+def offline(count):
+    rows = raw_rows(count)
+    scale = 100000 / count
+    print(f'{count:,} appointment rows, figures scaled to 100k rows\n')
+    print(f"{'rows as':<14} {'build ms':>9} {'memory MB':>10} {'read 3 fields ms':>17}")
+    for label, build, read in (
+            ('dict', as_dicts, lambda row: (row['appointment_date'], row['patient_name'], row['status'])),
+            ('named tuple', as_named_tuples, lambda row: (row.appointment_date, row.patient_name, row.status))):
+        seconds, size = measure(build, rows, COLUMNS)
+        read_seconds = access_time(build(rows, COLUMNS), read)
+        print(f'{label:<14} {seconds * scale * 1000:>9.1f} {size * scale / 1e6:>10.1f} '
+              f'{read_seconds * scale * 1000:>17.1f}')
+
+
+def live(count):
+    import mysql.connector
+    from app import DB_CONFIG
+
+    connection = mysql.connector.connect(**DB_CONFIG)
+    try:
+        query = dal.APPOINTMENT_LIST + ' ORDER BY a.id LIMIT %s'
+        print(f'Appointment list, {count:,} rows:')
+        for label, make_cursor in (('dict cursor', lambda: connection.cursor(dictionary=True)),
+                                   ('PreparedCursor', lambda: dal.PreparedCursor(connection))):
+            cursor = make_cursor()
+            tracemalloc.start()
+            started = time.perf_counter()
+            cursor.execute(query, (count,))
+            rows = cursor.fetchall()
+            seconds = time.perf_counter() - started
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(f'  {label:<15} {len(rows):>8,} rows  {seconds * 1000:>8.1f} ms  peak {peak / 1e6:>7.1f} MB')
+            del rows
+            cursor.close()
+
+        cursor = connection.cursor()
+        cursor.execute("SELECT id FROM appointments ORDER BY id LIMIT 5000")
+        ids = [row[0] for row in cursor.fetchall()]
+        cursor.close()
+        if not ids:
+            print('No appointments - generate data first (scripts/generate_data.py)')
+            return
+        print(f'\nBy-id lookups, {len(ids):,} queries:')
+        for label, make_cursor in (('dict cursor', lambda: connection.cursor(dictionary=True)),
+                                   ('PreparedCursor', lambda: dal.PreparedCursor(connection))):
+            cursor = make_cursor()
+            started = time.perf_counter()
+            for appointment_id in ids:
+                cursor.execute(dal.APPOINTMENT_BY_ID, (appointment_id,))
+                cursor.fetchall()
+            seconds = time.perf_counter() - started
+            cursor.close()
+            print(f'  {label:<15} {seconds * 1000:>8.1f} ms  ({seconds / len(ids) * 1e6:.0f} us per query)')
+    finally:
+        connection.close()
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Dictionary rows versus named tuple rows')
+    parser.add_argument('rows', nargs='?', type=int, default=100000)
+    parser.add_argument('--live', action='store_true', help='Also measure against the database in DB_CONFIG')
+    args = parser.parse_args(argv)
+    offline(args.rows)
+    if args.live:
+        print()
+        live(args.rows)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
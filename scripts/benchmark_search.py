@@ -0,0 +1,116 @@
+"""
+Hospital Management System - Patient Search Benchmark
+Author: HMS Development Team
+Description: Measures trigram index build time and query latency as the
+patient count grows, next to a linear substring scan that finds and ranks
+every match (what the old LIKE '%x%' ... ORDER BY name query had to do).
+
+Usage: python scripts/benchmark_search.py [patient_count ...]
+"""
+
+import heapq
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from search_index import PatientSearchIndex, normalize_name, normalize_phone  # noqa: E402
+
+FIRST_NAMES = ['James', 'Mary', 'John', 'Patricia', 'Robert', 'Jennifer', 'Michael', 'Linda', 'William',
+               'Elizabeth', 'David', 'Barbara', 'Richard', 'Susan', 'Joseph', 'Jessica', 'Thomas', 'Sarah',
+               'Ahmed', 'Fatima', 'Owais', 'Ayesha', 'Wei', 'Mei', 'Carlos', 'Sofia', 'Ivan', 'Olga']
+LAST_NAMES = ['Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller', 'Davis', 'Rodriguez',
+              'Martinez', 'Hernandez', 'Lopez', 'Wilson', 'Anderson', 'Thomas', 'Taylor', 'Moore', 'Khan',
+              'Saeed', 'Chen', 'Wang', 'Petrov', 'Novak', 'Silva', 'Kowalski', 'Nguyen', 'Kim', 'Ali']
+
+
+SYLLABLES = ['al', 'an', 'ar', 'be', 'ca', 'da', 'el', 'en', 'fa', 'ha', 'in', 'ka', 'la', 'ma', 'mi',
+             'na', 'ne', 'or', 'pa', 'ra', 're', 'ri', 'sa', 'se', 'ta', 'to', 'va', 'ya', 'za', 'zo']
+
+
+def surname(rng):
+    # Mostly common surnames, with a long tail of rarer generated ones
+    if rng.random() < 0.5:
+        return rng.choice(LAST_NAMES)
+    return ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))).capitalize()
+
+
+def synthetic_patients(count, rng):
+    for patient_id in range(1, count + 1):
+        name = f'{rng.choice(FIRST_NAMES)} {surname(rng)}'
+        if rng.random() < 0.3:
+            name += f'-{surname(rng)}'
+        phone = f'({rng.randint(200, 999)}) {rng.randint(100, 999)}-{rng.randint(1000, 9999)}'
+        yield patient_id, name, phone
+
+
+def make_queries(rows, rng, count=200):
+    queries = []
+    for _ in range(count):
+        _, name, phone = rng.choice(rows)
+        kind = rng.random()
+        if kind < 0.4:
+            start = rng.randint(0, max(0, len(name) - 4))
+            queries.append(name[start:start + rng.randint(3, 6)])   # Substring as typed
+        elif kind < 0.6:
+            queries.append(name[:2])                                 # First keystrokes
+        elif kind < 0.8:
+            queries.append(name)                                     # Full name
+        else:
+            digits = normalize_phone(phone)
+            start = rng.randint(0, len(digits) - 4)
+            queries.append(digits[start:start + 4])                  # Phone fragment
+    return queries
+
+
+def linear_scan(rows, query, limit):
+    needle_name, needle_phone = normalize_name(query), normalize_phone(query)
+    use_name = any(char.isalpha() for char in query)
+    matches = []
+    for patient_id, name_key, phone_key in rows:
+        if use_name and needle_name in name_key:
+            matches.append((name_key, patient_id))
+        elif not use_name and needle_phone in phone_key:
+            matches.append((name_key, patient_id))
+    return [patient_id for _, patient_id in heapq.nsmallest(limit, matches)]
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def main(argv):
+    counts = [int(arg) for arg in argv] or [10000, 100000, 500000]
+    rng = random.Random(7)
+
+    print(f"{'patients':>10} {'build s':>8} {'index p50 ms':>13} {'index p99 ms':>13} {'scan p50 ms':>12} {'scan p99 ms':>12}")
+    for count in counts:
+        rows = list(synthetic_patients(count, rng))
+        index = PatientSearchIndex(loader=lambda: rows)
+        started = time.perf_counter()
+        index.build(rows)
+        build_seconds = time.perf_counter() - started
+
+        normalized = [(patient_id, normalize_name(name), normalize_phone(phone)) for patient_id, name, phone in rows]
+        queries = make_queries(rows, rng)
+
+        index_times, scan_times = [], []
+        for query in queries:
+            started = time.perf_counter()
+            index.search(query, limit=25)
+            index_times.append((time.perf_counter() - started) * 1000)
+            started = time.perf_counter()
+            linear_scan(normalized, query, limit=25)
+            scan_times.append((time.perf_counter() - started) * 1000)
+
+        print(f'{count:>10} {build_seconds:>8.2f} {statistics.median(index_times):>13.3f} '
+              f'{percentile(index_times, 99):>13.3f} {statistics.median(scan_times):>12.3f} '
+              f'{percentile(scan_times, 99):>12.3f}')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -8,6 +8,12 @@ CREATE DATABASE IF NOT EXISTS HMS;
 USE HMS;
 
 -- Drop tables if they exist (for clean setup)
+DROP TABLE IF EXISTS audit_log;
+DROP TABLE IF EXISTS archive_state;
+DROP TABLE IF EXISTS appointments_archive;
+DROP TABLE IF EXISTS appointment_day_totals;
+DROP TABLE IF EXISTS appointment_daily_rollup;
+DROP TABLE IF EXISTS table_versions;
 DROP TABLE IF EXISTS appointments;
 DROP TABLE IF EXISTS staff;
 DROP TABLE IF EXISTS doctors;
@@ -23,13 +29,21 @@ CREATE TABLE patients (
     email VARCHAR(100),
     address TEXT,
     medical_history TEXT,
+    -- Appointment counters, maintained by the application (rollups.py) on every appointment write
+    total_appointments INT NOT NULL DEFAULT 0,
+    last_appointment DATETIME NULL,
+    next_scheduled_appointment DATETIME NULL,     -- Earliest appointment still Scheduled
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
     
     -- Indexes for better performance
     INDEX idx_name (name),
     INDEX idx_phone (phone),
-    INDEX idx_created_at (created_at)
+    INDEX idx_created_at (created_at),
+    INDEX idx_total_appointments (total_appointments),
+    INDEX idx_last_appointment (last_appointment),
+    INDEX idx_next_scheduled_appointment (next_scheduled_appointment),
+    INDEX idx_updated_at (updated_at)  -- Incremental sync (/api/v1 updated_since)
 );
 
 -- Create doctors table
@@ -47,7 +61,8 @@ CREATE TABLE doctors (
     -- Indexes for better performance
     INDEX idx_name (name),
     INDEX idx_specialization (specialization),
-    INDEX idx_phone (phone)
+    INDEX idx_phone (phone),
+    INDEX idx_updated_at (updated_at)  -- Incremental sync (/api/v1 updated_since)
 );
 
 -- Create appointments table
@@ -70,7 +85,38 @@ CREATE TABLE appointments (
     INDEX idx_appointment_date (appointment_date),
     INDEX idx_patient_id (patient_id),
     INDEX idx_doctor_id (doctor_id),
-    INDEX idx_status (status)
+    INDEX idx_status (status),
+    INDEX idx_doctor_status_date (doctor_id, status, appointment_date),  -- Scheduling conflict checks
+    INDEX idx_patient_status_date (patient_id, status, appointment_date),  -- Patient counter refreshes
+    INDEX idx_updated_at (updated_at)  -- Incremental sync (/api/v1 updated_since)
+);
+
+-- Appointments before the archive horizon, moved here by scripts/archive_appointments.py.
+-- Same columns as appointments plus archived_at; ids are kept, so not AUTO_INCREMENT.
+CREATE TABLE appointments_archive (
+    id INT PRIMARY KEY,
+    patient_id INT NOT NULL,
+    doctor_id INT NOT NULL,
+    appointment_date DATETIME NOT NULL,
+    fee DECIMAL(10,2) DEFAULT 0.00,
+    status ENUM('Scheduled', 'Completed', 'Cancelled') DEFAULT 'Scheduled',
+    notes TEXT,
+    created_at TIMESTAMP NULL,
+    updated_at TIMESTAMP NULL,
+    archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (patient_id) REFERENCES patients(id) ON DELETE CASCADE,
+    FOREIGN KEY (doctor_id) REFERENCES doctors(id) ON DELETE CASCADE,
+    INDEX idx_archive_appointment_date (appointment_date),
+    INDEX idx_archive_doctor_date (doctor_id, appointment_date),
+    INDEX idx_archive_patient_status_date (patient_id, status, appointment_date),  -- Patient counter refreshes
+    INDEX idx_archive_updated_at (updated_at)
+);
+
+-- Archive horizon - first day kept in appointments; no row until something has been archived
+CREATE TABLE archive_state (
+    table_name VARCHAR(64) PRIMARY KEY,
+    archived_before DATE NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
 );
 
 -- Create staff table for admin login
@@ -121,6 +167,15 @@ INSERT INTO appointments (patient_id, doctor_id, appointment_date, fee, status,
 (1, 3, '2024-01-18 08:30:00', 180.00, 'Scheduled', 'Joint pain evaluation'),
 (2, 2, '2024-01-19 13:00:00', 150.00, 'Scheduled', 'Vaccination appointment');
 
+-- Patient appointment counters for the sample data
+UPDATE patients p
+LEFT JOIN (SELECT patient_id, COUNT(*) AS total, MAX(appointment_date) AS last_date,
+                  MIN(CASE WHEN status = 'Scheduled' THEN appointment_date END) AS next_date
+           FROM appointments GROUP BY patient_id) a ON a.patient_id = p.id
+SET p.total_appointments = COALESCE(a.total, 0),
+    p.last_appointment = a.last_date,
+    p.next_scheduled_appointment = a.next_date;
+
 -- Create views for common queries
 
 -- View for appointment details with patient and doctor names
@@ -139,20 +194,84 @@ FROM appointments a
 JOIN patients p ON a.patient_id = p.id
 JOIN doctors d ON a.doctor_id = d.id;
 
--- View for patient summary
+-- View for patient summary (the counters are stored on patients, no GROUP BY needed)
 CREATE VIEW patient_summary AS
 SELECT 
-    p.id,
-    p.name,
-    p.age,
-    p.gender,
-    p.phone,
-    p.email,
-    COUNT(a.id) AS total_appointments,
-    MAX(a.appointment_date) AS last_appointment
-FROM patients p
-LEFT JOIN appointments a ON p.id = a.patient_id
-GROUP BY p.id, p.name, p.age, p.gender, p.phone, p.email;
+    id,
+    name,
+    age,
+    gender,
+    phone,
+    email,
+    total_appointments,
+    last_appointment,
+    next_scheduled_appointment
+FROM patients;
+
+-- Table versions - bumped by the application once per write transaction
+-- (dal.touch_tables) so caches (report files, HTTP validators) can tell
+-- whether a table changed since they were built. Deletes on patients and
+-- doctors also bump appointments, which their foreign keys cascade to.
+-- Writes made outside the application must bump the versions themselves.
+-- patient_counters versions the appointment counters stored on patients
+-- (rollups.py), so counter updates leave the patients version alone.
+CREATE TABLE table_versions (
+    table_name VARCHAR(64) PRIMARY KEY,
+    version BIGINT UNSIGNED NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP(6) DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6)
+);
+
+INSERT INTO table_versions (table_name) VALUES ('patients'), ('doctors'), ('appointments'), ('patient_counters');
+
+-- Appointment roll-up - appointments and fee totals per day, doctor and status.
+-- Maintained by the application (rollups.py) in the same transaction as the
+-- appointment writes; read by the dashboard and /api/stats/appointments.
+CREATE TABLE appointment_daily_rollup (
+    day DATE NOT NULL,
+    doctor_id INT NOT NULL,
+    status ENUM('Scheduled', 'Completed', 'Cancelled') NOT NULL,
+    appointments INT NOT NULL DEFAULT 0,
+    fee_total DECIMAL(14,2) NOT NULL DEFAULT 0.00,
+    PRIMARY KEY (day, doctor_id, status),
+    INDEX idx_rollup_doctor_day (doctor_id, day)
+);
+
+INSERT INTO appointment_daily_rollup (day, doctor_id, status, appointments, fee_total)
+SELECT DATE(appointment_date), doctor_id, status, COUNT(*), COALESCE(SUM(fee), 0)
+FROM appointments
+WHERE status IS NOT NULL
+GROUP BY DATE(appointment_date), doctor_id, status;
+
+-- Day totals - the roll-up summed per day, maintained alongside it, so the
+-- dashboard's all-time income sums one row per day instead of every group.
+CREATE TABLE appointment_day_totals (
+    day DATE PRIMARY KEY,
+    appointments INT NOT NULL DEFAULT 0,
+    fee_total DECIMAL(16,2) NOT NULL DEFAULT 0.00
+);
+
+INSERT INTO appointment_day_totals (day, appointments, fee_total)
+SELECT day, SUM(appointments), SUM(fee_total)
+FROM appointment_daily_rollup
+GROUP BY day;
+
+-- Audit log - who created, edited, completed, cancelled or deleted each
+-- patient, doctor and appointment, with the changed fields as JSON. Written in
+-- batches by the application's background audit writer (audit.py).
+CREATE TABLE audit_log (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    occurred_at DATETIME(6) NOT NULL,
+    user_id INT NULL,
+    username VARCHAR(50) NULL,
+    action VARCHAR(20) NOT NULL,
+    table_name VARCHAR(64) NOT NULL,
+    row_id INT NULL,
+    changes JSON NOT NULL,
+    remote_addr VARCHAR(45) NULL,
+    INDEX idx_audit_row (table_name, row_id, occurred_at),
+    INDEX idx_audit_user (user_id, occurred_at),
+    INDEX idx_audit_occurred (occurred_at)
+);
 
 -- Display success message
 SELECT 'Hospital Management System database setup completed successfully!' AS message;
@@ -0,0 +1,307 @@
+"""
+Hospital Management System - Synthetic Data Generator
+Author: HMS Development Team
+Description: Fills the HMS schema with a reproducible, realistically shaped
+data set for benchmarking: patient ages and genders follow a population-like
+mix, a few doctors and patients account for most visits, weekdays are busier
+than weekends, past appointments are mostly completed, and no doctor is ever
+double-booked. The same --seed always produces the same rows.
+
+Usage: python scripts/generate_data.py --patients 1000000 --doctors 500 --appointments 5000000 --truncate
+       python scripts/generate_data.py --patients 20000 --doctors 40 --appointments 100000 --seed 7
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from array import array
+from bisect import bisect_right
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from itertools import accumulate
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import mysql.connector  # noqa: E402
+from mysql.connector import errorcode  # noqa: E402
+
+import archive  # noqa: E402
+import rollups  # noqa: E402
+from app import DB_CONFIG, SCHEDULE_CONFIG  # noqa: E402
+from dal import touch_tables  # noqa: E402
+
+FIRST_NAMES = {
+    'Male': ['James', 'John', 'Robert', 'Michael', 'William', 'David', 'Richard', 'Joseph', 'Thomas', 'Ahmed',
+             'Owais', 'Wei', 'Carlos', 'Ivan', 'Omar', 'Raj', 'Daniel', 'Mateo', 'Lucas', 'Hiroshi'],
+    'Female': ['Mary', 'Patricia', 'Jennifer', 'Linda', 'Elizabeth', 'Barbara', 'Susan', 'Jessica', 'Sarah',
+               'Fatima', 'Ayesha', 'Mei', 'Sofia', 'Olga', 'Priya', 'Emily', 'Maria', 'Amara', 'Yuki', 'Leila'],
+}
+FIRST_NAMES['Other'] = FIRST_NAMES['Male'] + FIRST_NAMES['Female']
+LAST_NAMES = ['Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller', 'Davis', 'Rodriguez',
+              'Martinez', 'Hernandez', 'Lopez', 'Wilson', 'Anderson', 'Thomas', 'Taylor', 'Moore', 'Khan',
+              'Saeed', 'Chen', 'Wang', 'Petrov', 'Novak', 'Silva', 'Kowalski', 'Nguyen', 'Kim', 'Ali']
+SYLLABLES = ['al', 'an', 'ar', 'be', 'ca', 'da', 'el', 'en', 'fa', 'ha', 'in', 'ka', 'la', 'ma', 'mi',
+             'na', 'ne', 'or', 'pa', 'ra', 're', 'ri', 'sa', 'se', 'ta', 'to', 'va', 'ya', 'za', 'zo']
+STREETS = ['Main St', 'Oak Ave', 'Pine Rd', 'Elm St', 'Maple Dr', 'Cedar Ln', 'Park Ave', 'Lake Rd', 'Hill St']
+CITIES = ['Anytown', 'Somewhere', 'Elsewhere', 'Nowhere', 'Anywhere', 'Riverside', 'Fairview', 'Springfield']
+HISTORIES = ['No known allergies.', 'History of hypertension.', 'Allergic to penicillin.',
+             'Diabetic. Regular medication required.', 'Asthmatic. Carries inhaler.',
+             'Heart condition. Under cardiologist care.', 'Seasonal allergies.', 'Previous knee surgery.']
+# (specialization, share of doctors, base fee)
+SPECIALIZATIONS = [('Internal Medicine', 20, 150), ('Pediatrics', 15, 140), ('Family Medicine', 15, 120),
+                   ('Cardiology', 8, 220), ('Orthopedics', 8, 200), ('Dermatology', 7, 170),
+                   ('Gynecology', 7, 180), ('Neurology', 5, 240), ('Psychiatry', 5, 190),
+                   ('Ophthalmology', 5, 175), ('ENT', 5, 165)]
+# Age bands (lower, upper, weight) - roughly a national population pyramid
+AGE_BANDS = [(0, 4, 6), (5, 17, 16), (18, 29, 16), (30, 44, 20), (45, 64, 25), (65, 79, 13), (80, 100, 4)]
+NOTES = ['Regular checkup', 'Follow-up visit', 'Review test results', 'Prescription renewal',
+         'New symptoms, first consultation', 'Post-operative review', 'Vaccination']
+WEEKDAY_LOAD = [1.0, 1.0, 1.0, 1.0, 0.9, 0.3, 0.05]  # Monday .. Sunday
+
+
+class WeightedPicker:
+    """
+    O(log n) weighted choice over a fixed list of weights
+    """
+
+    def __init__(self, weights):
+        self.cumulative = list(accumulate(weights))
+        self.total = self.cumulative[-1]
+
+    def pick(self, rng):
+        return bisect_right(self.cumulative, rng.random() * self.total)
+
+
+def surname(rng):
+    # Mostly common surnames, with a long tail of rarer generated ones
+    if rng.random() < 0.6:
+        return rng.choice(LAST_NAMES)
+    return ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))).capitalize()
+
+
+def phone_number(rng):
+    return f'({rng.randint(200, 999)}) {rng.randint(100, 999)}-{rng.randint(1000, 9999)}'
+
+
+def generate_patients(count, rng, first_day, last_day):
+    ages = WeightedPicker([weight for _, _, weight in AGE_BANDS])
+    span = int((last_day - first_day).total_seconds())
+    for _ in range(count):
+        roll = rng.random()
+        gender = 'Male' if roll < 0.49 else 'Female' if roll < 0.98 else 'Other'
+        first, last = rng.choice(FIRST_NAMES[gender]), surname(rng)
+        low, high, _ = AGE_BANDS[ages.pick(rng)]
+        email = f'{first}.{last}{rng.randint(1, 9999)}@example.com'.lower() if rng.random() < 0.7 else None
+        address = f'{rng.randint(1, 9999)} {rng.choice(STREETS)}, {rng.choice(CITIES)}' if rng.random() < 0.85 else None
+        history = ' '.join(rng.sample(HISTORIES, rng.randint(1, 2))) if rng.random() < 0.6 else None
+        created_at = first_day + timedelta(seconds=rng.randrange(span))
+        yield (f'{first} {last}', rng.randint(low, high), gender, phone_number(rng), email, address, history,
+               created_at)
+
+
+def generate_doctors(count, rng):
+    specializations = WeightedPicker([share for _, share, _ in SPECIALIZATIONS])
+    for _ in range(count):
+        name, _, base_fee = SPECIALIZATIONS[specializations.pick(rng)]
+        first = rng.choice(FIRST_NAMES['Other'])
+        last = surname(rng)
+        experience = min(40, int(rng.expovariate(1 / 10)) + 1)
+        fee = Decimal(base_fee + experience * 2 + rng.choice((0, 5, 10))).quantize(Decimal('0.01'))
+        yield (f'Dr. {first} {last}', name, phone_number(rng), f'{first[0]}.{last}@hospital.com'.lower(),
+               experience, fee)
+
+
+def day_slots():
+    """
+    Appointment start times in one working day, as minutes after midnight
+    """
+    def minutes(text):
+        hours, mins = text.split(':')
+        return int(hours) * 60 + int(mins)
+    visit = SCHEDULE_CONFIG['visit_minutes']
+    return list(range(minutes(SCHEDULE_CONFIG['day_start']), minutes(SCHEDULE_CONFIG['day_end']) - visit + 1, visit))
+
+
+def generate_appointments(count, rng, patient_ids, doctors, first_day, last_day, today):
+    """
+    Yield appointment rows in date order. Each doctor-day gets a share of the
+    total proportional to the weekday load and the doctor's popularity, capped
+    at the slots in a day, and the slots are sampled without replacement so no
+    doctor is ever double-booked.
+    """
+    slots = day_slots()
+    days = [first_day + timedelta(days=offset) for offset in range((last_day - first_day).days + 1)]
+    popularity = [rng.lognormvariate(0, 0.6) for _ in doctors]
+    load = sum(WEEKDAY_LOAD[day.weekday()] for day in days) * sum(popularity)
+    # Visits are skewed towards frequent patients (chronic conditions, families with children)
+    offset = max(10, len(patient_ids) // 50)
+    patients = WeightedPicker([1 / (rank + offset) for rank in range(len(patient_ids))])
+    order = list(range(len(patient_ids)))
+    rng.shuffle(order)
+
+    for day in days:
+        past = day < today
+        for (doctor_id, fee), weight in zip(doctors, popularity):
+            expected = count * WEEKDAY_LOAD[day.weekday()] * weight / load
+            booked = int(expected) + (rng.random() < expected - int(expected))
+            for slot in sorted(rng.sample(slots, min(booked, len(slots)))):
+                roll = rng.random()
+                if past:
+                    status = 'Completed' if roll < 0.8 else 'Cancelled' if roll < 0.92 else 'Scheduled'
+                else:
+                    status = 'Cancelled' if roll < 0.08 else 'Scheduled'
+                yield (patient_ids[order[patients.pick(rng)]], doctor_id,
+                       datetime.combine(day, datetime.min.time()) + timedelta(minutes=slot), fee, status,
+                       rng.choice(NOTES) if rng.random() < 0.4 else None)
+
+
+def insert_rows(connection, sql, rows, batch_size, label, total):
+    """
+    Insert rows with multi-row executemany() calls, one transaction per batch
+    Returns: Number of rows inserted
+    """
+    cursor = connection.cursor()
+    inserted, started, batch = 0, time.perf_counter(), []
+    try:
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                cursor.executemany(sql, batch)
+                connection.commit()
+                inserted += len(batch)
+                batch = []
+                if inserted % (batch_size * 20) == 0:
+                    rate = inserted / (time.perf_counter() - started)
+                    print(f'  {label}: {inserted:,} / ~{total:,} ({rate:,.0f} rows/s)')
+        if batch:
+            cursor.executemany(sql, batch)
+            connection.commit()
+            inserted += len(batch)
+    finally:
+        cursor.close()
+    print(f'  {label}: {inserted:,} rows in {time.perf_counter() - started:.1f}s')
+    return inserted
+
+
+def load_ids(connection, query):
+    cursor = connection.cursor()
+    try:
+        cursor.execute(query)
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Fill the HMS database with synthetic benchmark data')
+    parser.add_argument('--patients', type=int, default=100000)
+    parser.add_argument('--doctors', type=int, default=200)
+    parser.add_argument('--appointments', type=int, default=500000, help='Approximate; capped by free slots')
+    parser.add_argument('--past-days', type=int, default=730, help='History length before --today')
+    parser.add_argument('--future-days', type=int, default=60, help='Days booked ahead of --today')
+    parser.add_argument('--today', type=date.fromisoformat, default=date.today(), help='YYYY-MM-DD')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--batch-size', type=int, default=5000, help='Rows per INSERT and transaction')
+    parser.add_argument('--truncate', action='store_true',
+                        help='Delete all patients, doctors and appointments (archive and audit log included) first')
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    first_day = args.today - timedelta(days=args.past_days)
+    last_day = args.today + timedelta(days=args.future_days)
+    capacity = len(day_slots()) * args.doctors * sum(
+        1 for offset in range((last_day - first_day).days + 1)
+        if WEEKDAY_LOAD[(first_day + timedelta(days=offset)).weekday()] > 0)
+    if args.appointments > capacity * 0.8:
+        print(f'Warning: {args.appointments:,} appointments is close to or above the {capacity:,} slots '
+              f'available to {args.doctors} doctors; busy days will be capped', file=sys.stderr)
+
+    connection = mysql.connector.connect(**dict(DB_CONFIG, autocommit=False))
+    try:
+        cursor = connection.cursor()
+        try:
+            # Keys and references are generated consistently; skip re-checking them row by row
+            cursor.execute("SET SESSION unique_checks = 0, foreign_key_checks = 0")
+            if args.truncate:
+                for table in ('appointments', 'patients', 'doctors', rollups.TABLE):
+                    cursor.execute(f"TRUNCATE TABLE {table}")
+                try:
+                    cursor.execute(f"TRUNCATE TABLE {rollups.DAY_TOTALS}")
+                except mysql.connector.Error as e:
+                    if not rollups.missing_day_totals(e):  # Migration 010 not run
+                        raise
+                # Left behind, archived rows would share ids with the new appointments in archive.BOTH and
+                # point at reused patient and doctor ids, under a stale horizon and audit trail
+                try:
+                    for table in (archive.ARCHIVE, 'archive_state'):
+                        cursor.execute(f"TRUNCATE TABLE {table}")
+                except mysql.connector.Error as e:
+                    if not archive.missing_table(e):  # Migration 006 not run
+                        raise
+                try:
+                    cursor.execute("TRUNCATE TABLE audit_log")
+                except mysql.connector.Error as e:
+                    if e.errno != errorcode.ER_NO_SUCH_TABLE:  # Migration 005 not run
+                        raise
+                # Bump the versions so caches notice
+                cursor.execute("UPDATE table_versions SET version = version + 1")
+                connection.commit()
+        finally:
+            cursor.close()
+
+        started = time.perf_counter()
+        print(f'Generating with seed {args.seed}, {first_day} to {last_day}')
+        insert_rows(connection,
+                    """INSERT INTO patients (name, age, gender, phone, email, address, medical_history, created_at)
+                       VALUES (%s, %s, %s, %s, %s, %s, %s, %s)""",
+                    generate_patients(args.patients, rng, datetime.combine(first_day, datetime.min.time()),
+                                      datetime.combine(args.today, datetime.min.time())),
+                    args.batch_size, 'patients', args.patients)
+        insert_rows(connection,
+                    """INSERT INTO doctors (name, specialization, phone, email, experience, fee)
+                       VALUES (%s, %s, %s, %s, %s, %s)""",
+                    generate_doctors(args.doctors, rng), args.batch_size, 'doctors', args.doctors)
+
+        patient_ids = array('i', (row[0] for row in load_ids(connection, "SELECT id FROM patients ORDER BY id")))
+        doctors = load_ids(connection, "SELECT id, fee FROM doctors ORDER BY id")
+        if not patient_ids or not doctors:
+            print('Need at least one patient and one doctor to generate appointments', file=sys.stderr)
+            return 1
+        insert_rows(connection,
+                    """INSERT INTO appointments (patient_id, doctor_id, appointment_date, fee, status, notes)
+                       VALUES (%s, %s, %s, %s, %s, %s)""",
+                    generate_appointments(args.appointments, rng, patient_ids, doctors, first_day, last_day,
+                                          args.today),
+                    args.batch_size, 'appointments', args.appointments)
+        cursor = connection.cursor()
+        try:
+            touch_tables(cursor, 'patients', 'doctors', 'appointments')
+            connection.commit()
+        finally:
+            cursor.close()
+
+        # The bulk insert bypasses the application, so recompute the roll-ups it maintains
+        cursor = connection.cursor()
+        try:
+            extent = rollups.appointment_extent(cursor)
+            patient_extent = rollups.patient_extent(cursor)
+        finally:
+            cursor.close()
+        if extent[0] is not None:
+            rows = rollups.rebuild(connection, *extent)
+            print(f'  {rollups.TABLE}: {rows:,} rows')
+        rows = rollups.rebuild_patient_counters(connection, *patient_extent)
+        print(f'  patient appointment counters: {rows:,} patients updated')
+    finally:
+        connection.close()
+
+    print(f'Done in {time.perf_counter() - started:.1f}s. Restart the app so in-process caches and the '
+          f'search index are rebuilt.')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
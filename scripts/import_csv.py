@@ -0,0 +1,82 @@
+"""
+Hospital Management System - Bulk CSV Import
+Author: HMS Development Team
+Description: Command line importer for patients, doctors and appointments.
+Rejected rows go to <file>.errors.csv and progress to <file>.checkpoint.json;
+running the same command again after an interruption resumes where it stopped.
+
+Usage: python scripts/import_csv.py patients new_patients.csv
+       python scripts/import_csv.py appointments visits.csv --chunk-size 20000 --restart
+"""
+
+import argparse
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import mysql.connector  # noqa: E402
+
+from app import DB_CONFIG, SCHEDULE_CONFIG  # noqa: E402
+from bulk_import import TABLES, BulkImporter, Checkpoint, CSVImportError  # noqa: E402
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Bulk import a CSV file into the HMS database')
+    parser.add_argument('table', choices=sorted(TABLES))
+    parser.add_argument('csv_file')
+    parser.add_argument('--chunk-size', type=int, default=10000, help='Rows per transaction and checkpoint')
+    parser.add_argument('--batch-size', type=int, default=1000, help='Rows per executemany() call')
+    parser.add_argument('--errors', help='Error report path (default: <csv_file>.errors.csv)')
+    parser.add_argument('--checkpoint', help='Checkpoint path (default: <csv_file>.checkpoint.json)')
+    parser.add_argument('--restart', action='store_true', help='Ignore an existing checkpoint and start over')
+    parser.add_argument('--allow-overlaps', action='store_true',
+                        help='Do not reject appointments that double-book a doctor')
+    args = parser.parse_args(argv)
+
+    source = os.path.abspath(args.csv_file)
+    error_path = args.errors or source + '.errors.csv'
+    checkpoint = Checkpoint(args.checkpoint or source + '.checkpoint.json', args.table, source)
+    if args.restart:
+        checkpoint.remove()
+    try:
+        resumed = checkpoint.load()
+    except CSVImportError as e:
+        print(e, file=sys.stderr)
+        return 2
+    if resumed:
+        print(f'Resuming after row {checkpoint.rows_done} '
+              f'({checkpoint.inserted} inserted, {checkpoint.failed} rejected so far)')
+
+    def progress(result):
+        print(f'  {checkpoint.rows_done} rows done, {checkpoint.inserted} inserted, {checkpoint.failed} rejected '
+              f'({result.rows_per_second:,.0f} rows/s)')
+
+    config = dict(DB_CONFIG, autocommit=False)
+    connection = mysql.connector.connect(**config)
+    try:
+        with open(source, encoding='utf-8-sig', newline='') as csv_file, \
+                open(error_path, 'a' if resumed else 'w', encoding='utf-8', newline='') as error_file:
+            importer = BulkImporter(connection, args.table, chunk_size=args.chunk_size, batch_size=args.batch_size,
+                                    error_stream=error_file,
+                                    visit_minutes=None if args.allow_overlaps else SCHEDULE_CONFIG['visit_minutes'])
+            result = importer.run(csv_file, checkpoint=checkpoint, progress=progress)
+    except CSVImportError as e:
+        print(e, file=sys.stderr)
+        return 2
+    finally:
+        connection.close()
+
+    print(f'Imported {result.inserted} of {result.rows} rows into {args.table} in {result.seconds:.1f}s '
+          f'({result.rows_per_second:,.0f} rows/s); {result.failed} rejected')
+    if checkpoint.failed:
+        print(f'Rejected rows: {error_path}')
+    elif os.path.exists(error_path) and os.path.getsize(error_path) == 0:
+        os.remove(error_path)
+    checkpoint.remove()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,430 @@
+"""
+Hospital Management System - Load Test
+Author: HMS Development Team
+Description: Drives the real routes of a running HMS server over HTTP at one
+or more concurrency levels and reports p50/p95/p99 latency and throughput per
+scenario. Every worker logs in with its own session. Results are written as
+JSON; pass an earlier result with --compare to flag latency regressions.
+
+Start the app against a generated data set first (see generate_data.py), then:
+
+Usage: python scripts/load_test.py --concurrency 1 8 32 --duration 30
+       python scripts/load_test.py --mix dashboard=1,patients_search=3 --compare benchmarks/baseline.json
+
+Sync versus async serving (async_app.py) on the read pages - run the same
+command against each server, one worker process each:
+    python scripts/load_test.py --mix dashboard=1,patients_list=1,doctors_list=1,appointments_by_date=1 \
+        --concurrency 8 32 128 --output benchmarks/sync.json
+    python scripts/load_test.py ... --output benchmarks/async.json --compare benchmarks/sync.json
+
+Write routes with the audit log on and off (AUDIT_CONFIG['enabled'] in app.py):
+    python scripts/load_test.py --mix add_appointment=1,edit_appointment=1 --concurrency 8 32 \
+        --output benchmarks/audit-off.json
+    python scripts/load_test.py ... --output benchmarks/audit-on.json --compare benchmarks/audit-off.json
+
+Appointments created by the test carry the note 'load-test':
+    DELETE FROM appointments WHERE notes = 'load-test';
+"""
+
+import argparse
+import html
+import http.cookiejar
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from datetime import date, datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_MIX = {
+    'dashboard': 20,
+    'patients_search': 25,
+    'appointments_by_date': 25,
+    'add_appointment': 8,
+    'edit_appointment': 8,
+    'patients_pdf': 2,
+    'appointments_pdf': 4,
+}
+
+
+class LoadTestError(Exception):
+    """
+    A response that the scenario did not expect
+    """
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    # Redirects are part of what is measured; scenarios follow them explicitly
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+class Client:
+    """
+    One logged-in browser session
+    """
+
+    def __init__(self, base_url, timeout):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), _NoRedirect())
+
+    def request(self, path, data=None, expect=(200,)):
+        """
+        Send a GET (or a form POST when data is given)
+        Returns: (status, headers, body bytes)
+        Raises: LoadTestError if the status is not in expect
+        """
+        body = urllib.parse.urlencode(data).encode() if data is not None else None
+        try:
+            with self.opener.open(self.base_url + path, body, self.timeout) as response:
+                status, headers, content = response.status, response.headers, response.read()
+        except urllib.error.HTTPError as e:
+            status, headers, content = e.code, e.headers, e.read()
+        if status not in expect:
+            raise LoadTestError(f'{path}: HTTP {status}')
+        return status, headers, content
+
+    def login(self, username, password):
+        _, headers, _ = self.request('/login', {'username': username, 'password': password}, expect=(302,))
+        if '/dashboard' not in headers.get('Location', ''):
+            raise LoadTestError('Login failed - check --username/--password')
+
+
+def location_path(headers):
+    return urllib.parse.urlsplit(headers.get('Location', '')).path
+
+
+class Fixtures:
+    """
+    Ids and search terms harvested from the running app before the test starts
+    """
+
+    def __init__(self, client, rng, first_day, last_day):
+        self.first_day, self.last_day = first_day, last_day
+        self.doctors = []
+        for prefix in ('dr', 'a', 'e', 'i', 'o'):
+            _, _, body = client.request(f'/api/doctors/search?q={prefix}&limit=50')
+            self.doctors.extend((doctor['id'], doctor['fee']) for doctor in json.loads(body))
+        self.doctors = sorted(set(self.doctors))
+        self.patient_ids, self.search_terms = set(), []
+        for prefix in ('a', 'b', 'c', 'd', 'e', 'j', 'm', 's'):
+            _, _, body = client.request(f'/api/patients/search?q={prefix}&limit=50')
+            for patient in json.loads(body):
+                self.patient_ids.add(patient['id'])
+                name = patient['name']
+                start = rng.randint(0, max(0, len(name) - 4))
+                self.search_terms.extend([name[start:start + rng.randint(3, 6)], name.split()[0]])
+        self.patient_ids = sorted(self.patient_ids)
+        self.appointment_ids = set()
+        for offset in range(0, (last_day - first_day).days + 1, max(1, (last_day - first_day).days // 10)):
+            day = first_day + timedelta(days=offset)
+            _, _, body = client.request(f'/appointments?date={day.isoformat()}')
+            self.appointment_ids.update(int(found) for found in re.findall(rb'/edit_appointment/(\d+)', body))
+        self.appointment_ids = sorted(self.appointment_ids)
+        if not self.doctors or not self.patient_ids:
+            raise LoadTestError('No doctors or patients found - generate data first')
+
+    def random_day(self, rng):
+        return self.first_day + timedelta(days=rng.randint(0, (self.last_day - self.first_day).days))
+
+
+# Scenarios - each is one user action, including the redirects a browser would follow
+
+def scenario_dashboard(client, rng, fixtures):
+    client.request('/dashboard')
+
+
+def scenario_patients_list(client, rng, fixtures):
+    client.request('/patients')
+
+
+def scenario_doctors_list(client, rng, fixtures):
+    client.request('/doctors')
+
+
+def scenario_patients_search(client, rng, fixtures):
+    term = urllib.parse.quote(rng.choice(fixtures.search_terms))
+    client.request(f'/patients?search={term}')
+
+
+def scenario_appointments_by_date(client, rng, fixtures):
+    client.request(f'/appointments?date={fixtures.random_day(rng).isoformat()}')
+
+
+def scenario_add_appointment(client, rng, fixtures):
+    doctor_id, fee = rng.choice(fixtures.doctors)
+    # Spread over a far-future year so test bookings rarely collide with each other
+    day = date(2099, 1, 1) + timedelta(days=rng.randint(0, 364))
+    form = {'patient_id': rng.choice(fixtures.patient_ids), 'doctor_id': doctor_id,
+            'appointment_date': day.isoformat(), 'appointment_time': f'{rng.randint(9, 16):02d}:{rng.choice((0, 30)):02d}',
+            'fee': fee, 'notes': 'load-test'}
+    # 302 when booked, 200 when the form is shown again (e.g. the slot was taken)
+    client.request('/add_appointment', form, expect=(200, 302))
+
+
+def _form_values(page):
+    values = {name: html.unescape(value)
+              for name, value in re.findall(r'<input[^>]*\bname="(\w+)"[^>]*\bvalue="([^"]*)"', page)}
+    status = re.search(r'<option value="(\w+)" selected', page)
+    notes = re.search(r'<textarea[^>]*name="notes"[^>]*>(.*?)</textarea>', page, re.S)
+    values['status'] = status.group(1) if status else 'Scheduled'
+    values['notes'] = html.unescape(notes.group(1).strip()) if notes else ''
+    return values
+
+
+def scenario_edit_appointment(client, rng, fixtures):
+    if not fixtures.appointment_ids:
+        return scenario_appointments_by_date(client, rng, fixtures)
+    appointment_id = rng.choice(fixtures.appointment_ids)
+    _, _, body = client.request(f'/edit_appointment/{appointment_id}', expect=(200, 302))
+    form = _form_values(body.decode('utf-8', 'replace'))
+    if 'appointment_date' not in form:
+        return  # Deleted since the fixtures were collected
+    # Save the form unchanged: the full validation, conflict check and update path
+    client.request(f'/edit_appointment/{appointment_id}', form, expect=(200, 302))
+
+
+def _pdf(client, path, poll_interval=0.1, timeout=300):
+    _, headers, _ = client.request(path, expect=(302,))
+    target = location_path(headers)
+    match = re.match(r'/reports/(\w+)', target)
+    if not match:
+        raise LoadTestError(f'{path}: redirected to {target}')
+    job_id = match.group(1)
+    deadline = time.perf_counter() + timeout
+    while not target.endswith('/download'):
+        _, _, body = client.request(f'/reports/{job_id}/status')
+        status = json.loads(body)['status']
+        if status == 'done':
+            break
+        if status == 'failed' or time.perf_counter() > deadline:
+            raise LoadTestError(f'{path}: report {status}')
+        time.sleep(poll_interval)
+    _, headers, body = client.request(f'/reports/{job_id}/download')
+    if not body.startswith(b'%PDF'):
+        raise LoadTestError(f'{path}: download is not a PDF')
+
+
+def scenario_patients_pdf(client, rng, fixtures):
+    _pdf(client, '/download_patients_pdf?gender=' + rng.choice(('', 'Male', 'Female', 'Other')))
+
+
+def scenario_appointments_pdf(client, rng, fixtures):
+    day = fixtures.random_day(rng)
+    _pdf(client, f'/download_appointments_pdf?start={day.isoformat()}&end={day.isoformat()}')
+
+
+SCENARIOS = {name[len('scenario_'):]: func for name, func in globals().items() if name.startswith('scenario_')}
+
+
+def percentile(ordered, pct):
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def summarize(samples, errors, seconds):
+    ordered = sorted(samples)
+    return {
+        'count': len(ordered),
+        'errors': errors,
+        'throughput': round(len(ordered) / seconds, 2) if seconds else 0,
+        'p50_ms': round(percentile(ordered, 50) * 1000, 2) if ordered else None,
+        'p95_ms': round(percentile(ordered, 95) * 1000, 2) if ordered else None,
+        'p99_ms': round(percentile(ordered, 99) * 1000, 2) if ordered else None,
+        'max_ms': round(ordered[-1] * 1000, 2) if ordered else None,
+    }
+
+
+def run_level(args, mix, fixtures, concurrency):
+    """
+    Run every worker for warmup + duration seconds; only the measured window is kept
+    Returns: dict with the overall and per-scenario summaries
+    """
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    lock = threading.Lock()
+    samples = {name: [] for name in names}
+    errors = {name: 0 for name in names}
+    error_messages = {}
+    timing = {}
+
+    def start_clock():
+        # Runs once, before any worker is released
+        timing['measure_from'] = time.perf_counter() + args.warmup
+        timing['stop'] = timing['measure_from'] + args.duration
+
+    ready = threading.Barrier(concurrency + 1, action=start_clock)
+
+    def worker(index):
+        rng = random.Random(args.seed * 1000 + index)
+        client = Client(args.base_url, args.timeout)
+        try:
+            client.login(args.username, args.password)
+        except (LoadTestError, OSError) as e:
+            with lock:
+                error_messages[f'login: {e}'] = error_messages.get(f'login: {e}', 0) + 1
+            ready.wait()
+            return
+        ready.wait()
+        while True:
+            now = time.perf_counter()
+            if now >= timing['stop']:
+                return
+            name = rng.choices(names, weights)[0]
+            started = time.perf_counter()
+            try:
+                SCENARIOS[name](client, rng, fixtures)
+                failed = None
+            except (LoadTestError, OSError, ValueError) as e:
+                failed = str(e)
+            elapsed = time.perf_counter() - started
+            if started < timing['measure_from']:
+                continue
+            with lock:
+                if failed is None:
+                    samples[name].append(elapsed)
+                else:
+                    errors[name] += 1
+                    error_messages[failed] = error_messages.get(failed, 0) + 1
+
+    threads = [threading.Thread(target=worker, args=(index,), daemon=True) for index in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    ready.wait()
+    for thread in threads:
+        thread.join()
+
+    seconds = args.duration
+    all_samples = [sample for values in samples.values() for sample in values]
+    return {
+        'concurrency': concurrency,
+        'seconds': seconds,
+        'overall': summarize(all_samples, sum(errors.values()), seconds),
+        'scenarios': {name: summarize(samples[name], errors[name], seconds) for name in names},
+        'top_errors': sorted(error_messages.items(), key=lambda item: -item[1])[:10],
+    }
+
+
+def print_level(level):
+    print(f"\nConcurrency {level['concurrency']} - {level['overall']['throughput']} req/s, "
+          f"{level['overall']['errors']} errors")
+    print(f"{'scenario':<22} {'count':>7} {'errors':>6} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    rows = list(level['scenarios'].items()) + [('overall', level['overall'])]
+    for name, stats in rows:
+        print(f"{name:<22} {stats['count']:>7} {stats['errors']:>6} {stats['throughput']:>8} "
+              f"{stats['p50_ms'] or '-':>9} {stats['p95_ms'] or '-':>9} {stats['p99_ms'] or '-':>9}")
+    for message, count in level['top_errors']:
+        print(f'  {count} x {message}')
+
+
+def compare(result, baseline, threshold):
+    """
+    Print p95 changes against an earlier result
+    Returns: True if any scenario got slower than threshold allows
+    """
+    regressed = False
+    previous = {level['concurrency']: level for level in baseline['levels']}
+    print(f"\nCompared with {baseline.get('git_commit') or 'baseline'} ({baseline.get('started_at')}):")
+    for level in result['levels']:
+        old_level = previous.get(level['concurrency'])
+        if old_level is None:
+            continue
+        for name, stats in list(level['scenarios'].items()) + [('overall', level['overall'])]:
+            old = old_level['overall'] if name == 'overall' else old_level['scenarios'].get(name)
+            if not old or not old.get('p95_ms') or not stats['p95_ms']:
+                continue
+            ratio = stats['p95_ms'] / old['p95_ms']
+            flag = 'REGRESSION' if ratio > threshold else ''
+            regressed = regressed or bool(flag)
+            print(f"  c={level['concurrency']:<4} {name:<22} p95 {old['p95_ms']:>9} -> {stats['p95_ms']:>9} ms "
+                  f"({ratio:5.2f}x) {flag}")
+    return regressed
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        if name not in SCENARIOS:
+            raise argparse.ArgumentTypeError(f'unknown scenario {name!r}; choose from {", ".join(sorted(SCENARIOS))}')
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Load test a running HMS server')
+    parser.add_argument('--base-url', default='http://127.0.0.1:5000')
+    parser.add_argument('--username', default='admin')
+    parser.add_argument('--password', default='admin123')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--duration', type=float, default=30, help='Measured seconds per concurrency level')
+    parser.add_argument('--warmup', type=float, default=5, help='Unmeasured seconds before each level')
+    parser.add_argument('--mix', type=parse_mix, default=DEFAULT_MIX, help='scenario=weight,... (default: all)')
+    parser.add_argument('--days', type=int, default=60, help='Date filters are drawn from the last N days')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--timeout', type=float, default=60)
+    parser.add_argument('--output', help='Result file (default: benchmarks/load_<timestamp>.json)')
+    parser.add_argument('--compare', help='Earlier result file to compare p95 latency against')
+    parser.add_argument('--threshold', type=float, default=1.2, help='p95 ratio counted as a regression')
+    args = parser.parse_args(argv)
+
+    started_at = datetime.now()
+    setup = Client(args.base_url, args.timeout)
+    try:
+        setup.login(args.username, args.password)
+        fixtures = Fixtures(setup, random.Random(args.seed), date.today() - timedelta(days=args.days), date.today())
+    except (LoadTestError, OSError) as e:
+        print(f'Setup failed: {e}', file=sys.stderr)
+        return 2
+    print(f'{args.base_url}: {len(fixtures.patient_ids)} patients, {len(fixtures.doctors)} doctors, '
+          f'{len(fixtures.appointment_ids)} appointments sampled; mix {args.mix}')
+
+    result = {
+        'started_at': started_at.isoformat(timespec='seconds'),
+        'git_commit': git_commit(),
+        'base_url': args.base_url,
+        'duration': args.duration,
+        'warmup': args.warmup,
+        'seed': args.seed,
+        'mix': args.mix,
+        'levels': [],
+    }
+    for concurrency in args.concurrency:
+        level = run_level(args, args.mix, fixtures, concurrency)
+        result['levels'].append(level)
+        print_level(level)
+
+    output = args.output or os.path.join(ROOT, 'benchmarks', f"load_{started_at.strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as handle:
+        json.dump(result, handle, indent=2)
+    print(f'\nResults written to {output}')
+
+    if args.compare:
+        with open(args.compare) as handle:
+            if compare(result, json.load(handle), args.threshold):
+                return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,9 @@
+-- Hospital Management System - Migration 001
+-- Index used to load a doctor's scheduled appointments for conflict checks
+-- without scanning completed and cancelled history.
+-- Run once against existing databases: mysql -u root -p HMS < scripts/migrations/001_doctor_schedule_index.sql
+
+USE HMS;
+
+ALTER TABLE appointments
+    ADD INDEX idx_doctor_status_date (doctor_id, status, appointment_date);
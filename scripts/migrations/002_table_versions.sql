@@ -0,0 +1,35 @@
+-- Hospital Management System - Migration 002
+-- Adds table_versions and the triggers that maintain it (used by the report cache).
+-- Run once against existing databases: mysql -u root -p HMS < scripts/migrations/002_table_versions.sql
+
+USE HMS;
+
+CREATE TABLE table_versions (
+    table_name VARCHAR(64) PRIMARY KEY,
+    version BIGINT UNSIGNED NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP(6) DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6)
+);
+
+INSERT INTO table_versions (table_name) VALUES ('patients'), ('doctors'), ('appointments');
+
+CREATE TRIGGER patients_after_insert AFTER INSERT ON patients FOR EACH ROW
+    UPDATE table_versions SET version = version + 1 WHERE table_name = 'patients';
+CREATE TRIGGER patients_after_update AFTER UPDATE ON patients FOR EACH ROW
+    UPDATE table_versions SET version = version + 1 WHERE table_name = 'patients';
+CREATE TRIGGER patients_after_delete AFTER DELETE ON patients FOR EACH ROW
+    UPDATE table_versions SET version = version + 1 WHERE table_name IN ('patients', 'appointments');
+
+CREATE TRIGGER doctors_after_insert AFTER INSERT ON doctors FOR EACH ROW
+    UPDATE table_versions SET version = version + 1 WHERE table_name = 'doctors';
+CREATE TRIGGER doctors_after_update AFTER UPDATE ON doctors FOR EACH ROW
+    UPDATE table_versions SET version = version + 1 WHERE table_name = 'doctors';
+CREATE TRIGGER doctors_after_delete AFTER DELETE ON doctors FOR EACH ROW
+    UPDATE table_versions SET version = version + 1 WHERE table_name IN ('doctors', 'appointments');
+
+CREATE TRIGGER appointments_after_insert AFTER INSERT ON appointments FOR EACH ROW
+    UPDATE table_versions SET version = version + 1 WHERE table_name = 'appointments';
+CREATE TRIGGER appointments_after_update AFTER UPDATE ON appointments FOR EACH ROW
+    UPDATE table_versions SET version = version + 1 WHERE table_name = 'appointments';
+CREATE TRIGGER appointments_after_delete AFTER DELETE ON appointments FOR EACH ROW
+    UPDATE table_versions SET version = version + 1 WHERE table_name = 'appointments';
+
@@ -0,0 +1,25 @@
+-- Hospital Management System - Migration 003
+-- Adds appointment_daily_rollup: appointments and fee totals per day, doctor and
+-- status, kept up to date by the application (rollups.py) and read by the
+-- dashboard and the appointment statistics API instead of scanning appointments.
+-- Run once against existing databases: mysql -u root -p HMS < scripts/migrations/003_appointment_rollup.sql
+-- then check it with: python scripts/rebuild_rollups.py --check
+
+USE HMS;
+
+CREATE TABLE appointment_daily_rollup (
+    day DATE NOT NULL,
+    doctor_id INT NOT NULL,
+    status ENUM('Scheduled', 'Completed', 'Cancelled') NOT NULL,
+    appointments INT NOT NULL DEFAULT 0,
+    fee_total DECIMAL(14,2) NOT NULL DEFAULT 0.00,
+    PRIMARY KEY (day, doctor_id, status),
+    INDEX idx_rollup_doctor_day (doctor_id, day)
+);
+
+-- Backfill from the existing appointments
+INSERT INTO appointment_daily_rollup (day, doctor_id, status, appointments, fee_total)
+SELECT DATE(appointment_date), doctor_id, status, COUNT(*), COALESCE(SUM(fee), 0)
+FROM appointments
+WHERE status IS NOT NULL
+GROUP BY DATE(appointment_date), doctor_id, status;
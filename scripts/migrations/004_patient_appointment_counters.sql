@@ -0,0 +1,37 @@
+-- Hospital Management System - Migration 004
+-- Stores each patient's appointment count, latest appointment and earliest
+-- still-scheduled appointment on the patient row. The application keeps them
+-- up to date in the same transaction as every appointment write (rollups.py),
+-- so patient lists can sort and filter on them through an index instead of
+-- grouping all appointments as the patient_summary view did.
+-- Run once against existing databases: mysql -u root -p HMS < scripts/migrations/004_patient_appointment_counters.sql
+-- On large databases skip the backfill below and run: python scripts/rebuild_rollups.py --only patients
+
+USE HMS;
+
+ALTER TABLE patients
+    ADD COLUMN total_appointments INT NOT NULL DEFAULT 0,
+    ADD COLUMN last_appointment DATETIME NULL,
+    ADD COLUMN next_scheduled_appointment DATETIME NULL,
+    ADD INDEX idx_total_appointments (total_appointments),
+    ADD INDEX idx_last_appointment (last_appointment),
+    ADD INDEX idx_next_scheduled_appointment (next_scheduled_appointment);
+
+-- Recomputing one patient's counters reads only that patient's index entries
+ALTER TABLE appointments
+    ADD INDEX idx_patient_status_date (patient_id, status, appointment_date);
+
+-- Backfill (updated_at is set to itself so it keeps the last real edit)
+UPDATE patients p
+LEFT JOIN (SELECT patient_id, COUNT(*) AS total, MAX(appointment_date) AS last_date,
+                  MIN(CASE WHEN status = 'Scheduled' THEN appointment_date END) AS next_date
+           FROM appointments GROUP BY patient_id) a ON a.patient_id = p.id
+SET p.total_appointments = COALESCE(a.total, 0),
+    p.last_appointment = a.last_date,
+    p.next_scheduled_appointment = a.next_date,
+    p.updated_at = p.updated_at;
+
+-- Keep the view for existing queries; it now reads the stored counters
+CREATE OR REPLACE VIEW patient_summary AS
+SELECT id, name, age, gender, phone, email, total_appointments, last_appointment, next_scheduled_appointment
+FROM patients;
@@ -0,0 +1,24 @@
+-- Hospital Management System - Migration 005
+-- Adds audit_log: who created, edited, completed, cancelled or deleted each
+-- patient, doctor and appointment, with the fields that changed as JSON
+-- ({"field": [old, new]}). The application writes it in batches from a
+-- background thread (audit.py), so entries appear a moment after the change.
+-- No foreign keys: entries must outlive the rows and users they describe.
+-- Run once against existing databases: mysql -u root -p HMS < scripts/migrations/005_audit_log.sql
+
+USE HMS;
+
+CREATE TABLE audit_log (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    occurred_at DATETIME(6) NOT NULL,
+    user_id INT NULL,
+    username VARCHAR(50) NULL,
+    action VARCHAR(20) NOT NULL,
+    table_name VARCHAR(64) NOT NULL,
+    row_id INT NULL,
+    changes JSON NOT NULL,
+    remote_addr VARCHAR(45) NULL,
+    INDEX idx_audit_row (table_name, row_id, occurred_at),
+    INDEX idx_audit_user (user_id, occurred_at),
+    INDEX idx_audit_occurred (occurred_at)
+);
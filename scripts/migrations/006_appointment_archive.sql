@@ -0,0 +1,38 @@
+-- Hospital Management System - Migration 006
+-- Splits appointments into recent and historical tables. appointments keeps
+-- the months after the archive horizon; scripts/archive_appointments.py (run
+-- nightly) moves older months to appointments_archive and records the horizon
+-- in archive_state. Queries that only cover recent dates read appointments
+-- alone; the application reads both tables for anything older (archive.py).
+-- MySQL's own RANGE partitioning was not used: partitioned InnoDB tables cannot
+-- have foreign keys, and the patient and doctor deletes rely on the cascades.
+-- Run once against existing databases: mysql -u root -p HMS < scripts/migrations/006_appointment_archive.sql
+-- then archive history online with: python scripts/archive_appointments.py
+
+USE HMS;
+
+-- Same columns as appointments plus archived_at. Ids are kept, so not AUTO_INCREMENT.
+CREATE TABLE appointments_archive (
+    id INT PRIMARY KEY,
+    patient_id INT NOT NULL,
+    doctor_id INT NOT NULL,
+    appointment_date DATETIME NOT NULL,
+    fee DECIMAL(10,2) DEFAULT 0.00,
+    status ENUM('Scheduled', 'Completed', 'Cancelled') DEFAULT 'Scheduled',
+    notes TEXT,
+    created_at TIMESTAMP NULL,
+    updated_at TIMESTAMP NULL,
+    archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (patient_id) REFERENCES patients(id) ON DELETE CASCADE,
+    FOREIGN KEY (doctor_id) REFERENCES doctors(id) ON DELETE CASCADE,
+    INDEX idx_archive_appointment_date (appointment_date),
+    INDEX idx_archive_doctor_date (doctor_id, appointment_date),
+    INDEX idx_archive_patient_status_date (patient_id, status, appointment_date)  -- Patient counter refreshes
+);
+
+-- First day kept in appointments; no row until something has been archived
+CREATE TABLE archive_state (
+    table_name VARCHAR(64) PRIMARY KEY,
+    archived_before DATE NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
@@ -0,0 +1,13 @@
+-- Hospital Management System - Migration 007
+-- Indexes for incremental sync through the JSON API (/api/v1/...?updated_since=),
+-- which pages through rows in (updated_at, id) order. InnoDB secondary indexes
+-- end with the primary key, so an index on updated_at alone serves that order.
+-- Run once against existing databases (after migration 006):
+-- mysql -u root -p HMS < scripts/migrations/007_updated_at_indexes.sql
+
+USE HMS;
+
+ALTER TABLE patients ADD INDEX idx_updated_at (updated_at);
+ALTER TABLE doctors ADD INDEX idx_updated_at (updated_at);
+ALTER TABLE appointments ADD INDEX idx_updated_at (updated_at);
+ALTER TABLE appointments_archive ADD INDEX idx_archive_updated_at (updated_at);
@@ -0,0 +1,24 @@
+-- Hospital Management System - Migration 008
+-- Drops the FOR EACH ROW triggers of migration 002. Every row they touched
+-- updated the same table_versions row, so each write transaction held that
+-- row lock until it committed and a 10,000-row import, bulk action or archive
+-- chunk queued every other write to the table behind it. The application now
+-- bumps the versions once per transaction, right before committing
+-- (dal.touch_tables). Deploy the application version that does so first.
+-- Run once against existing databases: mysql -u root -p HMS < scripts/migrations/008_application_table_versions.sql
+-- Writes made outside the application (e.g. in the mysql client) must now bump the versions themselves:
+--     UPDATE table_versions SET version = version + 1 WHERE table_name IN ('patients', 'appointments');
+
+USE HMS;
+
+DROP TRIGGER IF EXISTS patients_after_insert;
+DROP TRIGGER IF EXISTS patients_after_update;
+DROP TRIGGER IF EXISTS patients_after_delete;
+
+DROP TRIGGER IF EXISTS doctors_after_insert;
+DROP TRIGGER IF EXISTS doctors_after_update;
+DROP TRIGGER IF EXISTS doctors_after_delete;
+
+DROP TRIGGER IF EXISTS appointments_after_insert;
+DROP TRIGGER IF EXISTS appointments_after_update;
+DROP TRIGGER IF EXISTS appointments_after_delete;
@@ -0,0 +1,14 @@
+-- Hospital Management System - Migration 009
+-- Gives the appointment counters stored on patients (migration 004) their own
+-- table version. Every appointment write refreshes some patient's counters;
+-- bumping the patients version for that invalidated patient reports,
+-- /api/v1/patients validators and everything else built only from patient
+-- details. Only pages showing the counters now follow patient_counters.
+-- Run once against existing databases (after migration 008):
+-- mysql -u root -p HMS < scripts/migrations/009_patient_counter_version.sql
+
+USE HMS;
+
+INSERT INTO table_versions (table_name)
+SELECT 'patient_counters' FROM DUAL
+WHERE NOT EXISTS (SELECT 1 FROM table_versions WHERE table_name = 'patient_counters');
@@ -0,0 +1,23 @@
+-- Hospital Management System - Migration 010
+-- Adds appointment_day_totals: appointment_daily_rollup (migration 003) summed
+-- per day, kept up to date by the application (rollups.py) in the same
+-- transactions. The dashboard's all-time income was SUM(fee_total) over every
+-- (day, doctor, status) group of the roll-up on each cache miss; it now sums
+-- one row per day.
+-- Run once against existing databases (after migration 003):
+-- mysql -u root -p HMS < scripts/migrations/010_appointment_day_totals.sql
+-- then check it with: python scripts/rebuild_rollups.py --only daily --check
+
+USE HMS;
+
+CREATE TABLE appointment_day_totals (
+    day DATE PRIMARY KEY,
+    appointments INT NOT NULL DEFAULT 0,
+    fee_total DECIMAL(16,2) NOT NULL DEFAULT 0.00
+);
+
+-- Backfill from the existing roll-up
+INSERT INTO appointment_day_totals (day, appointments, fee_total)
+SELECT day, SUM(appointments), SUM(fee_total)
+FROM appointment_daily_rollup
+GROUP BY day;
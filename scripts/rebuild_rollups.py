@@ -0,0 +1,154 @@
+"""
+Hospital Management System - Roll-up Maintenance
+Author: HMS Development Team
+Description: Rebuilds appointment_daily_rollup (with its day totals) and the
+appointment counters stored on patients from the appointments table (and appointments_archive,
+once migration 006 has run), or checks them against those tables.
+Use it after the roll-ups were added to an existing database (migrations 003
+and 004), after writes that bypassed the application (manual SQL, restores)
+or when --check reports drift. Without --start/--end the whole range covered
+by appointments and the roll-up is processed; patient counters always cover
+every patient.
+
+Usage: python scripts/rebuild_rollups.py
+       python scripts/rebuild_rollups.py --only daily --check --start 2024-01-01 --end 2024-12-31
+       python scripts/rebuild_rollups.py --only patients --check --repair
+"""
+
+import argparse
+import os
+import sys
+from datetime import date, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import mysql.connector  # noqa: E402
+
+import rollups  # noqa: E402
+from app import DB_CONFIG  # noqa: E402
+
+SHOWN = 50  # Mismatches printed by --check
+
+
+def daily(connection, args):
+    """
+    Returns: exit status - 0 when the roll-up is (now) correct, 1 when --check found drift
+    """
+    cursor = connection.cursor()
+    try:
+        first_day, last_day = rollups.appointment_extent(cursor)
+        first_day, last_day = args.start or first_day, args.end or last_day
+        if first_day is None or last_day is None:
+            print('No appointments - daily roll-up has nothing to do')
+            return 0
+        if last_day < first_day:
+            print('--end is before --start', file=sys.stderr)
+            return 2
+
+        if args.check:
+            mismatches = rollups.check(cursor, first_day, last_day)
+            for day, doctor_id, status, count, fees, rollup_count, rollup_fees in mismatches[:SHOWN]:
+                print(f'{day} doctor {doctor_id} {status}: appointments {count} / {fees}, '
+                      f'roll-up {rollup_count} / {rollup_fees}')
+            if len(mismatches) > SHOWN:
+                print(f'... and {len(mismatches) - SHOWN} more')
+            print(f'Daily roll-up {first_day} to {last_day}: {len(mismatches)} mismatched groups')
+            totals = rollups.check_day_totals(cursor, first_day, last_day)
+            for day, count, fees, total_count, total_fees in totals[:SHOWN]:
+                print(f'{day} day total: roll-up {count} / {fees}, stored {total_count} / {total_fees}')
+            if len(totals) > SHOWN:
+                print(f'... and {len(totals) - SHOWN} more')
+            print(f'Day totals {first_day} to {last_day}: {len(totals)} mismatched days')
+            if not mismatches and not totals:
+                return 0
+            if not args.repair:
+                return 1
+    finally:
+        cursor.close()
+
+    if args.check:
+        days = sorted({row[0] for row in mismatches} | {row[0] for row in totals})
+        # Rebuild runs of consecutive days rather than the whole range
+        runs, run_start = [], days[0]
+        for previous, day in zip(days, days[1:] + [None]):
+            if day is None or day - previous > timedelta(days=1):
+                runs.append((run_start, previous))
+                run_start = day
+        for start, end in runs:
+            rollups.rebuild(connection, start, end, args.chunk_days)
+        print(f'Rebuilt {len(days)} days')
+        return 0
+
+    def progress(day, rows):
+        print(f'  through {day}: {rows:,} rows')
+
+    print(f'Rebuilding {rollups.TABLE} from {first_day} to {last_day}')
+    rows = rollups.rebuild(connection, first_day, last_day, args.chunk_days, progress)
+    print(f'Done: {rows:,} rows')
+    return 0
+
+
+def patients(connection, args):
+    """
+    Returns: exit status - 0 when the counters are (now) correct, 1 when --check found drift
+    """
+    cursor = connection.cursor()
+    try:
+        first_id, last_id = rollups.patient_extent(cursor)
+        if first_id is None:
+            print('No patients - patient counters have nothing to do')
+            return 0
+        if args.check:
+            mismatches = rollups.check_patient_counters(cursor, first_id, last_id)
+            for patient_id, stored, actual in mismatches[:SHOWN]:
+                print(f'patient {patient_id}: stored {stored}, actual {actual}')
+            if len(mismatches) > SHOWN:
+                print(f'... and {len(mismatches) - SHOWN} more')
+            print(f'Patient counters: {len(mismatches)} mismatched patients')
+            if not mismatches:
+                return 0
+            if not args.repair:
+                return 1
+    finally:
+        cursor.close()
+
+    if args.check:
+        for patient_id, _, _ in mismatches:
+            rollups.rebuild_patient_counters(connection, patient_id, patient_id)
+        print(f'Repaired {len(mismatches)} patients')
+        return 0
+
+    def progress(patient_id, changed):
+        print(f'  through patient {patient_id}: {changed:,} updated')
+
+    print(f'Rebuilding patient appointment counters for ids {first_id} to {last_id}')
+    changed = rollups.rebuild_patient_counters(connection, first_id, last_id, args.chunk_patients, progress)
+    print(f'Done: {changed:,} patients updated')
+    return 0
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Rebuild or check the appointment roll-ups')
+    parser.add_argument('--only', choices=('daily', 'patients'), help='Process one roll-up (default: both)')
+    parser.add_argument('--start', type=date.fromisoformat, help='First day YYYY-MM-DD (daily roll-up)')
+    parser.add_argument('--end', type=date.fromisoformat, help='Last day YYYY-MM-DD (daily roll-up)')
+    parser.add_argument('--check', action='store_true', help='Only compare the roll-ups with appointments')
+    parser.add_argument('--repair', action='store_true', help='With --check, rebuild what disagrees')
+    parser.add_argument('--chunk-days', type=int, default=31, help='Days per daily roll-up transaction')
+    parser.add_argument('--chunk-patients', type=int, default=5000, help='Patients per counter transaction')
+    args = parser.parse_args(argv)
+
+    connection = mysql.connector.connect(**DB_CONFIG)
+    try:
+        status = 0
+        for name, run in (('daily', daily), ('patients', patients)):
+            if args.only in (None, name):
+                status = max(status, run(connection, args))
+        return status
+    finally:
+        connection.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,70 @@
+"""
+Hospital Management System - Vendor Assets
+Author: HMS Development Team
+Description: Downloads the third-party files listed in ASSET_CONFIG['vendor']
+(Bootstrap, bootstrap-icons and its fonts) into static/vendor so pages are
+served entirely from the application instead of the CDN. Run once per
+deployment, or after changing a vendor version; files already present are
+kept unless --force is given. The asset build, and so the application,
+fails while any of them is missing; --check only reports which are.
+
+Usage: python scripts/vendor_assets.py [--force]
+       python scripts/vendor_assets.py --check
+"""
+
+import argparse
+import os
+import sys
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from app import ASSET_CONFIG  # noqa: E402
+
+
+def download(url, path, timeout=30):
+    with urllib.request.urlopen(url, timeout=timeout) as response:
+        data = response.read()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = path + '.tmp'
+    with open(temp_path, 'wb') as handle:
+        handle.write(data)
+    os.replace(temp_path, path)
+    return len(data)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Download vendor static files into static/vendor')
+    parser.add_argument('--force', action='store_true', help='Download files that are already present again')
+    parser.add_argument('--check', action='store_true', help='Only report missing files (exit 1 if any)')
+    args = parser.parse_args(argv)
+
+    static_dir = os.path.join(ROOT, 'static')
+    if args.check:
+        missing = [logical for logical in sorted(ASSET_CONFIG['vendor'])
+                   if not os.path.exists(os.path.join(static_dir, *logical.split('/')))]
+        for logical in missing:
+            print(f'  missing     {logical}')
+        return 1 if missing else 0
+    failures = 0
+    for logical, url in sorted(ASSET_CONFIG['vendor'].items()):
+        path = os.path.join(static_dir, *logical.split('/'))
+        if os.path.exists(path) and not args.force:
+            print(f'  kept        {logical}')
+            continue
+        try:
+            size = download(url, path)
+            print(f'  downloaded  {logical} ({size:,} bytes)')
+        except Exception as e:
+            failures += 1
+            print(f'  FAILED      {logical}: {e}')
+    if failures:
+        print(f'{failures} file(s) could not be downloaded; the application will not start until they are present')
+        return 1
+    print('Vendor files are in place - restart the application to fingerprint them')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
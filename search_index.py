@@ -0,0 +1,260 @@
+"""
+Hospital Management System - Patient Search Index
+Author: HMS Development Team
+Description: In-process trigram index over patient names and digit-normalised
+phone numbers. Substring queries intersect trigram posting lists instead of
+scanning every patient with LIKE '%...%'.
+"""
+
+import heapq
+import re
+import threading
+import time
+import unicodedata
+
+_NON_WORD = re.compile(r'[\W_]+', re.UNICODE)
+_NON_DIGIT = re.compile(r'[^0-9]+')
+
+
+def normalize_name(text):
+    """
+    Case-fold a name (any script) and collapse punctuation/whitespace to single spaces
+    """
+    return _NON_WORD.sub(' ', unicodedata.normalize('NFKC', text or '').casefold()).strip()
+
+
+def normalize_phone(text):
+    """
+    Keep only the digits of a phone number
+    """
+    return _NON_DIGIT.sub('', text or '')
+
+
+def _needle(query):
+    """
+    Normalised query and the field it searches: 0 for names (it has letters), 1 for phones
+    """
+    if any(char.isalpha() for char in query):
+        return normalize_name(query), 0
+    return normalize_phone(query), 1
+
+
+def indexable(query):
+    """
+    Whether the index can answer the query - False when nothing is left after normalising
+    (e.g. only punctuation), in which case callers should search the table with LIKE instead
+    """
+    return bool(_needle(query)[0])
+
+
+def _trigrams(text):
+    """
+    Trigrams of a padded string. The leading padding produces word-start grams
+    (' jo') so short queries can still match the start of a word.
+    """
+    padded = '  ' + text + ' '
+    grams = {padded[i:i + 3] for i in range(len(padded) - 2)}
+    # Word-start bigrams let single-character queries match word prefixes
+    grams.update(' ' + word[0] for word in text.split())
+    return grams
+
+
+def _query_grams(text):
+    """
+    Grams a document must contain to match the query as a substring
+    """
+    if len(text) >= 3:
+        return {text[i:i + 3] for i in range(len(text) - 2)}
+    # One or two characters: match the start of a word
+    return {' ' + text}
+
+
+class PatientSearchIndex:
+    """
+    Trigram index over (id, name, phone) for every patient.
+
+    The index is built from the database in a background thread and rebuilt
+    every `refresh_interval` seconds so writes made by other worker processes
+    are picked up. Writes in this process update it immediately via
+    add()/update()/remove(). Until the first build finishes, ready is False and
+    callers should fall back to a database query.
+    """
+
+    def __init__(self, loader, refresh_interval=300):
+        """
+        Args:
+            loader (callable): Returns an iterable of (id, name, phone) rows
+            refresh_interval (float): Seconds between full rebuilds
+        """
+        self.loader = loader
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._docs = {}
+        self._name_postings = {}
+        self._phone_postings = {}
+        self._built_at = None
+        self._building = False
+        self._journal = None  # Changes made while a rebuild is running
+        self.last_build_seconds = None
+        self.last_error = None
+
+    @property
+    def ready(self):
+        return self._built_at is not None
+
+    def __len__(self):
+        return len(self._docs)
+
+    # Index maintenance
+
+    @staticmethod
+    def _index(docs, name_postings, phone_postings, patient_id, name, phone):
+        name_key, phone_key = normalize_name(name), normalize_phone(phone)
+        docs[patient_id] = (name_key, phone_key, name or '')
+        for gram in _trigrams(name_key):
+            name_postings.setdefault(gram, set()).add(patient_id)
+        if phone_key:
+            for gram in _trigrams(phone_key):
+                phone_postings.setdefault(gram, set()).add(patient_id)
+
+    def _unindex(self, patient_id):
+        doc = self._docs.pop(patient_id, None)
+        if doc is None:
+            return
+        name_key, phone_key, _ = doc
+        for postings, key in ((self._name_postings, name_key), (self._phone_postings, phone_key)):
+            if not key:
+                continue
+            for gram in _trigrams(key):
+                ids = postings.get(gram)
+                if ids is not None:
+                    ids.discard(patient_id)
+                    if not ids:
+                        del postings[gram]
+
+    def add(self, patient_id, name, phone):
+        """
+        Index a new patient (or re-index an existing one)
+        """
+        with self._lock:
+            self._unindex(patient_id)
+            self._index(self._docs, self._name_postings, self._phone_postings, patient_id, name, phone)
+            if self._journal is not None:
+                self._journal.append((patient_id, name, phone))
+
+    update = add
+
+    def remove(self, patient_id):
+        with self._lock:
+            self._unindex(patient_id)
+            if self._journal is not None:
+                self._journal.append((patient_id, None, None))
+
+    def build(self, rows):
+        """
+        Replace the index contents with the given (id, name, phone) rows
+        """
+        started = time.perf_counter()
+        docs, name_postings, phone_postings = {}, {}, {}
+        for patient_id, name, phone in rows:
+            self._index(docs, name_postings, phone_postings, patient_id, name, phone)
+
+        with self._lock:
+            self._docs, self._name_postings, self._phone_postings = docs, name_postings, phone_postings
+            # Replay writes that happened while the snapshot was being read
+            journal, self._journal = self._journal, None
+            for patient_id, name, phone in journal or ():
+                self._unindex(patient_id)
+                if name is not None:
+                    self._index(self._docs, self._name_postings, self._phone_postings, patient_id, name, phone)
+            self._built_at = time.monotonic()
+        self.last_build_seconds = time.perf_counter() - started
+
+    def _rebuild(self):
+        try:
+            self.build(self.loader())
+            self.last_error = None
+        except Exception as e:
+            self.last_error = str(e)
+            print(f"Patient search index build failed: {e}")
+            with self._lock:
+                self._journal = None
+        finally:
+            self._building = False
+
+    def mark_stale(self):
+        """
+        Rebuild on the next refresh_if_stale() (after bulk writes); the current
+        contents keep serving searches until then
+        """
+        with self._lock:
+            if self._built_at is not None:
+                self._built_at = float('-inf')
+
+    def refresh_if_stale(self):
+        """
+        Start a background rebuild if the index was never built or is too old
+        """
+        with self._lock:
+            stale = self._built_at is None or time.monotonic() - self._built_at > self.refresh_interval
+            if not stale or self._building:
+                return
+            self._building = True
+            self._journal = []
+        threading.Thread(target=self._rebuild, name='patient-search-index', daemon=True).start()
+
+    # Queries
+
+    def search(self, query, limit=25):
+        """
+        Find patients whose name or phone contains the query.
+        Queries with letters search names, otherwise phone digits. One- and
+        two-character queries match the start of a word (or of the phone number).
+        Args: query (str): Search text, limit (int): Maximum results
+        Returns: list of patient ids, best match first
+        """
+        needle, field = _needle(query)
+        if not needle:
+            return []
+
+        with self._lock:
+            postings = self._phone_postings if field else self._name_postings
+            gram_postings = [postings.get(gram) for gram in _query_grams(needle)]
+            if not all(gram_postings):
+                return []
+            # Walk the rarest gram's postings and probe the others
+            gram_postings.sort(key=len)
+            smallest, others = gram_postings[0], gram_postings[1:]
+            docs = self._docs
+            ranked = []
+            for patient_id in smallest:
+                if others and not all(patient_id in ids for ids in others):
+                    continue
+                doc = docs[patient_id]
+                text = doc[field]
+                if needle not in text:
+                    continue  # Trigrams matched but not as one contiguous substring
+                ranked.append((self._rank(text, needle), len(text), doc[2], patient_id))
+
+        return [entry[-1] for entry in heapq.nsmallest(limit, ranked)]
+
+    @staticmethod
+    def _rank(text, needle):
+        if text.startswith(needle):
+            return 0                        # Whole name/phone starts with the query
+        if ' ' + needle in text:
+            return 1                        # A later word starts with the query
+        return 2                            # Plain substring match
+
+    def stats(self):
+        with self._lock:
+            return {
+                'patients': len(self._docs),
+                'name_grams': len(self._name_postings),
+                'phone_grams': len(self._phone_postings),
+                'ready': self.ready,
+                'building': self._building,
+                'age_seconds': None if self._built_at in (None, float('-inf')) else time.monotonic() - self._built_at,
+                'last_build_seconds': self.last_build_seconds,
+                'last_error': self.last_error,
+            }